@@ -0,0 +1,192 @@
+"""
+Compiled preprocessing: StandardScaler and PCA folded into one affine map.
+
+Both steps are linear, so scaler_pca.joblib can be reduced offline to a
+weight matrix W and bias b; at inference preprocessing is then a single
+X @ W + b instead of a chain of sklearn transforms and input checks.
+"""
+
+import hashlib
+
+import joblib
+import numpy as np
+
+SCALER_PATH = "scaler_pca.joblib"
+AFFINE_PATH = "preprocessing_affine.npz"
+
+
+def _fold_step(step, n_features):
+    """
+    Return (W, b) for one fitted sklearn step.
+    """
+    name = type(step).__name__
+
+    if name == "StandardScaler":
+        mean = step.mean_ if step.with_mean else np.zeros(n_features)
+        scale = step.scale_ if step.with_std else np.ones(n_features)
+        W = np.diag(1.0 / scale)
+        return W, -mean / scale
+
+    if name == "PCA":
+        W = step.components_.T.copy()
+        if step.whiten:
+            W /= np.sqrt(step.explained_variance_)
+        return W, -step.mean_ @ W
+
+    raise TypeError(f"Cannot fold non-linear preprocessing step: {name}")
+
+
+def fold_affine(transformer):
+    """
+    Fold a fitted scaler, PCA, Pipeline or sequence of them into (W, b).
+
+    Args:
+        transformer: Fitted StandardScaler / PCA, a Pipeline of them, or a list/tuple
+
+    Returns:
+        tuple: (W, b) with transformer.transform(X) == X @ W + b
+    """
+    if hasattr(transformer, "steps"):
+        steps = [step for _, step in transformer.steps if step not in (None, "passthrough")]
+    elif isinstance(transformer, (list, tuple)):
+        steps = list(transformer)
+    else:
+        steps = [transformer]
+
+    n_features = steps[0].n_features_in_
+    W = np.eye(n_features)
+    b = np.zeros(n_features)
+    for step in steps:
+        W_step, b_step = _fold_step(step, W.shape[1])
+        W, b = W @ W_step, b @ W_step + b_step
+    return W, b
+
+
+def file_digest(path):
+    """
+    SHA-256 of a file, used to tie the compiled artifact to its source.
+    """
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class AffineTransform:
+    """
+    Preprocessing as a single X @ W + b.
+
+    Args:
+        W: Weight matrix of shape (n_features_in, n_features_out)
+        b: Bias vector of shape (n_features_out,)
+        source_digest: SHA-256 of the artifact the transform was built from
+    """
+
+    def __init__(self, W, b, source_digest=""):
+        self.W = np.ascontiguousarray(W, dtype=np.float64)
+        self.b = np.ascontiguousarray(b, dtype=np.float64)
+        self.source_digest = source_digest
+        self._W32 = self.W.astype(np.float32)
+        self._b32 = self.b.astype(np.float32)
+
+    @classmethod
+    def from_transformer(cls, transformer, source_digest=""):
+        W, b = fold_affine(transformer)
+        return cls(W, b, source_digest)
+
+    @property
+    def n_features_in(self):
+        return self.W.shape[0]
+
+    @property
+    def n_features_out(self):
+        return self.W.shape[1]
+
+    def transform(self, X, dtype=np.float64):
+        """
+        Apply the folded preprocessing.
+
+        Args:
+            X: Array of shape (n_rows, n_features_in)
+            dtype: np.float64 (matches sklearn) or np.float32
+
+        Returns:
+            Array of shape (n_rows, n_features_out)
+        """
+        if dtype == np.float32:
+            W, b = self._W32, self._b32
+        else:
+            W, b = self.W, self.b
+        out = np.ascontiguousarray(X, dtype=dtype) @ W
+        out += b
+        return out
+
+    def save(self, path=AFFINE_PATH):
+        np.savez(path, W=self.W, b=self.b, source_digest=self.source_digest)
+
+    @classmethod
+    def load(cls, path=AFFINE_PATH):
+        with np.load(path) as data:
+            return cls(data["W"], data["b"], str(data["source_digest"]))
+
+
+def build(source=SCALER_PATH, path=AFFINE_PATH):
+    """
+    Compile scaler_pca.joblib into the affine artifact.
+    """
+    transform = AffineTransform.from_transformer(joblib.load(source), file_digest(source))
+    transform.save(path)
+    return transform
+
+
+def load_or_fold(load_transformer, source=SCALER_PATH, path=AFFINE_PATH):
+    """
+    Load the compiled artifact, or fold the sklearn transformer in memory
+    if the artifact is missing or was built from a different
+    scaler_pca.joblib.
+
+    Args:
+        load_transformer: Zero-argument callable returning the fitted sklearn
+            preprocessing; only called when the artifact cannot be used
+        source: Path of the sklearn preprocessing artifact
+        path: Path of the compiled .npz artifact
+
+    Returns:
+        AffineTransform
+    """
+    digest = file_digest(source)
+    try:
+        transform = AffineTransform.load(path)
+        if transform.source_digest == digest:
+            return transform
+    except (OSError, KeyError, ValueError):
+        pass
+    return AffineTransform.from_transformer(load_transformer(), digest)
+
+
+def verify(transformer, transform, X, rtol=1e-9, atol=1e-9):
+    """
+    Check the affine transform against the sklearn pipeline on X.
+
+    Returns:
+        float: Largest absolute difference between the two outputs
+    """
+    expected = transformer.transform(X)
+    actual = transform.transform(X)
+    if not np.allclose(actual, expected, rtol=rtol, atol=atol):
+        raise AssertionError("Affine transform does not match the sklearn pipeline")
+    return float(np.max(np.abs(actual - expected)))
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    from data_preprocessing import _column
+    from feature_schema import REQUIRED_FEATURES
+
+    transform = build()
+    print(f"✅ Compiled {SCALER_PATH} -> {AFFINE_PATH} "
+          f"({transform.n_features_in} -> {transform.n_features_out} features)")
+
+    df = pd.read_csv("dataset for dashboard.csv")
+    X = np.column_stack([_column(df, f) for f in REQUIRED_FEATURES])
+    max_diff = verify(joblib.load(SCALER_PATH), transform, X)
+    print(f"✅ Matches sklearn on {len(X)} rows (max abs diff {max_diff:.2e})")
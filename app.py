@@ -1,6 +1,117 @@
+import time
+from functools import lru_cache
+
+import pandas as pd
 import streamlit as st
+from artifact_manager import MANAGER
 from data_preprocessing import preprocess_input
+from explanations import explain_batch, get_explainer
+from feature_schema import REQUIRED_FEATURES, SCHEMA
+from model_registry import get_affine, get_label_encoder, get_scoring_model
 from prediction import predict_dropout
+from scenarios import grade_steps, sweep
+
+# The 22 model features plus the two economic fields shown on the form
+INPUT_FIELDS = tuple(REQUIRED_FEATURES) + ("GDP", "Unemployment_rate")
+PREDICTION_CACHE_SIZE = 1024
+
+# Yes/no fields the what-if simulation can toggle (admission grade is the x-axis),
+# with the short names used in the chart legend
+WHAT_IF_LABELS = {
+    "Tuition_fees_up_to_date": {1: "SPP Lunas", 0: "SPP Belum Lunas"},
+    "Scholarship_holder": {1: "Beasiswa", 0: "Tanpa Beasiswa"},
+    "Debtor": {0: "Tidak Berhutang", 1: "Berhutang"},
+}
+
+# Form labels and value names used when listing the model's explanation
+FEATURE_LABELS = {
+    "Marital_status": "❤️ Status Pernikahan",
+    "Application_mode": "📝 Mode Aplikasi",
+    "Application_order": "📝 Urutan Pilihan Program",
+    "Course": "📚 Program Studi",
+    "Daytime_evening_attendance": "⏰ Waktu Kuliah",
+    "Previous_qualification": "🎓 Kualifikasi Sebelumnya",
+    "Previous_qualification_grade": "💯 Nilai Kualifikasi Sebelumnya",
+    "Nacionality": "🌍 Kebangsaan",
+    "Mothers_qualification": "👩‍🎓 Kualifikasi Ibu",
+    "Fathers_qualification": "👨‍🎓 Kualifikasi Ayah",
+    "Mothers_occupation": "👩‍💼 Pekerjaan Ibu",
+    "Fathers_occupation": "👨‍💼 Pekerjaan Ayah",
+    "Admission_grade": "💯 Nilai Masuk",
+    "Displaced": "🏠 Status Pengungsi",
+    "Educational_special_needs": "📚 Kebutuhan Pendidikan Khusus",
+    "Debtor": "💳 Status Hutang",
+    "Tuition_fees_up_to_date": "💰 Status Pembayaran SPP",
+    "Gender": "👤 Jenis Kelamin",
+    "Scholarship_holder": "🎯 Penerima Beasiswa",
+    "Age_at_enrollment": "🎂 Usia Saat Mendaftar",
+    "International": "🌍 Status Internasional",
+    "Curricular_units_1st_sem_credited": "📚 Kredit Semester 1",
+}
+VALUE_LABELS = {
+    "Daytime_evening_attendance": {1: "Siang", 0: "Malam"},
+    "Displaced": {0: "Tidak", 1: "Ya"},
+    "Educational_special_needs": {0: "Tidak", 1: "Ya"},
+    "Debtor": {0: "Tidak Berhutang", 1: "Berhutang"},
+    "Tuition_fees_up_to_date": {1: "Lunas", 0: "Belum Lunas"},
+    "Gender": {1: "Laki-laki", 0: "Perempuan"},
+    "Scholarship_holder": {0: "Tidak", 1: "Ya"},
+    "International": {0: "Tidak", 1: "Ya"},
+}
+
+
+@st.cache_resource
+def warm_up_registry():
+    """Load model, preprocessing, label encoder and explainer into the registry once per server process."""
+    get_scoring_model()
+    get_affine()
+    get_label_encoder()
+    get_explainer()
+
+
+@st.cache_resource
+def get_cached_predictor():
+    """LRU-cached prediction and explanation keyed by the live artifact version and the 24 form fields."""
+
+    @lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+    def predict(version, input_values):
+        input_dict = dict(zip(INPUT_FIELDS, input_values))
+        explanation = explain_batch([input_dict])
+        processed = preprocess_input(input_dict)
+        # Model time only; preprocessing and the explanation are not inference
+        start = time.perf_counter()
+        result = predict_dropout(processed)
+        model_ms = (time.perf_counter() - start) * 1e3
+        return result, explanation["risk_factors"][0], explanation["supporting_factors"][0], model_ms
+
+    return predict
+
+
+def format_factor(feature, value, contribution):
+    """One explanation line: form label, the student's value and its contribution."""
+    value = VALUE_LABELS.get(feature, {}).get(value, f"{value:g}")
+    return f"{FEATURE_LABELS[feature]}: {value} ({contribution:+.2f})"
+
+
+@st.cache_data(max_entries=PREDICTION_CACHE_SIZE)
+def what_if_surface(version, input_values, features):
+    """Dropout probability (%) over admission grade per combination of the toggled fields, per live version."""
+    input_dict = dict(zip(INPUT_FIELDS, input_values))
+    overrides = {f: SCHEMA.codes(f) for f in features}
+    overrides["Admission_grade"] = grade_steps("Admission_grade")
+    surface = sweep(input_dict, overrides)
+
+    probability = surface["probability_dropout"].reshape(-1, len(overrides["Admission_grade"]))
+    combinations = [()]
+    for feature in features:
+        combinations = [c + ((feature, code),) for c in combinations for code in overrides[feature]]
+    columns = [", ".join(WHAT_IF_LABELS[f][code] for f, code in c) or "Data saat ini" for c in combinations]
+    frame = pd.DataFrame(probability.T * 100, columns=columns,
+                         index=pd.Index(overrides["Admission_grade"], name="Nilai Masuk"))
+    return frame, surface["baseline"] * 100
+
+
+warm_up_registry()
 
 st.title("🎓 Prediksi Risiko Dropout Mahasiswa")
 
@@ -21,7 +132,7 @@ with col1:
                          format_func=lambda x: "Laki-laki" if x == 1 else "Perempuan")
 
     application_order = st.selectbox("📝 Urutan Pilihan Program",
-                                   options=[0, 1, 2, 3, 4, 5, 6, 9],
+                                   options=SCHEMA.codes("Application_order"),
                                    format_func=lambda x: f"Pilihan ke-{x+1}" if x < 6 else f"Pilihan ke-{x+1}")
 
     debtor = st.selectbox("💳 Status Hutang",
@@ -37,11 +148,11 @@ with col1:
                                     format_func=lambda x: "Lunas" if x == 1 else "Belum Lunas")
 
     marital_status = st.selectbox("❤️ Status Pernikahan",
-                                 options=[1, 2, 3, 4, 5, 6],
+                                 options=SCHEMA.codes("Marital_status"),
                                  format_func=lambda x: f"Status {x}")
 
     application_mode = st.selectbox("📝 Mode Aplikasi",
-                                   options=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 26, 27, 42, 43, 44, 51, 53, 57],
+                                   options=SCHEMA.codes("Application_mode"),
                                    format_func=lambda x: f"Mode {x}")
 
     daytime_evening_attendance = st.selectbox("⏰ Waktu Kuliah",
@@ -52,51 +163,63 @@ with col2:
     st.subheader("🎓 Data Akademik")
 
     previous_qualification = st.selectbox("🎓 Kualifikasi Sebelumnya",
-                                        options=[1, 2, 3, 4, 5, 6, 9, 10, 12, 14, 15, 19, 38, 39, 40, 42, 43],
+                                        options=SCHEMA.codes("Previous_qualification"),
                                         format_func=lambda x: f"Kualifikasi {x}")
 
     course = st.selectbox("📚 Program Studi",
-                         options=[33, 171, 8014, 9003, 9070, 9085, 9119, 9130, 9147, 9238, 9254, 9500, 9556, 9670, 9773, 9853, 9991],
+                         options=SCHEMA.codes("Course"),
                          format_func=lambda x: f"Program {x}")
 
-    previous_qualification_grade = st.number_input("💯 Nilai Kualifikasi Sebelumnya", min_value=0.0, max_value=200.0, value=120.0)
+    previous_qualification_grade = st.number_input("💯 Nilai Kualifikasi Sebelumnya",
+                                                   min_value=SCHEMA.continuous["Previous_qualification_grade"][0],
+                                                   max_value=SCHEMA.continuous["Previous_qualification_grade"][1],
+                                                   value=120.0)
 
     nationality = st.selectbox("🌍 Kebangsaan",
-                                options=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26],
+                                options=SCHEMA.codes("Nacionality"),
                                 format_func=lambda x: f"Kebangsaan {x}")
 
     mothers_qualification = st.selectbox("👩‍🎓 Kualifikasi Ibu",
-                                        options=[1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44],
+                                        options=SCHEMA.codes("Mothers_qualification"),
                                         format_func=lambda x: f"Kualifikasi {x}")
 
     fathers_qualification = st.selectbox("👨‍🎓 Kualifikasi Ayah",
-                                        options=[1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44],
+                                        options=SCHEMA.codes("Fathers_qualification"),
                                         format_func=lambda x: f"Kualifikasi {x}")
 
     mothers_occupation = st.selectbox("👩‍💼 Pekerjaan Ibu",
-                                     options=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+                                     options=SCHEMA.codes("Mothers_occupation"),
                                      format_func=lambda x: f"Pekerjaan {x}")
 
 with col3:
     st.subheader("📊 Data Ekonomi & Lainnya")
 
     fathers_occupation = st.selectbox("👨‍💼 Pekerjaan Ayah",
-                                     options=[0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+                                     options=SCHEMA.codes("Fathers_occupation"),
                                      format_func=lambda x: f"Pekerjaan {x}")
 
-    admission_grade = st.number_input("💯 Nilai Masuk", min_value=0.0, max_value=200.0, value=125.0)
+    admission_grade = st.number_input("💯 Nilai Masuk",
+                                      min_value=SCHEMA.continuous["Admission_grade"][0],
+                                      max_value=SCHEMA.continuous["Admission_grade"][1],
+                                      value=125.0)
 
     educational_special_needs = st.selectbox("📚 Kebutuhan Pendidikan Khusus",
                                             options=[0, 1],
                                             format_func=lambda x: "Tidak" if x == 0 else "Ya")
 
-    age_at_enrollment = st.number_input("🎂 Usia Saat Mendaftar", min_value=17, max_value=70, value=20)
+    age_at_enrollment = st.number_input("🎂 Usia Saat Mendaftar",
+                                        min_value=SCHEMA.continuous["Age_at_enrollment"][0],
+                                        max_value=SCHEMA.continuous["Age_at_enrollment"][1],
+                                        value=20)
 
     international = st.selectbox("🌍 Status Internasional",
                                 options=[0, 1],
                                 format_func=lambda x: "Tidak" if x == 0 else "Ya")
 
-    curricular_units_1st_sem_credited = st.number_input("📚 Kredit Semester 1", min_value=0, max_value=30, value=6)
+    curricular_units_1st_sem_credited = st.number_input("📚 Kredit Semester 1",
+                                                        min_value=min(SCHEMA.codes("Curricular_units_1st_sem_credited")),
+                                                        max_value=max(SCHEMA.codes("Curricular_units_1st_sem_credited")),
+                                                        value=6)
 
     gdp = st.selectbox("📈 GDP (%)",
                       options=[3.51, 2.02, 1.79, 1.74, 0.79, 0.32, -0.92, -1.7, -3.12, -4.06])
@@ -107,41 +230,54 @@ with col3:
 # Add some spacing
 st.markdown("---")
 
+# Complete input data with all 22 features (plus the economic fields)
+input_data = {
+    "Scholarship_holder": scholarship_holder,
+    "Gender": gender,
+    "Application_order": application_order,
+    "Debtor": debtor,
+    "Displaced": displaced,
+    "Tuition_fees_up_to_date": tuition_up_to_date,
+    "Marital_status": marital_status,
+    "Application_mode": application_mode,
+    "Daytime_evening_attendance": daytime_evening_attendance,
+    "Previous_qualification": previous_qualification,
+    "Course": course,
+    "Previous_qualification_grade": previous_qualification_grade,
+    "Nacionality": nationality,
+    "Mothers_qualification": mothers_qualification,
+    "Fathers_qualification": fathers_qualification,
+    "Mothers_occupation": mothers_occupation,
+    "Fathers_occupation": fathers_occupation,
+    "Admission_grade": admission_grade,
+    "Educational_special_needs": educational_special_needs,
+    "Age_at_enrollment": age_at_enrollment,
+    "International": international,
+    "Curricular_units_1st_sem_credited": curricular_units_1st_sem_credited,
+    "GDP": gdp,
+    "Unemployment_rate": unemployment,
+}
+
 # Prediction button
 if st.button("🔍 Prediksi Risiko Dropout", type="primary", use_container_width=True):
-    # Create complete input data with default values for all 22 features
-    input_data = {
-        "Scholarship_holder": scholarship_holder,
-        "Gender": gender,
-        "Application_order": application_order,
-        "Debtor": debtor,
-        "Displaced": displaced,
-        "Tuition_fees_up_to_date": tuition_up_to_date,
-        "Marital_status": marital_status,
-        "Application_mode": application_mode,
-        "Daytime_evening_attendance": daytime_evening_attendance,
-        "Previous_qualification": previous_qualification,
-        "Course": course,
-        "Previous_qualification_grade": previous_qualification_grade,
-        "Nacionality": nationality,
-        "Mothers_qualification": mothers_qualification,
-        "Fathers_qualification": fathers_qualification,
-        "Mothers_occupation": mothers_occupation,
-        "Fathers_occupation": fathers_occupation,
-        "Admission_grade": admission_grade,
-        "Educational_special_needs": educational_special_needs,
-        "Age_at_enrollment": age_at_enrollment,
-        "International": international,
-        "Curricular_units_1st_sem_credited": curricular_units_1st_sem_credited,
-        "GDP": gdp,
-        "Unemployment_rate": unemployment,
-    }
+    # Report every invalid field at once instead of only the first
+    validation_errors = SCHEMA.validate_record(input_data)
+    if validation_errors:
+        for error in validation_errors:
+            st.error(f"❌ {error.message}")
+        st.stop()
 
     try:
         with st.spinner("🔄 Memproses prediksi..."):
-            # Process input and make prediction
-            processed_input = preprocess_input(input_data)
-            prediction = predict_dropout(processed_input)
+            # Process input and make prediction (memoized per exact input)
+            predictor = get_cached_predictor()
+            hits_before = predictor.cache_info().hits
+            result, risk_factors, positive_factors, model_ms = predictor(
+                MANAGER.live_version, tuple(input_data[field] for field in INPUT_FIELDS))
+            st.session_state["inference_ms"] = model_ms
+            st.session_state["inference_cached"] = predictor.cache_info().hits > hits_before
+
+        prediction = result["prediction"] if isinstance(result, dict) else result
 
         # Display results with enhanced styling
         st.markdown("---")
@@ -150,23 +286,12 @@ if st.button("🔍 Prediksi Risiko Dropout", type="primary", use_container_width
         if prediction == 1:
             st.error("⚠️ **RISIKO TINGGI DROPOUT**")
 
-            # Show risk factors
+            # Show the features that raised the model's dropout score most
             st.markdown("### 🔍 **Faktor Risiko Teridentifikasi:**")
-            risk_factors = []
-            if debtor == 1:
-                risk_factors.append("💳 Status berhutang")
-            if tuition_up_to_date == 0:
-                risk_factors.append("💰 SPP belum lunas")
-            if displaced == 1:
-                risk_factors.append("🏠 Status pengungsi")
-            if unemployment > 12:
-                risk_factors.append("📉 Tingkat pengangguran tinggi")
-            if gdp < 0:
-                risk_factors.append("📈 Kondisi ekonomi menurun")
-
             if risk_factors:
                 for factor in risk_factors:
-                    st.markdown(f"- {factor}")
+                    st.markdown(f"- {format_factor(*factor)}")
+                st.caption("Angka dalam kurung: kontribusi fitur terhadap skor mentah model untuk kelas Dropout (logit softmax kelas Dropout, bukan log-odds biner).")
             else:
                 st.markdown("- Tidak ada faktor risiko spesifik yang teridentifikasi dari data yang diberikan.")
 
@@ -182,21 +307,12 @@ if st.button("🔍 Prediksi Risiko Dropout", type="primary", use_container_width
         else:
             st.success("✅ **RISIKO RENDAH DROPOUT**")
 
-            # Show positive factors
+            # Show the features that lowered the model's dropout score most
             st.markdown("### 🌟 **Faktor Pendukung:**")
-            positive_factors = []
-            if scholarship_holder == 1:
-                positive_factors.append("🎯 Penerima beasiswa")
-            if tuition_up_to_date == 1:
-                positive_factors.append("💰 SPP lunas")
-            if debtor == 0:
-                positive_factors.append("💳 Tidak berhutang")
-            if displaced == 0:
-                positive_factors.append("🏠 Status tempat tinggal stabil")
-
             if positive_factors:
                 for factor in positive_factors:
-                    st.markdown(f"- {factor}")
+                    st.markdown(f"- {format_factor(*factor)}")
+                st.caption("Angka dalam kurung: kontribusi fitur terhadap skor mentah model untuk kelas Dropout (logit softmax kelas Dropout, bukan log-odds biner).")
             else:
                 st.markdown("- Tidak ada faktor pendukung spesifik yang teridentifikasi dari data yang diberikan.")
 
@@ -213,6 +329,25 @@ if st.button("🔍 Prediksi Risiko Dropout", type="primary", use_container_width
         st.error(f"❌ **Terjadi kesalahan:** {str(e)}")
         st.info("💡 Pastikan semua data telah diisi dengan benar dan coba lagi.")
 
+# What-if simulation on the current form values, scored as one batch
+st.markdown("---")
+st.subheader("🔮 Simulasi What-If")
+what_if_features = st.multiselect("Faktor yang disimulasikan",
+                                  options=list(WHAT_IF_LABELS),
+                                  default=list(WHAT_IF_LABELS),
+                                  format_func=lambda f: FEATURE_LABELS[f])
+if SCHEMA.validate_record(input_data):
+    st.info("💡 Lengkapi data dengan benar untuk melihat simulasi.")
+else:
+    surface, baseline = what_if_surface(MANAGER.live_version,
+                                        tuple(input_data[field] for field in INPUT_FIELDS),
+                                        tuple(what_if_features))
+    st.line_chart(surface, x_label="Nilai Masuk", y_label="Probabilitas Dropout (%)")
+    st.caption(f"Probabilitas dropout dengan data saat ini: {baseline:.1f}%. "
+               f"Setiap garis adalah satu kombinasi faktor di atas dengan nilai masuk {surface.index[0]:g}–{surface.index[-1]:g}.")
+    with st.expander("Tabel probabilitas (%)"):
+        st.dataframe(surface.round(1))
+
 # Sidebar with information
 with st.sidebar:
     st.markdown("## ℹ️ Tentang Aplikasi")
@@ -230,6 +365,10 @@ with st.sidebar:
     st.markdown("## 📊 Statistik")
     st.metric("Features Used", "22")  # Updated to 22
     st.metric("Accuracy", "~74%")
+    if "inference_ms" in st.session_state:
+        st.metric("Inference Time", f"{st.session_state['inference_ms']:.2f} ms",
+                  help="Waktu predict_dropout saja, tanpa preprocessing dan penjelasan faktor; "
+                       + ("hasil dari cache" if st.session_state["inference_cached"] else "dihitung ulang"))
 
     st.markdown("## ⚠️ Disclaimer")
     st.warning("""
@@ -0,0 +1,491 @@
+"""
+Versioned model artifacts: hot swaps and shadow scoring without a restart.
+
+Each version is a directory written by training.py (artifacts/<version>/
+with gboost_model.joblib, scaler_pca.joblib, label_encoder.joblib and
+metrics.json). MANAGER loads a whole set, folds its scaler into the affine
+transform and compiles its trees, and only then swaps model, scaler,
+encoder, affine and compiled model into the registry in one step, so
+prediction.py and data_preprocessing.py pick the new version up on their
+next call.
+
+A candidate version can run in shadow mode: every batch the live model
+scores is queued for the candidate, which scores the same preprocessed
+matrix on a background thread, so live requests never wait for it. When
+the shadow falls SHADOW_QUEUE_SIZE batches behind, further batches are
+dropped and counted instead; a sample rate below 1 shadows only that
+share of batches, bounding the extra CPU on a busy host. When the candidate was fitted with a
+different scaler, its inputs are derived from the live matrix with one
+affine map, never by preprocessing the raw rows again. Live and shadow
+model latency go to dropout_model_seconds{role, version}, and the rows
+where the two disagree on the label go to
+dropout_shadow_disagreements_total. Shadow results are never returned to
+callers, and a failing candidate only counts errors.
+
+Versions are only loaded by name from the manager's root directory, never
+from an arbitrary path, since loading one unpickles its files.
+
+Usage:
+    python artifact_manager.py list
+    python artifact_manager.py compare 20261018-105914 --data "dataset for dashboard.csv"
+"""
+
+import argparse
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from affine_transform import SCALER_PATH, AffineTransform, file_digest
+from compiled_trees import COMPILED_MAX_ROWS, COMPILED_MODEL_PATH, CompiledEnsemble, load_if_current
+from metrics import METRICS
+from model_registry import ARTIFACTS_DIR, LABEL_ENCODER_PATH, MODEL_PATH, REGISTRY
+
+METRICS_FILE = "metrics.json"
+
+# Version name of the artifacts in the working directory
+LOCAL_VERSION = "local"
+
+# Artifacts rebuilt from the new set after a swap
+DERIVED_ARTIFACTS = ("explainer",)
+
+# Earlier live versions remembered for rollback
+HISTORY_SIZE = 10
+
+# Live batches waiting for the shadow model; further batches are dropped
+SHADOW_QUEUE_SIZE = 64
+
+
+class ArtifactSet:
+    """
+    One version of the model, preprocessing and label encoder, fully loaded.
+
+    Args:
+        version: Version name
+        model: Fitted classifier
+        scaler: Fitted preprocessing (folded into affine)
+        label_encoder: Fitted LabelEncoder, or None
+        compiled: CompiledEnsemble of the model, or None to build it here
+        affine: AffineTransform of the scaler, or None to fold it here
+        info: Contents of the version's metrics.json
+        path: Directory the set was loaded from, if any
+    """
+
+    def __init__(self, version, model, scaler, label_encoder=None, compiled=None, affine=None, info=None,
+                 path=None):
+        self.version = version
+        self.path = path
+        self.model = model
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.affine = affine if affine is not None else AffineTransform.from_transformer(scaler)
+        if compiled is None:
+            try:
+                compiled = CompiledEnsemble.from_model(model)
+            except (TypeError, AttributeError):
+                # Models the exporter does not support are scored by sklearn
+                compiled = None
+        self.compiled = compiled
+        self.info = info or {}
+
+        n_inputs = getattr(model, 'n_features_in_', self.affine.n_features_out)
+        if n_inputs != self.affine.n_features_out:
+            raise ValueError(f"Version {version}: model expects {n_inputs} features, "
+                             f"preprocessing produces {self.affine.n_features_out}")
+
+    @classmethod
+    def load(cls, path, version=None):
+        """
+        Load a version directory written by training.py.
+        """
+        mmap_mode = REGISTRY.mmap_mode
+        model_path = os.path.join(path, MODEL_PATH)
+        scaler_path = os.path.join(path, SCALER_PATH)
+        encoder_path = os.path.join(path, LABEL_ENCODER_PATH)
+        model = joblib.load(model_path, mmap_mode=mmap_mode)
+        scaler = joblib.load(scaler_path, mmap_mode=mmap_mode)
+        label_encoder = joblib.load(encoder_path, mmap_mode=mmap_mode) if os.path.exists(encoder_path) else None
+        info = {}
+        if os.path.exists(os.path.join(path, METRICS_FILE)):
+            with open(os.path.join(path, METRICS_FILE)) as f:
+                info = json.load(f)
+        return cls(version or os.path.basename(os.path.normpath(path)), model, scaler, label_encoder,
+                   compiled=load_if_current(model_path, os.path.join(path, COMPILED_MODEL_PATH)),
+                   affine=AffineTransform.from_transformer(scaler, file_digest(scaler_path)), info=info,
+                   path=path)
+
+    @classmethod
+    def from_registry(cls, version=LOCAL_VERSION):
+        """
+        The set the registry currently serves (by default the working directory's files).
+        """
+        with REGISTRY.pinned():
+            try:
+                label_encoder = REGISTRY.get("label_encoder")
+            except ValueError:
+                label_encoder = None
+            return cls(version, REGISTRY.get("model"), REGISTRY.get("scaler"), label_encoder,
+                       compiled=REGISTRY.get("compiled_model"), affine=REGISTRY.get("affine"))
+
+    def artifacts(self):
+        """
+        Registry entries served by this set.
+        """
+        return {
+            "model": self.model,
+            "scaler": self.scaler,
+            "label_encoder": self.label_encoder,
+            "affine": self.affine,
+            "compiled_model": self.compiled,
+        }
+
+    def scoring_model(self, n_rows=1):
+        """
+        Same choice as model_registry.get_scoring_model, within this set.
+        """
+        if n_rows <= COMPILED_MAX_ROWS and self.compiled is not None:
+            return self.compiled
+        return self.model
+
+    def dropout_column(self, model):
+        """
+        Column of model.predict_proba holding the dropout probability.
+        """
+        from prediction import _dropout_column
+
+        return _dropout_column(model, self.label_encoder)
+
+
+class ShadowStats:
+    """
+    Running comparison of the live model and one shadow candidate.
+    """
+
+    def __init__(self, live_version, shadow_version):
+        self.live_version = live_version
+        self.shadow_version = shadow_version
+        self.calls = 0
+        self.dropped = 0
+        self.rows = 0
+        self.disagreements = 0
+        self.abs_delta_sum = 0.0
+        self.live_seconds = 0.0
+        self.shadow_seconds = 0.0
+        self.errors = 0
+
+    def to_dict(self):
+        rows = self.rows or 1
+        calls = self.calls or 1
+        return {
+            'live_version': self.live_version,
+            'shadow_version': self.shadow_version,
+            'calls': self.calls,
+            'dropped': self.dropped,
+            'rows': self.rows,
+            'disagreements': self.disagreements,
+            'disagreement_rate': self.disagreements / rows,
+            'mean_abs_probability_delta': self.abs_delta_sum / rows,
+            'live_ms_per_call': self.live_seconds / calls * 1e3,
+            'shadow_ms_per_call': self.shadow_seconds / calls * 1e3,
+            'errors': self.errors,
+        }
+
+
+class ArtifactManager:
+    """
+    Activates artifact versions and runs a shadow candidate next to the live one.
+
+    Args:
+        root: Directory holding one subdirectory per version
+    """
+
+    def __init__(self, root=ARTIFACTS_DIR):
+        self.root = root
+        self.live_version = LOCAL_VERSION
+        self.live_path = "."
+        # (version, path) of earlier live sets, most recent last
+        self.history = []
+        self.shadow = None
+        self.shadow_stats = None
+        self.shadow_sample_rate = 1.0
+        self._bridge = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(SHADOW_QUEUE_SIZE)
+        self._worker = None
+
+    def versions(self):
+        """
+        Version directories under root, oldest first.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, MODEL_PATH)))
+
+    def resolve(self, version):
+        """
+        Directory of a version name under root.
+
+        Raises:
+            ValueError: If the name is not a plain directory name, resolves
+                outside root or has no model
+        """
+        if not isinstance(version, str) or not version or version in (".", "..") \
+                or os.sep in version or (os.altsep and os.altsep in version):
+            raise ValueError(f"Invalid version name {version!r}")
+        root = os.path.realpath(self.root)
+        path = os.path.realpath(os.path.join(root, version))
+        if os.path.dirname(path) != root:
+            raise ValueError(f"Version {version!r} resolves outside {self.root}")
+        if not os.path.exists(os.path.join(path, MODEL_PATH)):
+            raise ValueError(f"No artifacts for version {version!r} in {self.root}")
+        return path
+
+    def load(self, version):
+        """
+        Load a version by name (a directory under root).
+        """
+        if isinstance(version, ArtifactSet):
+            return version
+        return ArtifactSet.load(self.resolve(version), version)
+
+    def activate(self, version):
+        """
+        Load a version completely, then swap it in for every later call.
+
+        Returns:
+            ArtifactSet: The newly live set
+
+        Raises:
+            ValueError: If a shadow candidate runs and cannot be fed from the
+                new version's preprocessed matrix; nothing is swapped then
+        """
+        artifact_set = self.load(version)
+        with self._lock:
+            # Everything that can fail happens before the swap
+            keep_shadow = self.shadow is not None and self.shadow.version != artifact_set.version
+            if keep_shadow:
+                try:
+                    bridge = self._bridge_to(self.shadow, artifact_set.affine)
+                except ValueError as e:
+                    raise ValueError(f"Cannot activate {artifact_set.version} while {self.shadow.version} "
+                                     f"runs in shadow: {e}; stop the shadow first") from e
+            REGISTRY.swap(artifact_set.artifacts(), drop=DERIVED_ARTIFACTS)
+            self.history = (self.history + [(self.live_version, self.live_path)])[-HISTORY_SIZE:]
+            self.live_version = artifact_set.version
+            self.live_path = artifact_set.path
+            METRICS.inc('dropout_model_activations_total', version=artifact_set.version)
+            if keep_shadow:
+                self._bridge = bridge
+                self.shadow_stats = ShadowStats(self.live_version, self.shadow.version)
+            elif self.shadow is not None:
+                self._clear_shadow()
+        return artifact_set
+
+    def rollback(self):
+        """
+        Re-activate the version that was live before the last activation.
+        """
+        if not self.history:
+            raise ValueError("No earlier version to roll back to")
+        version, path = self.history[-1]
+        if path is None:
+            raise ValueError(f"Version {version} was not loaded from disk and cannot be reloaded")
+        artifact_set = ArtifactSet.load(path, version)
+        self.activate(artifact_set)
+        # Rolling back is not itself a step to undo
+        self.history = self.history[:-2]
+        return artifact_set
+
+    def _bridge_to(self, candidate, live=None):
+        """
+        (M, c) mapping the live preprocessed matrix to the candidate's inputs,
+        or None when both use the same preprocessing.
+
+        Args:
+            candidate: Shadow ArtifactSet
+            live: AffineTransform of the live version (defaults to the registry's)
+        """
+        if live is None:
+            live = REGISTRY.get("affine")
+        if live.W.shape == candidate.affine.W.shape and np.allclose(live.W, candidate.affine.W) \
+                and np.allclose(live.b, candidate.affine.b):
+            return None
+        # X = (Z - b) @ pinv(W) holds when the live map keeps every input direction
+        if np.linalg.matrix_rank(live.W) < live.n_features_in:
+            raise ValueError(f"Version {candidate.version} uses different preprocessing and the live "
+                             f"preprocessing cannot be inverted; it cannot shadow from the live matrix")
+        M = np.linalg.pinv(live.W) @ candidate.affine.W
+        return M, candidate.affine.b - live.b @ M
+
+    def set_shadow(self, version, sample_rate=1.0):
+        """
+        Score live batches with a candidate version too (None to stop).
+
+        Args:
+            version: Candidate version name, or None
+            sample_rate: Share of live batches also scored by the candidate
+        """
+        if version is None:
+            with self._lock:
+                self._clear_shadow()
+            return None
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError(f"sample_rate must be in (0, 1], got {sample_rate}")
+        candidate = self.load(version)
+        with self._lock:
+            # Against the version live now, not one an activation replaces meanwhile
+            self._bridge = self._bridge_to(candidate)
+            self.shadow_stats = ShadowStats(self.live_version, candidate.version)
+            self.shadow_sample_rate = sample_rate
+            self.shadow = candidate
+        return candidate
+
+    def _clear_shadow(self):
+        self.shadow = None
+        self.shadow_stats = None
+        self._bridge = None
+
+    def promote(self):
+        """
+        Make the shadow candidate live.
+        """
+        if self.shadow is None:
+            raise ValueError("No shadow version to promote")
+        return self.activate(self.shadow)
+
+    def compare(self, processed_input, live_prediction, live_prob_dropout, live_seconds, threshold=None):
+        """
+        Queue a live batch's preprocessed matrix and results for the shadow
+        candidate; the comparison runs on the background thread.
+        """
+        if self.shadow_sample_rate < 1.0 and random.random() >= self.shadow_sample_rate:
+            return
+        with self._lock:
+            candidate, bridge, stats = self.shadow, self._bridge, self.shadow_stats
+            if candidate is None:
+                return
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_shadow, name="shadow-scoring", daemon=True)
+                self._worker.start()
+        try:
+            self._queue.put_nowait((candidate, bridge, stats, processed_input, live_prediction,
+                                    live_prob_dropout, live_seconds, threshold))
+        except queue.Full:
+            with self._lock:
+                stats.dropped += 1
+            METRICS.inc('dropout_shadow_dropped_total', version=candidate.version)
+
+    def wait(self):
+        """
+        Block until every queued batch has been compared.
+        """
+        self._queue.join()
+
+    def _run_shadow(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._compare_now(*job)
+            finally:
+                self._queue.task_done()
+
+    def _compare_now(self, candidate, bridge, stats, processed_input, live_prediction, live_prob_dropout,
+                     live_seconds, threshold):
+        """
+        Score one live batch with the shadow candidate and record latency
+        and disagreement next to the live model's.
+        """
+        n_rows = len(processed_input)
+        try:
+            shadow_input = processed_input if bridge is None else processed_input @ bridge[0] + bridge[1]
+            model = candidate.scoring_model(n_rows)
+            start = time.perf_counter()
+            probabilities = model.predict_proba(shadow_input)
+            shadow_seconds = time.perf_counter() - start
+            column = candidate.dropout_column(model)
+            prob_dropout = probabilities[:, column]
+            if threshold is None:
+                prediction = (probabilities.argmax(axis=1) == column).astype(int)
+            else:
+                prediction = (prob_dropout >= threshold).astype(int)
+        except Exception:
+            with self._lock:
+                stats.errors += 1
+            METRICS.inc('dropout_shadow_errors_total', version=candidate.version)
+            return
+
+        disagreements = int(np.count_nonzero(prediction != live_prediction))
+        abs_delta = float(np.abs(prob_dropout - live_prob_dropout).sum())
+        with self._lock:
+            stats.calls += 1
+            stats.rows += n_rows
+            stats.disagreements += disagreements
+            stats.abs_delta_sum += abs_delta
+            stats.live_seconds += live_seconds
+            stats.shadow_seconds += shadow_seconds
+        METRICS.observe('dropout_model_seconds', live_seconds, role='live', version=stats.live_version)
+        METRICS.observe('dropout_model_seconds', shadow_seconds, role='shadow', version=candidate.version)
+        METRICS.inc('dropout_shadow_rows_total', n_rows, version=candidate.version)
+        METRICS.inc('dropout_shadow_disagreements_total', disagreements, version=candidate.version)
+
+    def status(self):
+        """
+        Live and shadow versions, known versions and the shadow comparison so far.
+        """
+        return {
+            'live_version': self.live_version,
+            'shadow_version': None if self.shadow is None else self.shadow.version,
+            'shadow_sample_rate': self.shadow_sample_rate,
+            'versions': self.versions(),
+            'shadow': None if self.shadow_stats is None else self.shadow_stats.to_dict(),
+        }
+
+
+MANAGER = ArtifactManager()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versioned model artifacts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="List artifact versions and their test metrics")
+    compare = commands.add_parser("compare", help="Shadow-score a CSV with a candidate version")
+    compare.add_argument("version", help="Candidate version (name under --root)")
+    compare.add_argument("--data", default="dataset for dashboard.csv", help="CSV with the 22 model features")
+    compare.add_argument("--live", help="Version to treat as live (default: working directory files)")
+    compare.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk")
+    for command in (listing, compare):
+        command.add_argument("--root", default=ARTIFACTS_DIR, help="Directory of artifact versions")
+    args = parser.parse_args()
+
+    manager = ArtifactManager(args.root)
+    if args.command == "list":
+        for version in manager.versions():
+            with open(os.path.join(args.root, version, METRICS_FILE)) as f:
+                test = json.load(f).get('test', {})
+            print(f"{version:24} accuracy {test.get('accuracy', float('nan')):.4f}  "
+                  f"macro F1 {test.get('f1_macro', float('nan')):.4f}")
+    else:
+        import artifact_manager
+        from score_csv import iter_scored_chunks
+
+        # Scoring goes through prediction.py, which consults the module's MANAGER
+        manager = artifact_manager.MANAGER
+        manager.root = args.root
+        if args.live:
+            manager.activate(args.live)
+        manager.set_shadow(args.version)
+        for _ in iter_scored_chunks(args.data, args.chunksize):
+            # One batch in flight at a time, so none is dropped
+            manager.wait()
+        report = manager.status()['shadow']
+        print(f"live {report['live_version']} vs shadow {report['shadow_version']} on {report['rows']:,} rows")
+        print(f"  disagreement rate        {report['disagreement_rate']:.2%} ({report['disagreements']:,} rows)")
+        print(f"  mean |delta p(dropout)|  {report['mean_abs_probability_delta']:.4f}")
+        print(f"  model ms per batch       live {report['live_ms_per_call']:.2f}, "
+              f"shadow {report['shadow_ms_per_call']:.2f}")
@@ -0,0 +1,826 @@
+"""
+Benchmarks for the dropout prediction pipeline.
+
+Named micro-benchmarks compare one optimisation against the code it
+replaced and print a short table. The `suite` benchmark is the
+reproducible one: it times the public preprocessing and prediction entry
+points at batch sizes from 1 to 100k on seeded synthetic students and on
+rows sampled from the dashboard dataset, and writes latency percentiles,
+throughput and environment metadata to JSON so runs can be compared.
+
+Usage:
+    python benchmark.py trees
+    python benchmark.py suite --output bench.json
+    python benchmark.py suite --output bench.json --baseline previous.json
+    python benchmark.py compare previous.json bench.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import prediction
+from data_preprocessing import _column, preprocess_batch, preprocess_input, create_sample_input
+from drift_monitor import DRIFT
+from explanations import explain_batch
+from scenarios import default_overrides, sweep
+from model_registry import MODEL_PATH, get_affine, get_model, get_scaler
+from affine_transform import file_digest
+from feature_schema import FEATURE_RANGES, REQUIRED_FEATURES, SCHEMA
+
+DATASET_PATH = "dataset for dashboard.csv"
+
+# Batch sizes and seed used by the suite unless overridden on the command line
+SUITE_SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+SUITE_SEED = 42
+
+# Single-row timings are repeated until at least this many calls are sampled
+MIN_SAMPLES = 200
+
+# A case regresses when its p50 latency grows by more than this fraction
+DEFAULT_TOLERANCE = 0.10
+
+
+def load_processed_rows(n_rows, path=DATASET_PATH, seed=42):
+    """
+    Sample rows from the dashboard dataset and preprocess them.
+
+    Args:
+        n_rows: Number of rows to return (sampled with replacement)
+        path: CSV file shaped like "dataset for dashboard.csv"
+        seed: Random seed for the row sample
+
+    Returns:
+        Scaled numpy array of shape (n_rows, 22)
+    """
+    processed, _, _ = preprocess_batch(pd.read_csv(path), observe_drift=False)
+    rng = np.random.default_rng(seed)
+    return processed[rng.integers(0, len(processed), n_rows)]
+
+
+def time_call(func, repeat):
+    """
+    Run func repeatedly and return the median wall time in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def bench_inference(repeat=50):
+    """
+    Compare sklearn predict + predict_proba (two passes) against deriving
+    the label from a single predict_proba pass.
+    """
+    model = get_model()
+
+    for n_rows, runs in ((1, repeat), (10_000, max(3, repeat // 10))):
+        X = load_processed_rows(n_rows)
+
+        def two_pass():
+            model.predict(X)
+            model.predict_proba(X)
+
+        def single_pass():
+            model.predict_proba(X).argmax(axis=1)
+
+        two = time_call(two_pass, runs)
+        one = time_call(single_pass, runs)
+        print(f"{n_rows:>6} rows | two-pass {two * 1e3:9.3f} ms | "
+              f"single-pass {one * 1e3:9.3f} ms | "
+              f"per row {one / n_rows * 1e6:8.2f} us | speed-up {two / one:4.2f}x")
+
+
+def _list_scan_validate(input_dict):
+    """
+    Validation as preprocess_input did it before the compiled schema:
+    rebuild the lists on every call and scan them linearly.
+    """
+    feature_ranges = {f: list(codes) for f, codes in FEATURE_RANGES.items()}
+    for feature, valid_values in feature_ranges.items():
+        if feature in input_dict and input_dict[feature] not in valid_values:
+            raise ValueError(f"Invalid value for {feature}: {input_dict[feature]}")
+    if not (95.0 <= input_dict['Previous_qualification_grade'] <= 190.0):
+        raise ValueError("Previous_qualification_grade must be between 95.0 and 190.0")
+    if not (95.0 <= input_dict['Admission_grade'] <= 190.0):
+        raise ValueError("Admission_grade must be between 95.0 and 190.0")
+    if not (17 <= input_dict['Age_at_enrollment'] <= 70):
+        raise ValueError("Age_at_enrollment must be between 17 and 70")
+
+
+def bench_validation(repeat=20_000):
+    """
+    Per-call validation cost: list scans vs the compiled schema (per record
+    and vectorized).
+    """
+    record = create_sample_input()
+    # Worst case for the list scan: the last code of the longest list
+    record['Fathers_occupation'] = 195
+
+    def list_scan():
+        for _ in range(repeat):
+            _list_scan_validate(record)
+
+    def compiled():
+        for _ in range(repeat):
+            SCHEMA.validate_record(record)
+
+    row = np.array([[record[f] for f in SCHEMA.features]], dtype=np.float64)
+    X = np.repeat(row, 100_000, axis=0)
+
+    before = time_call(list_scan, 5) / repeat
+    after = time_call(compiled, 5) / repeat
+    vectorized = time_call(lambda: SCHEMA.validate_array(X), 5) / len(X)
+
+    print(f"list scan         {before * 1e6:8.2f} us/record")
+    print(f"compiled record   {after * 1e6:8.2f} us/record ({before / after:4.1f}x)")
+    print(f"compiled array    {vectorized * 1e6:8.3f} us/record ({before / vectorized:4.0f}x)")
+
+
+def bench_affine(repeat=200):
+    """
+    sklearn scaler.transform vs the folded X @ W + b at 1 and 100k rows.
+    """
+    scaler, affine = get_scaler(), get_affine()
+    for n_rows, runs in ((1, repeat), (100_000, max(3, repeat // 20))):
+        X = np.random.default_rng(0).normal(size=(n_rows, affine.n_features_in))
+        sklearn_time = time_call(lambda: scaler.transform(X), runs)
+        f64 = time_call(lambda: affine.transform(X), runs)
+        X32 = X.astype(np.float32)
+        f32 = time_call(lambda: affine.transform(X32, dtype=np.float32), runs)
+        print(f"{n_rows:>6} rows | sklearn {sklearn_time * 1e3:8.3f} ms | "
+              f"affine f64 {f64 * 1e3:8.3f} ms ({sklearn_time / f64:5.1f}x) | "
+              f"affine f32 {f32 * 1e3:8.3f} ms ({sklearn_time / f32:5.1f}x)")
+
+
+_COLD_START_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import prediction
+from data_preprocessing import create_sample_input
+imported = time.perf_counter()
+prediction.predict_with_interpretation(create_sample_input(), observe_drift=False)
+done = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first_prediction': done - imported,
+                  'load_times': prediction.REGISTRY.load_times()}))
+"""
+
+
+def bench_cold_start(repeat=3):
+    """
+    Cold start in a fresh interpreter: import cost vs first prediction,
+    with and without memory-mapped joblib loading.
+    """
+    for mmap_mode in ("", "r"):
+        env = dict(os.environ, DROPOUT_MMAP_MODE=mmap_mode, PYTHONWARNINGS="ignore")
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", _COLD_START_SCRIPT], env=env,
+                                 capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+        imported = np.median([r['import'] for r in runs])
+        first = np.median([r['first_prediction'] for r in runs])
+        loads = ", ".join(f"{name} {seconds * 1e3:.1f} ms"
+                          for name, seconds in runs[-1]['load_times'].items())
+        print(f"mmap_mode={mmap_mode or 'None':4} | import {imported * 1e3:7.1f} ms | "
+              f"first prediction {first * 1e3:7.1f} ms | {loads}")
+
+
+def bench_parallel(n_rows=200_000):
+    """
+    Throughput of parallel_scoring at 1, 2, 4 and 8 workers.
+    """
+    from parallel_scoring import score_matrix_parallel
+
+    record = create_sample_input()
+    X = np.repeat([[record[f] for f in SCHEMA.features]], n_rows, axis=0).astype(np.float64)
+    print(f"{os.cpu_count()} CPU cores available")
+
+    baseline = None
+    for workers in (1, 2, 4, 8):
+        seconds = time_call(lambda: score_matrix_parallel(X, workers=workers), 3)
+        baseline = baseline or seconds
+        print(f"{workers} workers | {n_rows / seconds:>10,.0f} rows/s | "
+              f"speed-up {baseline / seconds:4.2f}x")
+
+
+def bench_trees(repeat=50):
+    """
+    sklearn predict_proba vs the compiled flat-array ensemble at 1, 100 and 100k rows.
+    """
+    from compiled_trees import CompiledEnsemble
+
+    model = get_model()
+    compiled = CompiledEnsemble.from_model(model)
+    for n_rows, runs in ((1, repeat), (100, repeat), (100_000, 3)):
+        X = load_processed_rows(n_rows)
+        sklearn_time = time_call(lambda: model.predict_proba(X), runs)
+        compiled_time = time_call(lambda: compiled.predict_proba(X), runs)
+        max_diff = np.max(np.abs(model.predict_proba(X) - compiled.predict_proba(X)))
+        print(f"{n_rows:>6} rows | sklearn {sklearn_time * 1e3:9.3f} ms | "
+              f"compiled {compiled_time * 1e3:9.3f} ms ({sklearn_time / compiled_time:5.1f}x) | "
+              f"max diff {max_diff:.1e}")
+
+
+def bench_metrics(repeat=20_000):
+    """
+    Cost of the always-on stage timers and counters per call.
+    """
+    from metrics import METRICS
+
+    record = create_sample_input()
+    processed = preprocess_input(record, observe_drift=False)
+    cases = (
+        ('preprocess_input', lambda: preprocess_input(record, observe_drift=False)),
+        ('predict_dropout', lambda: prediction.predict_dropout(processed)),
+        ('predict_with_interpretation', lambda: prediction.predict_with_interpretation(record, observe_drift=False)),
+    )
+    enabled = METRICS.enabled
+    try:
+        for name, func in cases:
+            runs = repeat if name == 'preprocess_input' else repeat // 10
+            # Alternate off/on rounds and keep the best of each, so drift
+            # on a busy machine does not land on one side
+            timings = {False: float('inf'), True: float('inf')}
+            for _ in range(7):
+                for state in (False, True):
+                    METRICS.enabled = state
+                    timings[state] = min(timings[state], time_call(lambda: [func() for _ in range(runs)], 1) / runs)
+            print(f"{name:28} | off {timings[False] * 1e6:7.2f} us | on {timings[True] * 1e6:7.2f} us | "
+                  f"overhead {(timings[True] - timings[False]) * 1e6:5.2f} us")
+    finally:
+        METRICS.enabled = enabled
+
+
+_COLUMNAR_LOAD_SCRIPT = """
+import json, sys, time
+import numpy as np
+mode, path = sys.argv[1], sys.argv[2]
+
+def peak_rss_kb():
+    # VmHWM resets on exec, unlike ru_maxrss which children inherit
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+
+if mode == 'csv':
+    import pandas as pd
+    from data_preprocessing import _column
+    from feature_schema import REQUIRED_FEATURES
+else:
+    from columnar_dataset import ColumnarDataset
+base = peak_rss_kb()
+start = time.perf_counter()
+if mode == 'csv':
+    frame = pd.read_csv(path)
+    X = np.column_stack([_column(frame, f) for f in REQUIRED_FEATURES])
+else:
+    X = ColumnarDataset.open(path).features
+loaded = time.perf_counter()
+checksum = float(np.asarray(X, dtype=np.float64).sum())
+touched = time.perf_counter()
+print(json.dumps({'load': loaded - start, 'first_pass': touched - loaded,
+                  'rss_mb': (peak_rss_kb() - base) / 1024,
+                  'checksum': checksum}))
+"""
+
+
+def bench_columnar(repeat=3, tile=50):
+    """
+    Time and peak-RSS growth to get the 22-feature matrix from CSV vs the
+    memory-mapped columnar format, on the dashboard file and a tiled copy.
+    """
+    import tempfile
+
+    from columnar_dataset import DATA_FILE, convert_csv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tiled = os.path.join(tmp, "tiled.csv")
+        frame = pd.read_csv(DATASET_PATH)
+        pd.concat([frame] * tile, ignore_index=True).to_csv(tiled, index=False)
+
+        for path in (DATASET_PATH, tiled):
+            columns = os.path.join(tmp, os.path.basename(path) + ".cols")
+            start = time.perf_counter()
+            meta = convert_csv(path, columns)
+            convert_seconds = time.perf_counter() - start
+            total = os.path.getsize(os.path.join(columns, DATA_FILE))
+            feature_bytes = total - meta['features']['offset']
+            print(f"{meta['rows']:>8,} rows | CSV {os.path.getsize(path) / 1e6:6.1f} MB -> "
+                  f"columns {(total - feature_bytes) / 1e6:6.1f} MB + feature matrix "
+                  f"{feature_bytes / 1e6:6.1f} MB (converted in {convert_seconds:.2f} s)")
+
+            results = {}
+            for mode, source in (('csv', path), ('columnar', columns)):
+                runs = []
+                for _ in range(repeat):
+                    out = subprocess.run([sys.executable, "-c", _COLUMNAR_LOAD_SCRIPT, mode, source],
+                                         capture_output=True, text=True, check=True,
+                                         env=dict(os.environ, PYTHONWARNINGS="ignore")).stdout
+                    runs.append(json.loads(out.strip().splitlines()[-1]))
+                results[mode] = {key: float(np.median([r[key] for r in runs]))
+                                 for key in ('load', 'first_pass', 'rss_mb', 'checksum')}
+                print(f"         {mode:9} | load {results[mode]['load'] * 1e3:9.2f} ms | "
+                      f"first pass {results[mode]['first_pass'] * 1e3:7.2f} ms | "
+                      f"peak RSS +{results[mode]['rss_mb']:6.1f} MB")
+            if not np.isclose(results['csv']['checksum'], results['columnar']['checksum'], rtol=1e-6):
+                print("         ⚠️ feature matrices differ")
+
+
+def bench_cube(repeat=20, tile=50):
+    """
+    Dashboard aggregates from the pre-aggregated cube vs regrouping the rows
+    with pandas, plus the cost of an incremental append vs a rebuild.
+    """
+    from dashboard_cube import DashboardCube
+
+    frame = pd.read_csv(DATASET_PATH)
+    frame = pd.concat([frame] * tile, ignore_index=True)
+    start = time.perf_counter()
+    cube = DashboardCube.from_frame(frame)
+    build_seconds = time.perf_counter() - start
+    print(f"{len(frame):,} rows -> {cube.n_cells:,} cells, {len(cube.cuboids)} cuboids "
+          f"(built in {build_seconds:.2f} s)")
+
+    age_bands = pd.cut(frame['Age_at_enrollment'], [17, 20, 23, 26, 31, 41, np.inf], right=False)
+    dropout = frame['Status'] == 'Dropout'
+    debtors = frame['Debtor'] == 'Yes'
+    cases = (
+        ('by Course', lambda: dropout.groupby(frame['Course']).mean(),
+         lambda: cube.query(['Course'])),
+        ('by Tuition x Debtor', lambda: dropout.groupby([frame['Tuition_fees_up_to_date'], frame['Debtor']]).mean(),
+         lambda: cube.query(['Tuition_fees_up_to_date', 'Debtor'])),
+        ('by Scholarship_holder', lambda: dropout.groupby(frame['Scholarship_holder']).mean(),
+         lambda: cube.query(['Scholarship_holder'])),
+        ('by age band', lambda: dropout.groupby(age_bands, observed=True).mean(),
+         lambda: cube.query(['Age_band'])),
+        ('Course x Gender | debtors', lambda: dropout[debtors].groupby(
+            [frame['Course'][debtors], frame['Gender'][debtors]]).mean(),
+         lambda: cube.query(['Course', 'Gender'], where={'Debtor': 'Yes'})),
+        ('Course x Gender x Scholarship', lambda: dropout.groupby(
+            [frame['Course'], frame['Gender'], frame['Scholarship_holder']]).mean(),
+         lambda: cube.query(['Course', 'Gender', 'Scholarship_holder'])),
+    )
+    for name, rows, cubed in cases:
+        rows_seconds = time_call(rows, repeat)
+        cube_seconds = time_call(cubed, repeat)
+        print(f"{name:30} | rows {rows_seconds * 1e3:8.2f} ms | cube {cube_seconds * 1e3:7.3f} ms | "
+              f"{rows_seconds / cube_seconds:7.1f}x")
+
+    new_rows = frame.iloc[:1000]
+    append_seconds = time_call(lambda: cube.append(new_rows), 5)
+    print(f"append 1,000 rows: {append_seconds * 1e3:.1f} ms (rebuild {build_seconds * 1e3:,.0f} ms)")
+
+
+def bench_scenarios(repeat=5, cohort_rows=1_000):
+    """
+    What-if grid for one student: one round trip per variant against one sweep.
+    """
+    record = create_sample_input()
+    overrides = default_overrides()
+    variants = [dict(record, **dict(zip(overrides, combination)))
+                for combination in zip(*(column.ravel() for column in np.meshgrid(*overrides.values(), indexing='ij')))]
+
+    def per_variant():
+        return [prediction.predict_dropout(preprocess_input(variant, observe_drift=False)) for variant in variants]
+
+    # Sweeps are synthetic traffic and must leave the drift monitor untouched
+    drift_before = (DRIFT.rows_seen, DRIFT.pending_rows, DRIFT.counts.copy())
+    sweep(record, overrides)
+    loop = time_call(per_variant, repeat)
+    batched = time_call(lambda: sweep(record, overrides), repeat)
+    print(f"{len(variants)} scenarios | per-variant {loop * 1e3:8.2f} ms | sweep {batched * 1e3:6.2f} ms "
+          f"({loop / batched:.0f}x)")
+
+    cohort = pd.read_csv(DATASET_PATH).head(cohort_rows)
+    seconds = time_call(lambda: sweep(cohort, overrides), 1)
+    n_rows = len(cohort) * len(variants)
+    print(f"cohort of {len(cohort):,} x {len(variants)} scenarios | sweep {seconds:.2f} s "
+          f"({n_rows / seconds:,.0f} scenario rows/s)")
+    assert (DRIFT.rows_seen, DRIFT.pending_rows) == drift_before[:2] \
+        and np.array_equal(DRIFT.counts, drift_before[2]), "scenario sweeps fed the drift monitor"
+
+
+def bench_topk(n_rows=2_000_000, chunksize=50_000, k=20):
+    """
+    Streaming top-K early-warning ranking vs sorting the whole scored population.
+    """
+    from early_warning import TopKRanking
+
+    rng = np.random.default_rng(0)
+    probability = rng.random(n_rows)
+    course = rng.choice(FEATURE_RANGES['Course'], n_rows)
+    rows = np.arange(n_rows)
+
+    start = time.perf_counter()
+    ranking = TopKRanking(k)
+    for i in range(0, n_rows, chunksize):
+        ranking.update(probability[i:i + chunksize], course[i:i + chunksize], rows[i:i + chunksize])
+    frame = ranking.to_frame()
+    streaming = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scored = pd.DataFrame({'row': rows, 'Course': course, 'probability_dropout': probability})
+    ordered = scored.sort_values(['probability_dropout', 'row'], ascending=[False, True])
+    expected = pd.concat([ordered.head(k), ordered.groupby('Course', sort=True).head(k)])
+    full_sort = time.perf_counter() - start
+
+    assert sorted(frame['row']) == sorted(expected['row'])
+    held = sum(len(ranking.ranked(scope)) for scope in [None] + ranking.courses)
+    print(f"{n_rows:,} scores in chunks of {chunksize:,}, k={k}, {len(ranking.courses)} courses")
+    print(f"streaming heaps: {streaming * 1e3:8.1f} ms, {held:,} entries held")
+    print(f"full sort:       {full_sort * 1e3:8.1f} ms, {scored.memory_usage().sum() / 1e6:.0f} MB materialized")
+
+
+def bench_drift(repeat=20, tile=10):
+    """
+    Overhead of the drift monitor on batch and single-record scoring.
+    """
+    frame = pd.read_csv(DATASET_PATH)
+    X = np.column_stack([_column(frame, f) for f in REQUIRED_FEATURES])
+    X = np.tile(X, (tile, 1))
+    record = create_sample_input()
+    cases = (
+        (f'batch of {len(X):,}',
+         lambda observe: prediction.predict_dropout_batch(X, observe_drift=observe), repeat),
+        ('single record',
+         lambda observe: prediction.predict_dropout(preprocess_input(record, observe_drift=observe)), repeat * 500),
+    )
+
+    enabled = DRIFT.enabled
+    DRIFT.enabled = True
+    scoring = {}
+    try:
+        for name, func, n in cases:
+            func(False)
+            # Alternate the two settings so drift in machine load hits both
+            timings = {True: [], False: []}
+            for _ in range(5):
+                for setting in (True, False):
+                    timings[setting].append(time_call(lambda: func(setting), max(n // 5, 1)))
+            with_drift, without = np.median(timings[True]), np.median(timings[False])
+            scoring[name] = without
+            print(f"{name:18} without {without * 1e3:8.3f} ms | with drift {with_drift * 1e3:8.3f} ms "
+                  f"({(with_drift - without) / without:+.1%})")
+        observe = time_call(lambda: DRIFT.observe(X), repeat)
+    finally:
+        # The benchmark rows are not traffic
+        DRIFT.enabled = enabled
+        DRIFT.reset()
+    print(f"DRIFT.observe alone on {len(X):,} rows: {observe * 1e3:.2f} ms "
+          f"({observe / scoring[cases[0][0]]:.1%} of scoring the batch)")
+
+
+def bench_shadow(repeat=20):
+    """
+    Cost of loading and swapping an artifact set, and of shadow scoring on live calls.
+
+    The working-directory artifacts stand in for the candidate version, so
+    the shadow scores every batch a second time with an identical model.
+    """
+    from artifact_manager import MANAGER, ArtifactSet
+
+    start = time.perf_counter()
+    candidate = ArtifactSet.load(".", "candidate")
+    load_seconds = time.perf_counter() - start
+    swap = time_call(lambda: MANAGER.activate(candidate), repeat)
+    MANAGER.rollback()
+    print(f"load artifact set {load_seconds * 1e3:.1f} ms | swap into the registry {swap * 1e6:.0f} us")
+
+    frame = pd.read_csv(DATASET_PATH)
+    X = np.column_stack([_column(frame, f) for f in REQUIRED_FEATURES])
+    record = create_sample_input()
+    cases = (
+        (f'batch of {len(X):,}', lambda: prediction.predict_dropout_batch(X, observe_drift=False), repeat),
+        ('single record', lambda: prediction.predict_with_interpretation(record, observe_drift=False), repeat * 100),
+    )
+    for name, func, n in cases:
+        MANAGER.set_shadow(None)
+        func()
+        live = time_call(func, n)
+        for sample_rate in (1.0, 0.1):
+            MANAGER.set_shadow(candidate, sample_rate)
+            func()
+            shadowed = time_call(func, n)
+            # Live calls only queue the comparison; include the background
+            # work still pending, which competes for the same cores
+            start = time.perf_counter()
+            MANAGER.wait()
+            pending = (time.perf_counter() - start) / n
+            stats = MANAGER.status()['shadow']
+            print(f"{name:18} live only {live * 1e3:8.3f} ms | shadow {sample_rate:>4.0%} "
+                  f"{shadowed * 1e3:8.3f} ms ({(shadowed - live) / live:+.0%}) "
+                  f"+ {pending * 1e3:.3f} ms drained | disagreement {stats['disagreement_rate']:.2%}")
+    MANAGER.set_shadow(None)
+
+
+def bench_explain(repeat=5, sizes=(1, 100, 4_424, 44_240)):
+    """
+    Cost of per-feature explanations relative to scoring the same batch.
+    """
+    frame = pd.read_csv(DATASET_PATH)
+    frame = pd.concat([frame] * math.ceil(max(sizes) / len(frame)), ignore_index=True)
+    X = np.column_stack([_column(frame, f) for f in REQUIRED_FEATURES])
+    explain_batch(X[:1])
+    for n_rows in sizes:
+        batch = X[:n_rows]
+        score = time_call(lambda: prediction.predict_dropout_batch(batch, observe_drift=False), repeat)
+        explain = time_call(lambda: explain_batch(batch), repeat)
+        bare = time_call(lambda: explain_batch(batch, top_k=0), repeat)
+        print(f"{n_rows:>7,} rows | score {score * 1e3:8.2f} ms | explain {explain * 1e3:8.2f} ms "
+              f"({explain / score:4.1f}x) | without factor lists {bare * 1e3:8.2f} ms ({bare / score:4.1f}x)")
+
+
+def load_dataset_records(n_rows, path=DATASET_PATH, seed=SUITE_SEED):
+    """
+    Sample valid rows from the dashboard dataset as input dictionaries.
+
+    Text labels are decoded to model codes, so the records can be passed
+    to preprocess_input exactly like form input.
+
+    Returns:
+        list: n_rows dictionaries (sampled with replacement)
+    """
+    data = pd.read_csv(path, usecols=REQUIRED_FEATURES)
+    X = np.column_stack([_column(data, f) for f in REQUIRED_FEATURES])
+    valid = np.ones(len(X), dtype=bool)
+    for bad in SCHEMA.validate_array(X).values():
+        valid &= ~bad
+    X = X[valid]
+
+    rng = np.random.default_rng(seed)
+    X = X[rng.integers(0, len(X), n_rows)]
+    columns = {}
+    for feature in REQUIRED_FEATURES:
+        values = X[:, SCHEMA.index[feature]]
+        is_int = feature in SCHEMA.categorical or feature == 'Age_at_enrollment'
+        columns[feature] = (values.astype(np.int64) if is_int else values).tolist()
+    return [{f: columns[f][i] for f in REQUIRED_FEATURES} for i in range(n_rows)]
+
+
+def suite_inputs(source, n_rows, seed=SUITE_SEED):
+    """
+    Inputs for one suite source: records, their raw matrix and scaled matrix.
+
+    Args:
+        source: 'synthetic' (random valid codes) or 'dataset' (sampled rows)
+        n_rows: Number of students
+        seed: Random seed
+
+    Returns:
+        tuple: (records, X, processed)
+    """
+    if source == 'synthetic':
+        records = SCHEMA.random_records(n_rows, seed)
+    elif source == 'dataset':
+        records = load_dataset_records(n_rows, seed=seed)
+    else:
+        raise ValueError(f"Unknown source: {source}")
+    X = np.array([[r[f] for f in REQUIRED_FEATURES] for r in records], dtype=np.float64)
+    return records, X, get_affine().transform(X)
+
+
+# Suite cases: name -> (kind, callable). 'record' cases are called once per
+# student; 'batch' cases take the whole batch in one call.
+SUITE_CASES = {
+    'preprocess_input': ('record', lambda record, row: preprocess_input(record, observe_drift=False)),
+    'predict_dropout': ('record', lambda record, row: prediction.predict_dropout(row)),
+    'predict_dropout_simple': ('record', lambda record, row: prediction.predict_dropout_simple(row)),
+    'predict_with_interpretation': (
+        'record', lambda record, row: prediction.predict_with_interpretation(record, observe_drift=False)),
+    'preprocess_batch': ('batch', lambda records, X: preprocess_batch(X, observe_drift=False)),
+    'predict_dropout_batch': ('batch', lambda records, X: prediction.predict_dropout_batch(X, observe_drift=False)),
+    'predict_with_interpretation_batch': (
+        'batch', lambda records, X: prediction.predict_with_interpretation_batch(records, observe_drift=False)),
+    'explain_batch': ('batch', lambda records, X: explain_batch(X)),
+}
+
+
+def _latency_summary(samples):
+    samples = np.asarray(samples) * 1e3
+    return {
+        'mean': float(samples.mean()),
+        'min': float(samples.min()),
+        'p50': float(np.percentile(samples, 50)),
+        'p90': float(np.percentile(samples, 90)),
+        'p99': float(np.percentile(samples, 99)),
+        'max': float(samples.max()),
+    }
+
+
+def _time_case(kind, func, records, X, processed, n_rows):
+    """
+    Per-call latency samples (seconds) and total rows processed for one case.
+    """
+    samples = []
+    if kind == 'record':
+        # One sample per student; small batches are repeated for a stable tail
+        func(records[0], processed[:1])
+        for _ in range(math.ceil(MIN_SAMPLES / n_rows)):
+            for i in range(n_rows):
+                row = processed[i:i + 1]
+                start = time.perf_counter()
+                func(records[i], row)
+                samples.append(time.perf_counter() - start)
+        return samples, len(samples)
+
+    # One sample per batch; about 100k rows in total, between 3 and MIN_SAMPLES calls
+    batch_records, batch_X = records[:n_rows], X[:n_rows]
+    func(batch_records, batch_X)
+    for _ in range(min(MIN_SAMPLES, max(3, 100_000 // n_rows))):
+        start = time.perf_counter()
+        func(batch_records, batch_X)
+        samples.append(time.perf_counter() - start)
+    return samples, len(samples) * n_rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_metadata():
+    """
+    Interpreter, library versions, hardware and artifact identity for a run.
+    """
+    import joblib
+    import sklearn
+
+    try:
+        model_digest = file_digest(MODEL_PATH)
+    except OSError:
+        model_digest = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scikit_learn': sklearn.__version__,
+        'joblib': joblib.__version__,
+        'git_commit': _git_commit(),
+        'model_digest': model_digest,
+        'mmap_mode': os.environ.get('DROPOUT_MMAP_MODE', ''),
+    }
+
+
+def run_suite(sizes=SUITE_SIZES, sources=('synthetic', 'dataset'), cases=None, seed=SUITE_SEED,
+              verbose=True):
+    """
+    Time every suite case at every batch size on every input source.
+
+    Args:
+        sizes: Batch sizes (number of students)
+        sources: Input sources, see suite_inputs
+        cases: Case names from SUITE_CASES (defaults to all)
+        seed: Random seed for the inputs
+
+    Returns:
+        dict: {'environment': ..., 'config': ..., 'results': [...]}, JSON-serialisable
+    """
+    cases = list(cases or SUITE_CASES)
+    results = []
+    for source in sources:
+        records, X, processed = suite_inputs(source, max(sizes), seed)
+        for name in cases:
+            kind, func = SUITE_CASES[name]
+            for n_rows in sizes:
+                samples, total_rows = _time_case(kind, func, records, X, processed, n_rows)
+                latency = _latency_summary(samples)
+                rows_per_second = total_rows / sum(samples)
+                results.append({
+                    'case': name,
+                    'source': source,
+                    'batch_size': n_rows,
+                    'calls': len(samples),
+                    'latency_ms': latency,
+                    'rows_per_second': rows_per_second,
+                })
+                if verbose:
+                    print(f"{source:9} {name:34} {n_rows:>7} rows | "
+                          f"p50 {latency['p50']:9.3f} ms | p99 {latency['p99']:9.3f} ms | "
+                          f"{rows_per_second:>12,.0f} rows/s", flush=True)
+
+    return {
+        'environment': environment_metadata(),
+        'config': {'sizes': list(sizes), 'sources': list(sources), 'cases': cases,
+                   'seed': seed, 'min_samples': MIN_SAMPLES},
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Match cases between two suite runs and flag p50 latency regressions.
+
+    Returns:
+        list: One dict per case present in both runs, with the p50 ratio
+            (current / baseline) and a 'regression' flag
+    """
+    key = lambda r: (r['source'], r['case'], r['batch_size'])
+    previous = {key(r): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        ratio = result['latency_ms']['p50'] / before['latency_ms']['p50']
+        rows.append({
+            'case': result['case'],
+            'source': result['source'],
+            'batch_size': result['batch_size'],
+            'baseline_p50_ms': before['latency_ms']['p50'],
+            'current_p50_ms': result['latency_ms']['p50'],
+            'ratio': ratio,
+            'regression': ratio > 1.0 + tolerance,
+        })
+    return rows
+
+
+def print_comparison(rows, tolerance=DEFAULT_TOLERANCE):
+    """
+    Print a comparison table and return the number of regressions.
+    """
+    for row in rows:
+        flag = "REGRESSION" if row['regression'] else ""
+        print(f"{row['source']:9} {row['case']:34} {row['batch_size']:>7} rows | "
+              f"{row['baseline_p50_ms']:9.3f} -> {row['current_p50_ms']:9.3f} ms "
+              f"({row['ratio']:5.2f}x) {flag}")
+    regressions = sum(row['regression'] for row in rows)
+    print(f"{len(rows)} cases compared, {regressions} slower than {1 + tolerance:.2f}x baseline")
+    return regressions
+
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+BENCHMARKS = {
+    'inference': bench_inference,
+    'validation': bench_validation,
+    'affine': bench_affine,
+    'cold_start': bench_cold_start,
+    'parallel': bench_parallel,
+    'trees': bench_trees,
+    'metrics': bench_metrics,
+    'columnar': bench_columnar,
+    'cube': bench_cube,
+    'explain': bench_explain,
+    'scenarios': bench_scenarios,
+    'topk': bench_topk,
+    'drift': bench_drift,
+    'shadow': bench_shadow,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the dropout prediction pipeline")
+    parser.add_argument("name", choices=sorted(BENCHMARKS) + ['compare', 'suite'],
+                        help="Benchmark to run")
+    parser.add_argument("files", nargs="*", help="compare: BASELINE.json CURRENT.json")
+    parser.add_argument("--output", help="suite: write results to this JSON file")
+    parser.add_argument("--baseline", help="suite: compare against a previous JSON run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES),
+                        help="suite: batch sizes")
+    parser.add_argument("--sources", nargs="+", default=['synthetic', 'dataset'],
+                        choices=['synthetic', 'dataset'], help="suite: input sources")
+    parser.add_argument("--cases", nargs="+", choices=list(SUITE_CASES), help="suite: cases to run")
+    parser.add_argument("--seed", type=int, default=SUITE_SEED, help="suite: input seed")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed p50 slowdown before a case counts as a regression")
+    args = parser.parse_args()
+
+    if args.name == 'suite':
+        report = run_suite(args.sizes, args.sources, args.cases, args.seed)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Results written to {args.output}")
+        if args.baseline:
+            rows = compare_results(_load_json(args.baseline), report, args.tolerance)
+            sys.exit(1 if print_comparison(rows, args.tolerance) else 0)
+    elif args.name == 'compare':
+        if len(args.files) != 2:
+            parser.error("compare needs BASELINE.json and CURRENT.json")
+        baseline, current = (_load_json(path) for path in args.files)
+        rows = compare_results(baseline, current, args.tolerance)
+        sys.exit(1 if print_comparison(rows, args.tolerance) else 0)
+    else:
+        BENCHMARKS[args.name]()
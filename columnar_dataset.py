@@ -0,0 +1,314 @@
+"""
+Columnar, memory-mapped storage for dashboard-style student extracts.
+
+The converter streams a CSV twice: once to collect each column's range,
+null and label statistics, and once to write every column as a contiguous,
+typed block of a single data file:
+
+    categorical codes   smallest integer dtype holding the schema's code set
+    text columns        dictionary-encoded integers, labels kept in meta.json
+    grades and rates    float32
+    other integers      smallest integer dtype holding the observed range
+
+The 22 model features are also written as one C-contiguous float32 block
+in REQUIRED_FEATURES order, so the model matrix opens as a zero-copy view
+of the memory map instead of being parsed and assembled again.
+
+Usage:
+    python columnar_dataset.py "dataset for dashboard.csv" dashboard.cols
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import _column
+from feature_schema import DASHBOARD_LABELS, REQUIRED_FEATURES, SCHEMA
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+DATA_FILE = "columns.bin"
+
+# Block offsets are aligned for vectorized loads
+ALIGNMENT = 64
+
+# Integer code written for missing or unreadable values
+NULL_CODE = -1
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def smallest_int_dtype(low, high):
+    """
+    Narrowest NumPy integer dtype holding every value in [low, high].
+    """
+    for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class _ColumnStats:
+    """
+    Pass-one statistics for one CSV column.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.text = False
+        self.integral = True
+        self.has_null = False
+        self.low = None
+        self.high = None
+        self.labels = set()
+
+    def update(self, values):
+        if self.name in SCHEMA.features:
+            # Decoded to model codes, so labelled columns count as numeric
+            self._update_numeric(_column({self.name: values}, self.name))
+        elif values.dtype.kind in 'biuf':
+            self._update_numeric(values.to_numpy(dtype=np.float64))
+        else:
+            self.text = True
+            self.has_null |= bool(values.isna().any())
+            self.labels.update(str(v) for v in pd.unique(values.dropna()))
+
+    def _update_numeric(self, values):
+        finite = values[~np.isnan(values)]
+        self.has_null |= len(finite) < len(values)
+        if not len(finite):
+            return
+        self.integral &= bool(np.all(finite == np.round(finite)))
+        low, high = finite.min(), finite.max()
+        self.low = low if self.low is None else min(self.low, low)
+        self.high = high if self.high is None else max(self.high, high)
+
+    def describe(self):
+        """
+        Column metadata: kind, dtype and the dictionary for text columns.
+        """
+        name = self.name
+        meta = {'name': name}
+        bounds = [] if self.low is None else [self.low, self.high]
+
+        if self.text:
+            meta['kind'] = 'dictionary'
+            meta['dictionary'] = {label: code for code, label in enumerate(sorted(self.labels))}
+            bounds = [0, max(len(self.labels) - 1, 0)]
+        elif name in SCHEMA.categorical:
+            meta['kind'] = 'code'
+            if name in DASHBOARD_LABELS:
+                meta['dictionary'] = dict(DASHBOARD_LABELS[name])
+            codes = SCHEMA.codes(name)
+            bounds += [codes[0], codes[-1]]
+        elif self.integral and not (name in SCHEMA.continuous
+                                    and isinstance(SCHEMA.continuous[name][0], float)):
+            meta['kind'] = 'integer'
+            bounds += list(SCHEMA.continuous.get(name, ()))
+        else:
+            meta['kind'] = 'float'
+            meta['dtype'] = 'float32'
+            return meta
+
+        if self.has_null:
+            bounds.append(NULL_CODE)
+            meta['null_code'] = NULL_CODE
+        meta['dtype'] = smallest_int_dtype(min(bounds, default=0), max(bounds, default=0)).name
+        return meta
+
+
+def _encode(values, meta, decoded=None):
+    """
+    Encode one chunk of a CSV column with the column's metadata.
+
+    decoded: The column already decoded to model codes (schema features)
+    """
+    dtype = np.dtype(meta['dtype'])
+    if meta['kind'] == 'float':
+        return values.to_numpy(dtype=np.float64).astype(dtype)
+
+    if meta['kind'] == 'dictionary':
+        codes = values.map(lambda v: meta['dictionary'].get(str(v), NULL_CODE) if pd.notna(v) else NULL_CODE)
+        return codes.to_numpy(dtype=np.int64).astype(dtype)
+
+    if decoded is None:
+        decoded = values.to_numpy(dtype=np.float64)
+    decoded = np.where(np.isnan(decoded), NULL_CODE, decoded)
+    return decoded.astype(dtype)
+
+
+def convert_csv(input_path, output_dir, chunksize=DEFAULT_CHUNKSIZE, sep=","):
+    """
+    Convert a CSV extract into the columnar format.
+
+    Args:
+        input_path: CSV shaped like "dataset for dashboard.csv"
+        output_dir: Directory to create (meta.json and columns.bin)
+        chunksize: Rows parsed at a time in both passes
+
+    Returns:
+        dict: The metadata written to meta.json
+    """
+    stats = None
+    n_rows = 0
+    for chunk in pd.read_csv(input_path, sep=sep, chunksize=chunksize):
+        if stats is None:
+            stats = [_ColumnStats(name) for name in chunk.columns]
+        for column in stats:
+            column.update(chunk[column.name])
+        n_rows += len(chunk)
+
+    columns = [column.describe() for column in stats]
+    missing = SCHEMA.missing([column['name'] for column in columns])
+    if missing:
+        raise ValueError(f"Missing required features: {missing}")
+
+    offset = 0
+    for column in columns:
+        offset = _align(offset)
+        column['offset'] = offset
+        offset += n_rows * np.dtype(column['dtype']).itemsize
+    features = {'offset': _align(offset), 'dtype': 'float32', 'columns': list(REQUIRED_FEATURES)}
+    size = features['offset'] + n_rows * len(REQUIRED_FEATURES) * 4
+
+    os.makedirs(output_dir, exist_ok=True)
+    data_path = os.path.join(output_dir, DATA_FILE)
+    data = np.memmap(data_path, dtype=np.uint8, mode='w+', shape=(max(size, 1),))
+    feature_matrix = data[features['offset']:size].view(np.float32).reshape(n_rows, -1)
+
+    start = 0
+    for chunk in pd.read_csv(input_path, sep=sep, chunksize=chunksize):
+        stop = start + len(chunk)
+        decoded = {f: _column(chunk, f) for f in REQUIRED_FEATURES}
+        for column in columns:
+            dtype = np.dtype(column['dtype'])
+            block = data[column['offset']:column['offset'] + n_rows * dtype.itemsize].view(dtype)
+            block[start:stop] = _encode(chunk[column['name']], column, decoded.get(column['name']))
+        feature_matrix[start:stop] = np.column_stack([decoded[f] for f in REQUIRED_FEATURES])
+        start = stop
+    data.flush()
+    del data, feature_matrix
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'rows': n_rows,
+        'source': os.path.basename(str(input_path)),
+        'columns': columns,
+        'features': features,
+    }
+    with open(os.path.join(output_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class ColumnarDataset:
+    """
+    Read-only view of a converted dataset.
+
+    Opening maps columns.bin once; columns and the feature matrix are
+    zero-copy views of that map, so nothing is read until it is touched.
+
+    Args:
+        path: Directory written by convert_csv
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if self.meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version {self.meta['format_version']}")
+        self.n_rows = self.meta['rows']
+        self._columns = {column['name']: column for column in self.meta['columns']}
+        data_path = os.path.join(path, DATA_FILE)
+        self._data = np.memmap(data_path, dtype=np.uint8, mode='r') if os.path.getsize(data_path) else \
+            np.empty(0, dtype=np.uint8)
+
+    @classmethod
+    def open(cls, path):
+        return cls(path)
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def column_meta(self, name):
+        return self._columns[name]
+
+    def column(self, name):
+        """
+        Stored (encoded) values of one column as a zero-copy view.
+        """
+        column = self._columns[name]
+        dtype = np.dtype(column['dtype'])
+        start = column['offset']
+        return self._data[start:start + self.n_rows * dtype.itemsize].view(dtype)
+
+    def decoded(self, name):
+        """
+        One column with dictionary codes mapped back to their labels (a copy).
+
+        Missing values become None in text columns and NaN in numeric ones.
+        """
+        column = self._columns[name]
+        values = self.column(name)
+        if 'dictionary' in column:
+            labels = {code: label for label, code in column['dictionary'].items()}
+            # Unlabelled codes (e.g. invalid ones in schema columns) stay numeric
+            fallback = None if column['kind'] == 'dictionary' else np.nan
+            return np.array([labels.get(code, fallback if code == NULL_CODE else code)
+                             for code in values.tolist()], dtype=object)
+        if 'null_code' in column:
+            decoded = values.astype(np.float64)
+            decoded[values == column['null_code']] = np.nan
+            return decoded
+        return values
+
+    @property
+    def features(self):
+        """
+        (n_rows, 22) float32 matrix in REQUIRED_FEATURES order, zero-copy.
+        Unreadable values are NaN, so preprocess_batch reports them.
+        """
+        features = self.meta['features']
+        start = features['offset']
+        stop = start + self.n_rows * len(features['columns']) * 4
+        return self._data[start:stop].view(np.float32).reshape(self.n_rows, len(features['columns']))
+
+    def to_frame(self, columns=None, decode=True):
+        """
+        pandas DataFrame of the selected columns (copies the data).
+        """
+        columns = columns or self.columns
+        getter = self.decoded if decode else self.column
+        return pd.DataFrame({name: getter(name) for name in columns})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a CSV extract to memory-mapped columns")
+    parser.add_argument("input", help="CSV file shaped like 'dataset for dashboard.csv'")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument("--sep", default=",", help="CSV field separator")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = convert_csv(args.input, args.output, args.chunksize, args.sep)
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(os.path.join(args.output, DATA_FILE))
+    print(f"✅ Converted {meta['rows']:,} rows x {len(meta['columns'])} columns in {seconds:.2f} s "
+          f"({size / 1e6:.1f} MB)")
+    for column in meta['columns']:
+        print(f"   {column['name']:45} {column['kind']:10} {column['dtype']}")
@@ -0,0 +1,410 @@
+"""
+Gradient-boosting ensemble compiled into flat, array-backed trees.
+
+The exporter concatenates every tree of the fitted GradientBoostingClassifier
+into contiguous NumPy arrays (feature index, threshold, left/right child,
+leaf value, per-tree learning rate). The evaluator walks all trees for a
+whole batch at once with vectorized indexing, skipping sklearn's per-call
+validation, which dominates single-row latency. sklearn's compiled tree
+loops stay faster for large batches, so prediction.py only routes batches
+of up to COMPILED_MAX_ROWS rows here.
+
+Usage:
+    python compiled_trees.py    # export gboost_model.joblib and verify it
+"""
+
+import joblib
+import numpy as np
+from scipy import sparse
+
+from affine_transform import file_digest
+
+MODEL_PATH = "gboost_model.joblib"
+COMPILED_MODEL_PATH = "gboost_compiled.npz"
+
+# Largest batch scored with the compiled ensemble; above this sklearn is faster
+COMPILED_MAX_ROWS = 256
+
+# Rows evaluated together; bounds the (rows x trees) index buffers
+BLOCK_SIZE = 256
+
+# Deepest tree padded to a complete binary layout; deeper ensembles walk
+# the child arrays instead
+MAX_PADDED_DEPTH = 12
+
+
+def export_arrays(model):
+    """
+    Flatten a fitted GradientBoostingClassifier into arrays.
+
+    Args:
+        model: Fitted sklearn GradientBoostingClassifier
+
+    Returns:
+        dict: Arrays accepted by CompiledEnsemble
+    """
+    if model.init not in (None, "zero"):
+        raise TypeError("Only the default prior or 'zero' init estimator can be compiled")
+    if model.loss not in ("log_loss", "deviance", "exponential"):
+        raise TypeError(f"Unsupported loss: {model.loss}")
+
+    n_stages, n_outputs = model.estimators_.shape
+    n_features = model.n_features_in_
+
+    features, thresholds, lefts, rights, values, covers = [], [], [], [], [], []
+    roots = np.empty(n_stages * n_outputs, dtype=np.int32)
+    tree_output = np.empty(n_stages * n_outputs, dtype=np.int32)
+    offset = 0
+    for t, estimator in enumerate(model.estimators_.ravel()):
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(tree.node_count)
+
+        roots[t] = offset
+        tree_output[t] = t % n_outputs
+        # Leaves point to themselves so a fixed number of steps always lands on a leaf
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+        values.append(tree.value[:, 0, 0])
+        covers.append(tree.weighted_n_node_samples)
+        offset += tree.node_count
+
+    if model.init == "zero":
+        init_raw = np.zeros(n_outputs)
+    else:
+        init_raw = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64),
+        "cover": np.concatenate(covers).astype(np.float64),
+        "root": roots,
+        "tree_output": tree_output,
+        "learning_rate": np.full(n_stages * n_outputs, model.learning_rate),
+        "init_raw": np.asarray(init_raw, dtype=np.float64),
+        "max_depth": np.int32(max(e.tree_.max_depth for e in model.estimators_.ravel())),
+        "classes": np.asarray(model.classes_),
+        "exponential": np.bool_(model.loss == "exponential"),
+        "n_features": np.int32(n_features),
+    }
+
+
+class CompiledEnsemble:
+    """
+    Pure-NumPy evaluator for an exported gradient-boosting ensemble.
+
+    Exposes classes_, predict_proba and predict so it can stand in for the
+    sklearn model in prediction.py.
+    """
+
+    def __init__(self, arrays, source_digest=""):
+        self.feature = np.ascontiguousarray(arrays["feature"])
+        self.threshold = np.ascontiguousarray(arrays["threshold"])
+        self.left = np.ascontiguousarray(arrays["left"])
+        self.right = np.ascontiguousarray(arrays["right"])
+        self.value = np.ascontiguousarray(arrays["value"])
+        # Training weight reaching each node; absent from older exports
+        self.cover = np.ascontiguousarray(arrays["cover"]) if "cover" in arrays else None
+        self.root = np.ascontiguousarray(arrays["root"])
+        self.tree_output = np.ascontiguousarray(arrays["tree_output"])
+        self.learning_rate = np.ascontiguousarray(arrays["learning_rate"])
+        self.init_raw = np.asarray(arrays["init_raw"])
+        self.max_depth = int(arrays["max_depth"])
+        self.classes_ = np.asarray(arrays["classes"])
+        self.exponential = bool(arrays["exponential"])
+        self.n_features_in_ = int(arrays["n_features"])
+        self.source_digest = source_digest
+        self._expected = None
+        self._leaf_contributions = None
+
+        self.n_outputs = len(self.init_raw)
+        # Leaf values pre-scaled by their stage's learning rate
+        self._scaled_value = self.value.copy()
+        for t, root in enumerate(self.root):
+            stop = self.root[t + 1] if t + 1 < len(self.root) else len(self.value)
+            self._scaled_value[root:stop] *= self.learning_rate[t]
+
+        self._padded = self.max_depth <= MAX_PADDED_DEPTH
+        if self._padded:
+            self._build_padded_layout()
+
+    def _build_padded_layout(self):
+        """
+        Re-lay every tree as a complete binary tree of depth max_depth.
+
+        Children are then found arithmetically (2 * i + 1 + went_right), so
+        each level costs two table lookups instead of four. Leaves above the
+        full depth become pass-through splits that always go left.
+        """
+        depth = self.max_depth
+        n_trees = len(self.root)
+        n_internal = 2 ** depth - 1
+        feature = np.zeros((n_trees, n_internal), dtype=np.intp)
+        threshold = np.full((n_trees, n_internal), np.inf)
+        leaf_value = np.zeros((n_trees, n_internal + 1))
+        leaf_node = np.zeros((n_trees, n_internal + 1), dtype=np.intp)
+
+        for t, root in enumerate(self.root):
+            stack = [(root, 0, 0)]
+            while stack:
+                node, position, level = stack.pop()
+                if level == depth:
+                    leaf_value[t, position - n_internal] = self._scaled_value[node]
+                    leaf_node[t, position - n_internal] = node
+                    continue
+                feature[t, position] = self.feature[node]
+                threshold[t, position] = self.threshold[node]
+                stack.append((self.left[node], 2 * position + 1, level + 1))
+                stack.append((self.right[node], 2 * position + 2, level + 1))
+
+        self._padded_feature = feature.ravel()
+        self._padded_threshold = threshold.ravel()
+        self._padded_leaf_value = leaf_value.ravel()
+        self._padded_leaf_node = leaf_node.ravel()
+        self._tree_base = np.arange(n_trees)[None, :] * n_internal
+        self._leaf_base = np.arange(n_trees)[None, :] * (n_internal + 1) - n_internal
+
+    @classmethod
+    def from_model(cls, model, source_digest=""):
+        return cls(export_arrays(model), source_digest)
+
+    def save(self, path=COMPILED_MODEL_PATH):
+        arrays = {
+            "feature": self.feature, "threshold": self.threshold, "left": self.left,
+            "right": self.right, "value": self.value, "root": self.root,
+            "tree_output": self.tree_output, "learning_rate": self.learning_rate,
+            "init_raw": self.init_raw, "max_depth": self.max_depth, "classes": self.classes_,
+            "exponential": self.exponential, "n_features": self.n_features_in_,
+        }
+        if self.cover is not None:
+            arrays["cover"] = self.cover
+        np.savez(path, source_digest=self.source_digest, **arrays)
+
+    @classmethod
+    def load(cls, path=COMPILED_MODEL_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        return cls(arrays, str(arrays.pop("source_digest")))
+
+    def apply(self, X):
+        """
+        Leaf node index reached in every tree.
+
+        Args:
+            X: Array of shape (n_rows, n_features)
+
+        Returns:
+            Array of shape (n_rows, n_trees) with flat node indices
+        """
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.root, (len(X), len(self.root))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def _leaves(self, X, trees):
+        """
+        Leaf node reached in each of the given trees, shape (n_rows, len(trees)).
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if not self._padded:
+            rows = np.arange(len(X))[:, None]
+            node = np.broadcast_to(self.root[trees], (len(X), len(trees))).copy()
+            for _ in range(self.max_depth):
+                go_left = X[rows, self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, self.left[node], self.right[node])
+            return node
+        n_internal = 2 ** self.max_depth - 1
+        tree_base = trees[None, :] * n_internal
+        flat_X = X.ravel()
+        row_base = (np.arange(len(X)) * X.shape[1])[:, None]
+        position = np.zeros((len(X), len(trees)), dtype=np.intp)
+        for _ in range(self.max_depth):
+            node = tree_base + position
+            went_right = flat_X[row_base + self._padded_feature[node]] > self._padded_threshold[node]
+            position = 2 * position + 1 + went_right
+        return self._padded_leaf_node[trees[None, :] * (n_internal + 1) + position - n_internal]
+
+    def _padded_contributions(self, X):
+        """
+        Scaled leaf value of every tree, using the complete-tree layout.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        flat_X = X.ravel()
+        row_base = (np.arange(len(X)) * X.shape[1])[:, None]
+        position = np.zeros((len(X), len(self.root)), dtype=np.intp)
+        for _ in range(self.max_depth):
+            node = self._tree_base + position
+            went_right = flat_X[row_base + self._padded_feature[node]] > self._padded_threshold[node]
+            position = 2 * position + 1 + went_right
+        return self._padded_leaf_value[self._leaf_base + position]
+
+    def decision_function(self, X):
+        """
+        Raw ensemble scores of shape (n_rows, n_outputs).
+        """
+        X = np.asarray(X)
+        raw = np.empty((len(X), self.n_outputs))
+        for start in range(0, len(X), BLOCK_SIZE):
+            block = X[start:start + BLOCK_SIZE]
+            if self._padded:
+                contributions = self._padded_contributions(block)
+            else:
+                contributions = self._scaled_value[self.apply(block)]
+            summed = contributions.reshape(len(block), -1, self.n_outputs).sum(axis=1)
+            raw[start:start + BLOCK_SIZE] = summed + self.init_raw
+        return raw
+
+    def node_expectations(self):
+        """
+        Expected scaled value of every node: the cover-weighted mean of the
+        leaves below it, so each split's change in expectation is the part
+        of the prediction that split decides.
+        """
+        if self._expected is None:
+            if self.cover is None:
+                raise ValueError("Ensemble was exported without node cover; re-export it "
+                                 "with compiled_trees.py")
+            nodes = np.arange(len(self.value))
+            internal = self.left != nodes
+            depth = np.full(len(self.value), -1)
+            depth[self.root] = 0
+            for level in range(self.max_depth):
+                parents = nodes[internal & (depth == level)]
+                depth[self.left[parents]] = depth[self.right[parents]] = level + 1
+
+            expected = self._scaled_value.copy()
+            for level in range(self.max_depth - 1, -1, -1):
+                parents = nodes[internal & (depth == level)]
+                left, right = self.left[parents], self.right[parents]
+                expected[parents] = ((self.cover[left] * expected[left] + self.cover[right] * expected[right])
+                                     / (self.cover[left] + self.cover[right]))
+            self._expected = expected
+        return self._expected
+
+    def expected_value(self):
+        """
+        Raw score before any split is taken, per output (the attribution base).
+        """
+        expected = self.node_expectations()[self.root]
+        return self.init_raw + np.bincount(self.tree_output, weights=expected, minlength=self.n_outputs)
+
+    def leaf_contributions(self):
+        """
+        Path attribution of every node, shape (n_nodes, n_features): each
+        split from the root down credits its change in expected value to
+        the split feature. A row's attribution in a tree is that of its leaf.
+        """
+        if self._leaf_contributions is None:
+            expected = self.node_expectations()
+            nodes = np.arange(len(self.value))
+            internal = self.left != nodes
+            contributions = np.zeros((len(self.value), self.n_features_in_))
+            parents = self.root
+            while len(parents):
+                parents = parents[internal[parents]]
+                for children in (self.left[parents], self.right[parents]):
+                    contributions[children] = contributions[parents]
+                    contributions[children, self.feature[parents]] += expected[children] - expected[parents]
+                parents = np.concatenate([self.left[parents], self.right[parents]])
+            self._leaf_contributions = contributions
+        return self._leaf_contributions
+
+    def contributions(self, X, output=0):
+        """
+        Path attribution of one output's raw score to the model features.
+
+        For each row, expected_value()[output] + contributions(X, output).sum(axis=1)
+        equals decision_function(X)[:, output]. Only the trees of that
+        output are walked.
+
+        Returns:
+            Array of shape (n_rows, n_features)
+        """
+        leaf_contributions = self.leaf_contributions()
+        trees = np.flatnonzero(self.tree_output == output)
+        leaves = np.empty((len(X), len(trees)), dtype=np.intp)
+        for start in range(0, len(X), BLOCK_SIZE):
+            leaves[start:start + BLOCK_SIZE] = self._leaves(X[start:start + BLOCK_SIZE], trees)
+        # Summing the leaves' rows is a sparse (rows x nodes) indicator product
+        indicator = sparse.csr_matrix(
+            (np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, max(len(trees), 1))),
+            shape=(len(X), len(leaf_contributions)))
+        return np.asarray(indicator @ leaf_contributions)
+
+    def predict_proba(self, X):
+        raw = self.decision_function(X)
+        if self.n_outputs == 1:
+            if self.exponential:
+                raw = 2.0 * raw
+            prob = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - prob, prob])
+        raw -= raw.max(axis=1, keepdims=True)
+        np.exp(raw, out=raw)
+        raw /= raw.sum(axis=1, keepdims=True)
+        return raw
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def build(source=MODEL_PATH, path=COMPILED_MODEL_PATH):
+    """
+    Export gboost_model.joblib to the compiled artifact.
+    """
+    compiled = CompiledEnsemble.from_model(joblib.load(source), file_digest(source))
+    compiled.save(path)
+    return compiled
+
+
+def load_if_current(source=MODEL_PATH, path=COMPILED_MODEL_PATH):
+    """
+    Load the compiled ensemble if it was exported from the current model file.
+
+    Returns:
+        CompiledEnsemble, or None if the artifact is missing or stale
+    """
+    try:
+        compiled = CompiledEnsemble.load(path)
+    except (OSError, KeyError, ValueError):
+        return None
+    if compiled.source_digest != file_digest(source):
+        return None
+    return compiled
+
+
+def verify(model, compiled, X, atol=1e-9):
+    """
+    Check compiled predict_proba against sklearn on X.
+
+    Returns:
+        float: Largest absolute probability difference
+    """
+    expected = model.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    max_diff = float(np.max(np.abs(actual - expected)))
+    if max_diff > atol:
+        raise AssertionError(f"Compiled ensemble differs from sklearn by {max_diff:.2e}")
+    return max_diff
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    from data_preprocessing import preprocess_batch
+
+    compiled = build()
+    print(f"✅ Exported {MODEL_PATH} -> {COMPILED_MODEL_PATH} "
+          f"({len(compiled.root)} trees, {len(compiled.value)} nodes)")
+
+    X, _, _ = preprocess_batch(pd.read_csv("dataset for dashboard.csv"), observe_drift=False)
+    max_diff = verify(joblib.load(MODEL_PATH), compiled, X)
+    print(f"✅ Matches sklearn predict_proba on {len(X)} rows (max abs diff {max_diff:.2e})")
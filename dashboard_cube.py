@@ -0,0 +1,457 @@
+"""
+Pre-aggregated cube for the institutional dropout dashboard.
+
+Rows are reduced once into counts (students, and students per Status) and
+sums of the grade and age columns over the categorical dimensions of
+FEATURE_RANGES plus an age band. Two structures hold the aggregates:
+
+    cuboids     dense arrays for the grand total, every dimension and every
+                pair of dimensions; charts such as dropout rate by Course or
+                by Tuition_fees_up_to_date x Debtor read one of these
+    base cells  one entry per distinct combination of all dimensions, for
+                drill-downs and slices that touch three or more dimensions
+
+Both are updated in place by append(), so new rows never trigger a rebuild
+and queries never rescan rows.
+
+Usage:
+    python dashboard_cube.py build "dataset for dashboard.csv" cube.npz
+    python dashboard_cube.py query cube.npz --by Course --where Debtor=Yes
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import _column
+from feature_schema import DASHBOARD_LABELS, FEATURE_RANGES, SCHEMA
+
+FORMAT_VERSION = 1
+
+STATUS_COLUMN = 'Status'
+STATUS_LABELS = ('Dropout', 'Enrolled', 'Graduate')
+
+# Lower edges of the Age_at_enrollment bands; the last band is open-ended
+AGE_BAND = 'Age_band'
+AGE_BAND_EDGES = (17, 20, 23, 26, 31, 41)
+
+# Dimensions: the categorical features plus the derived age band
+DIMENSIONS = tuple(FEATURE_RANGES) + (AGE_BAND,)
+
+# Numeric columns summed per cell; a sum is kept with its non-missing count
+SUM_COLUMNS = (
+    'Admission_grade', 'Previous_qualification_grade', 'Age_at_enrollment',
+    'Curricular_units_1st_sem_approved', 'Curricular_units_1st_sem_grade',
+    'Curricular_units_2nd_sem_approved', 'Curricular_units_2nd_sem_grade',
+)
+
+MEASURES = (('count',) + STATUS_LABELS
+            + tuple(f"{prefix}_{column}" for column in SUM_COLUMNS for prefix in ('sum', 'n')))
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def _age_band_labels(edges=AGE_BAND_EDGES):
+    bounds = list(edges[1:])
+    labels = [f"{low}-{high - 1}" for low, high in zip(edges, bounds)]
+    return tuple(labels + [f"{edges[-1]}+"])
+
+
+def dimension_values(dimension):
+    """
+    Values of a dimension in slot order. Each dimension has one extra slot
+    after these for missing, invalid or out-of-range values (labelled None).
+    """
+    if dimension == AGE_BAND:
+        return _age_band_labels()
+    return tuple(SCHEMA.codes(dimension))
+
+
+def _slots(data, dimension, other):
+    """
+    Slot index of every row for one dimension, as uint8.
+    """
+    if dimension == AGE_BAND:
+        age = _column(data, 'Age_at_enrollment')
+        band = np.searchsorted(AGE_BAND_EDGES, np.nan_to_num(age, nan=-1.0), side='right') - 1
+        return np.where(band < 0, other, band).astype(np.uint8)
+
+    values = _column(data, dimension)
+    codes = SCHEMA.codes(dimension)
+    table = np.full(codes[-1] + 1, other, dtype=np.uint8)
+    table[codes] = np.arange(len(codes))
+    readable = (values >= 0) & (values <= codes[-1]) & (values == np.round(values))
+    slots = np.full(len(values), other, dtype=np.uint8)
+    slots[readable] = table[values[readable].astype(np.int64)]
+    return slots
+
+
+def _measures(data, n_rows):
+    """
+    (n_rows, len(MEASURES)) float64 matrix of each row's contribution.
+    """
+    M = np.zeros((n_rows, len(MEASURES)))
+    M[:, 0] = 1.0
+    if STATUS_COLUMN in data:
+        status = np.asarray(data[STATUS_COLUMN]).astype(str)
+        for k, label in enumerate(STATUS_LABELS, start=1):
+            M[:, k] = status == label
+    for k, column in enumerate(SUM_COLUMNS):
+        if column not in data:
+            continue
+        values = _column(data, column)
+        present = ~np.isnan(values)
+        M[:, 1 + len(STATUS_LABELS) + 2 * k] = np.where(present, values, 0.0)
+        M[:, 2 + len(STATUS_LABELS) + 2 * k] = present
+    return M
+
+
+def _group_sum(groups, n_groups, M):
+    """
+    Sum the rows of M per group id with a single bincount.
+    """
+    m = M.shape[1]
+    flat = (groups[:, None] * m + np.arange(m)).ravel()
+    return np.bincount(flat, weights=M.ravel(), minlength=n_groups * m).reshape(n_groups, m)
+
+
+class DashboardCube:
+    """
+    Incrementally maintained counts and sums over the dashboard dimensions.
+
+    Args:
+        dimensions: Dimension names (defaults to DIMENSIONS)
+        max_cuboid_dims: Largest dimension combination kept as a dense cuboid
+    """
+
+    def __init__(self, dimensions=DIMENSIONS, max_cuboid_dims=2):
+        unknown = [d for d in dimensions if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {unknown}")
+        self.dimensions = tuple(dimensions)
+        self.values = {d: dimension_values(d) for d in self.dimensions}
+        # One slot per value plus the trailing "other" slot
+        self.sizes = {d: len(values) + 1 for d, values in self.values.items()}
+        self.n_rows = 0
+
+        self.cuboids = {}
+        for k in range(max_cuboid_dims + 1):
+            for key in itertools.combinations(self.dimensions, k):
+                shape = tuple(self.sizes[d] for d in key) + (len(MEASURES),)
+                self.cuboids[key] = np.zeros(shape)
+
+        self._cell_ids = {}
+        self._cell_slots = np.zeros((0, len(self.dimensions)), dtype=np.uint8)
+        self._cell_measures = np.zeros((0, len(MEASURES)))
+        self.n_cells = 0
+
+    @classmethod
+    def from_frame(cls, frame, **kwargs):
+        cube = cls(**kwargs)
+        cube.append(frame)
+        return cube
+
+    @classmethod
+    def from_csv(cls, path, chunksize=DEFAULT_CHUNKSIZE, sep=",", **kwargs):
+        """
+        Build a cube in one streaming pass over a CSV shaped like
+        "dataset for dashboard.csv".
+        """
+        cube = cls(**kwargs)
+        for chunk in pd.read_csv(path, sep=sep, chunksize=chunksize):
+            cube.append(chunk)
+        return cube
+
+    # Updates
+
+    def append(self, data):
+        """
+        Add rows to every cuboid and to the base cells.
+
+        Args:
+            data: DataFrame with the dimension features (codes or dashboard
+                labels) and optionally Status and the SUM_COLUMNS
+        """
+        required = [d for d in self.dimensions if d != AGE_BAND]
+        if AGE_BAND in self.dimensions:
+            required.append('Age_at_enrollment')
+        missing = [f for f in required if f not in data]
+        if missing:
+            raise ValueError(f"Missing required features: {missing}")
+        n_rows = len(data)
+        if not n_rows:
+            return
+
+        slots = np.column_stack([_slots(data, d, self.sizes[d] - 1) for d in self.dimensions])
+        M = _measures(data, n_rows)
+
+        # Base cells: collapse the rows to distinct combinations first
+        keys = np.ascontiguousarray(slots).view(np.dtype((np.void, slots.shape[1]))).ravel()
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        ids = np.array([self._cell_ids.setdefault(key, len(self._cell_ids))
+                        for key in unique.tolist()], dtype=np.int64)
+        new = ids >= self.n_cells
+        if new.any():
+            self._grow(len(self._cell_ids))
+            self._cell_slots[ids[new]] = slots[first[new]]
+            self.n_cells = len(self._cell_ids)
+        sums = _group_sum(inverse.ravel(), len(unique), M)
+        self._cell_measures[ids] += sums
+
+        # Cuboids are folded from the chunk's distinct cells, not its rows
+        cell_slots = slots[first].astype(np.int64)
+        for key, table in self.cuboids.items():
+            flat = np.zeros(len(unique), dtype=np.int64)
+            for d in key:
+                flat = flat * self.sizes[d] + cell_slots[:, self.dimensions.index(d)]
+            n_cells = int(np.prod([self.sizes[d] for d in key], dtype=np.int64))
+            table.reshape(n_cells, -1)[:] += _group_sum(flat, n_cells, sums)
+
+        self.n_rows += n_rows
+
+    def _grow(self, n_cells):
+        capacity = len(self._cell_slots)
+        if n_cells <= capacity:
+            return
+        capacity = max(n_cells, 2 * capacity, 1024)
+        slots = np.zeros((capacity, len(self.dimensions)), dtype=np.uint8)
+        measures = np.zeros((capacity, len(MEASURES)))
+        slots[:self.n_cells] = self._cell_slots[:self.n_cells]
+        measures[:self.n_cells] = self._cell_measures[:self.n_cells]
+        self._cell_slots, self._cell_measures = slots, measures
+
+    # Queries
+
+    def _slot_of(self, dimension, value):
+        if value is None:
+            return self.sizes[dimension] - 1
+        values = self.values[dimension]
+        if dimension != AGE_BAND:
+            value = DASHBOARD_LABELS.get(dimension, {}).get(value, value)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                pass
+        try:
+            return values.index(value)
+        except ValueError:
+            raise ValueError(f"Unknown value for {dimension}: {value!r}. Valid values: {list(values)}") \
+                from None
+
+    def _filters(self, where):
+        filters = {}
+        for dimension, selected in (where or {}).items():
+            if dimension not in self.sizes:
+                raise ValueError(f"Unknown dimension: {dimension}")
+            if isinstance(selected, (list, tuple, set, frozenset, np.ndarray)):
+                filters[dimension] = sorted({self._slot_of(dimension, v) for v in selected})
+            else:
+                filters[dimension] = [self._slot_of(dimension, selected)]
+        return filters
+
+    def query(self, by=(), where=None, labels=False):
+        """
+        Aggregates grouped by some dimensions over a slice of the others.
+
+        Args:
+            by: Dimensions to group by, e.g. ('Tuition_fees_up_to_date', 'Debtor')
+            where: Mapping of dimension to one value or a list of values,
+                e.g. {'Scholarship_holder': 1, 'Course': [9254, 9500]};
+                dashboard labels such as "Yes" are accepted
+            labels: Show dashboard labels instead of codes in the index
+
+        Returns:
+            DataFrame indexed by the `by` values (groups without students
+            omitted) with count, the Status counts, dropout_rate and the
+            sum and mean of each SUM_COLUMNS column
+        """
+        by = tuple(by)
+        unknown = [d for d in by if d not in self.sizes]
+        if unknown:
+            raise ValueError(f"Unknown dimensions: {unknown}")
+        filters = self._filters(where)
+        key = tuple(d for d in self.dimensions if d in by or d in filters)
+
+        if key in self.cuboids:
+            groups, totals = self._from_cuboid(key, by, filters)
+        else:
+            groups, totals = self._from_cells(by, filters)
+        return self._frame(by, groups, totals, labels)
+
+    def drill_down(self, by, dimension, where=None, labels=False):
+        """
+        Split each group of query(by, where) further by one more dimension.
+        """
+        return self.query(tuple(by) + (dimension,), where, labels)
+
+    def _from_cuboid(self, key, by, filters):
+        table = self.cuboids[key]
+        for axis, d in enumerate(key):
+            if d in filters:
+                table = table.take(filters[d], axis=axis)
+        # Sum out the sliced dimensions, then order the axes as requested
+        summed = tuple(axis for axis, d in enumerate(key) if d not in by)
+        table = table.sum(axis=summed) if summed else table
+        remaining = [d for d in key if d in by]
+        table = np.moveaxis(table, [remaining.index(d) for d in by], range(len(by)))
+
+        shape = table.shape[:-1]
+        groups = np.stack(np.unravel_index(np.arange(int(np.prod(shape, dtype=np.int64))), shape),
+                          axis=1) if by else np.zeros((1, 0), dtype=np.int64)
+        # Map positions back to slots for filtered axes
+        for column, d in enumerate(by):
+            if d in filters:
+                groups[:, column] = np.asarray(filters[d])[groups[:, column]]
+        return groups, table.reshape(-1, len(MEASURES))
+
+    def _from_cells(self, by, filters):
+        slots = self._cell_slots[:self.n_cells]
+        measures = self._cell_measures[:self.n_cells]
+        mask = np.ones(self.n_cells, dtype=bool)
+        for d, selected in filters.items():
+            mask &= np.isin(slots[:, self.dimensions.index(d)], selected)
+        slots, measures = slots[mask], measures[mask]
+
+        if not by:
+            return np.zeros((1, 0), dtype=np.int64), measures.sum(axis=0, keepdims=True)
+        columns = slots[:, [self.dimensions.index(d) for d in by]]
+        groups, inverse = np.unique(columns, axis=0, return_inverse=True)
+        return groups.astype(np.int64), _group_sum(inverse.ravel(), len(groups), measures)
+
+    def _label(self, dimension, slot, labels):
+        values = self.values[dimension]
+        if slot >= len(values):
+            return None
+        value = values[slot]
+        if labels and dimension in DASHBOARD_LABELS:
+            return {code: label for label, code in DASHBOARD_LABELS[dimension].items()}.get(value, value)
+        return value
+
+    def _frame(self, by, groups, totals, labels):
+        keep = totals[:, 0] > 0
+        if by:
+            groups, totals = groups[keep], totals[keep]
+        count = totals[:, 0]
+        columns = {'count': count.astype(np.int64)}
+        for k, label in enumerate(STATUS_LABELS, start=1):
+            columns[label] = totals[:, k].astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['dropout_rate'] = totals[:, 1] / count
+            for k, column in enumerate(SUM_COLUMNS):
+                total = totals[:, 1 + len(STATUS_LABELS) + 2 * k]
+                present = totals[:, 2 + len(STATUS_LABELS) + 2 * k]
+                columns[f"sum_{column}"] = total
+                columns[f"mean_{column}"] = total / present
+
+        if not by:
+            return pd.DataFrame(columns, index=pd.Index(['All']))
+        values = [[self._label(d, slot, labels) for slot in groups[:, k].tolist()] for k, d in enumerate(by)]
+        if len(by) == 1:
+            index = pd.Index(values[0], name=by[0])
+        else:
+            index = pd.MultiIndex.from_arrays(values, names=by)
+        return pd.DataFrame(columns, index=index)
+
+    # Persistence
+
+    def save(self, path):
+        """
+        Write the cube to an .npz file.
+        """
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'dimensions': list(self.dimensions),
+            'values': {d: list(values) for d, values in self.values.items()},
+            'measures': list(MEASURES),
+            'n_rows': self.n_rows,
+        }
+        arrays = {f"cuboid:{'|'.join(key)}": table for key, table in self.cuboids.items()}
+        np.savez_compressed(
+            path, meta=np.array(json.dumps(meta)),
+            cell_slots=self._cell_slots[:self.n_cells],
+            cell_measures=self._cell_measures[:self.n_cells], **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a cube written by save(); it can keep receiving append() calls.
+
+        Raises:
+            ValueError: If the cube was built with another schema or measures
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            cuboids = {tuple(name[len('cuboid:'):].split('|')) if name != 'cuboid:' else ():
+                       data[name] for name in data.files if name.startswith('cuboid:')}
+            cell_slots, cell_measures = data['cell_slots'], data['cell_measures']
+
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported cube format version {meta['format_version']}")
+        cube = cls(meta['dimensions'], max_cuboid_dims=0)
+        stored = {d: tuple(values) for d, values in meta['values'].items()}
+        if stored != cube.values or tuple(meta['measures']) != MEASURES:
+            raise ValueError("Cube was built with a different schema; rebuild it from the rows")
+
+        cube.cuboids = {key: np.array(table) for key, table in cuboids.items()}
+        cube.n_rows = meta['n_rows']
+        cube.n_cells = len(cell_slots)
+        cube._cell_slots = np.array(cell_slots)
+        cube._cell_measures = np.array(cell_measures)
+        cube._cell_ids = {row.tobytes(): i for i, row in enumerate(cube._cell_slots)}
+        return cube
+
+
+def _parse_where(items):
+    where = {}
+    for item in items or ():
+        dimension, _, values = item.partition("=")
+        values = [v if v != "" else None for v in values.split(",")]
+        where[dimension] = values if len(values) > 1 else values[0]
+    return where
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the dashboard aggregation cube")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build a cube from a CSV extract")
+    build.add_argument("input", help="CSV file shaped like 'dataset for dashboard.csv'")
+    build.add_argument("output", help="Cube file (.npz)")
+    build.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    build.add_argument("--sep", default=",", help="CSV field separator")
+
+    append = commands.add_parser("append", help="Add the rows of a CSV extract to an existing cube")
+    append.add_argument("cube", help="Cube file (.npz), updated in place")
+    append.add_argument("input", help="CSV file with the new rows")
+    append.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    append.add_argument("--sep", default=",", help="CSV field separator")
+
+    query = commands.add_parser("query", help="Print an aggregate from a cube")
+    query.add_argument("cube", help="Cube file (.npz)")
+    query.add_argument("--by", nargs="*", default=[], help="Dimensions to group by")
+    query.add_argument("--where", nargs="*", help="Filters such as Debtor=Yes or Course=9254,9500")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "build":
+        cube = DashboardCube.from_csv(args.input, args.chunksize, args.sep)
+        cube.save(args.output)
+        print(f"✅ Aggregated {cube.n_rows:,} rows into {cube.n_cells:,} cells and "
+              f"{len(cube.cuboids)} cuboids in {time.perf_counter() - start:.2f} s")
+    elif args.command == "append":
+        cube = DashboardCube.load(args.cube)
+        before = cube.n_rows
+        for chunk in pd.read_csv(args.input, sep=args.sep, chunksize=args.chunksize):
+            cube.append(chunk)
+        cube.save(args.cube)
+        print(f"✅ Added {cube.n_rows - before:,} rows ({cube.n_rows:,} total) "
+              f"in {time.perf_counter() - start:.2f} s")
+    else:
+        cube = DashboardCube.load(args.cube)
+        with pd.option_context('display.max_rows', 200, 'display.max_columns', None, 'display.width', 200):
+            print(cube.query(args.by, _parse_where(args.where), labels=True)
+                  [['count', *STATUS_LABELS, 'dropout_rate', 'mean_Admission_grade']])
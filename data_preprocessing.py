@@ -1,73 +1,50 @@
+from collections import Counter
+from time import perf_counter
+
 import numpy as np
-import joblib
 
-# Load scaler
-scaler = joblib.load("scaler_pca.joblib")
+from drift_monitor import DRIFT
+from feature_schema import REQUIRED_FEATURES, DASHBOARD_LABELS, MISSING, SCHEMA, FeatureError
+from metrics import METRICS
+from model_registry import get_affine, get_scaler
+
+
+def __getattr__(name):
+    # The scaler and its folded X @ W + b form are loaded lazily on first use
+    if name == 'scaler':
+        return get_scaler()
+    if name == 'affine':
+        return get_affine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def preprocess_input(input_dict):
+
+def preprocess_input(input_dict, observe_drift=True):
     """
     Preprocess input data for the student success prediction model.
     
     Args:
         input_dict: Dictionary containing all required features
+        observe_drift: Feed the record to the drift monitor; pass False for
+            synthetic input (what-if variants, benchmarks)
     
     Returns:
         Scaled numpy array ready for model prediction
     """
     
-    # Feature validation - check if all required features are present
-    required_features = [
-        'Marital_status', 'Application_mode', 'Application_order', 'Course',
-        'Daytime_evening_attendance', 'Previous_qualification', 'Previous_qualification_grade',
-        'Nacionality', 'Mothers_qualification', 'Fathers_qualification',
-        'Mothers_occupation', 'Fathers_occupation', 'Admission_grade',
-        'Displaced', 'Educational_special_needs', 'Debtor', 'Tuition_fees_up_to_date',
-        'Gender', 'Scholarship_holder', 'Age_at_enrollment', 'International',
-        'Curricular_units_1st_sem_credited'
-    ]
+    start = perf_counter()
     
     # Check for missing features
-    missing_features = [f for f in required_features if f not in input_dict]
+    missing_features = SCHEMA.missing(input_dict)
     if missing_features:
+        METRICS.record_invalid_row(missing_errors(missing_features))
         raise ValueError(f"Missing required features: {missing_features}")
     
-    # Validate feature values against allowed ranges
-    feature_ranges = {
-        'Marital_status': [1, 2, 3, 4, 5, 6],
-        'Application_mode': [1, 2, 5, 7, 10, 15, 16, 17, 18, 26, 27, 39, 42, 43, 44, 51, 53, 57],
-        'Application_order': [0, 1, 2, 3, 4, 5, 6, 9],
-        'Course': [33, 171, 8014, 9003, 9070, 9085, 9119, 9130, 9147, 9238, 9254, 9500, 9556, 9670, 9773, 9853, 9991],
-        'Daytime_evening_attendance': [0, 1],
-        'Previous_qualification': [1, 2, 3, 4, 5, 6, 9, 10, 12, 14, 15, 19, 38, 39, 40, 42, 43],
-        'Nacionality': [1, 2, 6, 11, 13, 14, 17, 21, 22, 24, 25, 26, 32, 41, 62, 100, 101, 103, 105, 108, 109],
-        'Mothers_qualification': [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 14, 18, 19, 22, 26, 27, 29, 30, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44],
-        'Fathers_qualification': [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 18, 19, 20, 22, 25, 26, 27, 29, 30, 31, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44],
-        'Mothers_occupation': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 90, 99, 122, 123, 125, 131, 132, 134, 141, 143, 144, 151, 152, 153, 171, 173, 175, 191, 192, 193, 194],
-        'Fathers_occupation': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 90, 99, 101, 102, 103, 112, 114, 121, 122, 123, 124, 131, 132, 134, 135, 141, 143, 144, 151, 152, 153, 154, 161, 163, 171, 172, 174, 175, 181, 182, 183, 192, 193, 194, 195],
-        'Displaced': [0, 1],
-        'Educational_special_needs': [0, 1],
-        'Debtor': [0, 1],
-        'Tuition_fees_up_to_date': [0, 1],
-        'Gender': [0, 1],
-        'Scholarship_holder': [0, 1],
-        'International': [0, 1],
-        'Curricular_units_1st_sem_credited': list(range(0, 21))  # 0 to 20
-    }
-    
-    # Validate categorical features
-    for feature, valid_values in feature_ranges.items():
-        if feature in input_dict and input_dict[feature] not in valid_values:
-            raise ValueError(f"Invalid value for {feature}: {input_dict[feature]}. Valid values: {valid_values}")
-    
-    # Validate continuous features (grades and age)
-    if not (95.0 <= input_dict['Previous_qualification_grade'] <= 190.0):
-        raise ValueError(f"Previous_qualification_grade must be between 95.0 and 190.0")
-    
-    if not (95.0 <= input_dict['Admission_grade'] <= 190.0):
-        raise ValueError(f"Admission_grade must be between 95.0 and 190.0")
-    
-    if not (17 <= input_dict['Age_at_enrollment'] <= 70):
-        raise ValueError(f"Age_at_enrollment must be between 17 and 70")
+    # Validate categorical codes and continuous bounds (grades and age)
+    errors = SCHEMA.validate_record(input_dict)
+    if errors:
+        METRICS.record_invalid_row(errors)
+        raise ValueError(errors[0].message)
+    validated = perf_counter()
     
     # Create input array in the correct order (adjust based on your model's expected feature order)
     input_array = np.array([
@@ -95,8 +72,165 @@ def preprocess_input(input_dict):
         input_dict['Curricular_units_1st_sem_credited']
     ]).reshape(1, -1)
     
+    assembled = perf_counter()
+    if observe_drift:
+        DRIFT.observe(input_array)
+    
     # Apply scaling
-    return scaler.transform(input_array)
+    processed = get_affine().transform(input_array)
+    
+    METRICS.record_rows(1)
+    METRICS.record_stages((('validate', validated - start), ('assemble', assembled - validated),
+                           ('transform', perf_counter() - assembled)))
+    return processed
+
+
+def missing_errors(missing_features):
+    """
+    FeatureError entries for features absent from a record.
+    """
+    return [FeatureError(f, None, f"Missing required feature: {f}", MISSING) for f in missing_features]
+
+
+def _column(data, feature):
+    """
+    Fetch one feature column from a DataFrame or structured array as float64.
+    
+    Text labels from the dashboard dataset (e.g. "Yes"/"No") are decoded to
+    their model codes; anything that cannot be read as a number becomes NaN
+    so it fails validation instead of aborting the batch.
+    """
+    values = np.asarray(data[feature])
+    if values.dtype.kind in 'biuf':
+        return values.astype(np.float64, copy=False)
+    
+    # Decode each distinct value once and reuse it for the remaining rows
+    labels = DASHBOARD_LABELS.get(feature, {})
+    decoded = {}
+    
+    def decode(value):
+        try:
+            return decoded[value]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable values (lists, dicts) are not codes
+            return np.nan
+        try:
+            code = float(labels.get(value, value))
+        except (TypeError, ValueError):
+            code = np.nan
+        decoded[value] = code
+        return code
+    
+    return np.fromiter((decode(value) for value in values), dtype=np.float64, count=len(values))
+
+
+def input_matrix(data):
+    """
+    Raw (n_rows, 22) float matrix in REQUIRED_FEATURES order, not validated.
+    
+    Args:
+        data: Input dictionary, list of input dictionaries, pandas DataFrame,
+            NumPy structured array or 2-D array in REQUIRED_FEATURES order
+    """
+    if isinstance(data, dict):
+        data = [data]
+    if isinstance(data, list):
+        missing_features = sorted({f for record in data for f in SCHEMA.missing(record)})
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+        if not data:
+            return np.empty((0, len(REQUIRED_FEATURES)))
+        data = {f: [record[f] for record in data] for f in REQUIRED_FEATURES}
+    elif isinstance(data, np.ndarray) and data.dtype.names is None:
+        if data.ndim != 2 or data.shape[1] != len(REQUIRED_FEATURES):
+            raise ValueError(f"Expected an array of shape (n_rows, {len(REQUIRED_FEATURES)}), got {data.shape}")
+        return np.asarray(data, dtype=np.float64)
+    else:
+        columns = getattr(data, 'columns', None)
+        missing_features = SCHEMA.missing(data.dtype.names if columns is None else columns)
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+    return np.column_stack([_column(data, f) for f in REQUIRED_FEATURES])
+
+
+def preprocess_batch(data, observe_drift=True):
+    """
+    Preprocess a whole cohort for the student success prediction model.
+    
+    Validation runs as vectorized masks over each feature column, so rows
+    with invalid values are reported instead of aborting the batch.
+    
+    Args:
+        data: pandas DataFrame, NumPy structured array or dictionary of
+            columns with all required features, or a 2-D numeric array whose
+            columns follow REQUIRED_FEATURES
+        observe_drift: Feed the valid rows to the drift monitor; pass False
+            for synthetic rows (scenario sweeps, benchmarks)
+    
+    Returns:
+        tuple: (processed, valid_mask, errors)
+            processed: Scaled numpy array for the valid rows only
+            valid_mask: Boolean array marking which input rows are valid
+            errors: Dictionary mapping row position to a list of error messages
+    """
+    
+    with METRICS.stage('assemble'):
+        if isinstance(data, np.ndarray) and data.dtype.names is None:
+            # Plain matrix already in feature order
+            if data.ndim != 2 or data.shape[1] != len(REQUIRED_FEATURES):
+                raise ValueError(f"Expected an array of shape (n_rows, {len(REQUIRED_FEATURES)}), got {data.shape}")
+            input_array = np.asarray(data, dtype=np.float64)
+            raw_column = lambda feature: input_array[:, SCHEMA.index[feature]]
+        else:
+            # Check for missing features
+            if isinstance(data, dict):
+                columns = data.keys()
+            else:
+                columns = getattr(data, 'columns', None)
+                if columns is None:
+                    columns = data.dtype.names or ()
+            missing_features = SCHEMA.missing(columns)
+            if missing_features:
+                raise ValueError(f"Missing required features: {missing_features}")
+            
+            input_array = np.column_stack([_column(data, f) for f in REQUIRED_FEATURES])
+            raw_column = lambda feature: np.asarray(data[feature])
+    
+    with METRICS.stage('validate'):
+        invalid = SCHEMA.validate_array(input_array)
+        
+        # Build messages only for the rows that failed
+        errors = {}
+        failure_counts = Counter()
+        for feature, bad in invalid.items():
+            raw_values = raw_column(feature)
+            for i in np.flatnonzero(bad):
+                error = SCHEMA.check_value(feature, raw_values[i])
+                errors.setdefault(int(i), []).append(error.message)
+                failure_counts[error.feature, error.reason] += 1
+        errors = dict(sorted(errors.items()))
+        
+        valid_mask = np.ones(len(input_array), dtype=bool)
+        for bad in invalid.values():
+            valid_mask &= ~bad
+    
+    n_valid = int(valid_mask.sum())
+    METRICS.record_rows(n_valid, len(valid_mask) - n_valid)
+    for (feature, reason), count in failure_counts.items():
+        METRICS.record_error(feature, reason, count)
+    
+    valid_input = input_array[valid_mask]
+    if observe_drift and DRIFT.enabled:
+        with METRICS.stage('drift'):
+            DRIFT.observe(valid_input)
+    
+    # Apply scaling once over all valid rows
+    with METRICS.stage('transform'):
+        processed = get_affine().transform(valid_input)
+    
+    return processed, valid_mask, errors
 
 
 def create_sample_input():
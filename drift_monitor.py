@@ -0,0 +1,365 @@
+"""
+Streaming input-drift monitor against the training distribution.
+
+Validation catches impossible values; this module catches shifts in the
+mix of valid ones, e.g. a surge in one Application_mode or Admission_grade
+drifting towards its 95/190 bounds. A reference snapshot built once from
+"dataset for dashboard.csv" holds, per feature, the share of rows in each
+bin: one bin per schema code (plus one for anything else) for categorical
+features, reference deciles for grades and age.
+
+As batches are preprocessed, DRIFT folds their valid rows into counts with
+the same bins. The counts decay with a half-life in rows, so they describe
+recent traffic in fixed memory however long the process runs, and the
+population stability index per feature is recomputed from them:
+
+    PSI = sum over bins of (p - q) * ln(p / q)
+
+with p the recent share and q the reference share. PSI is published as the
+dropout_feature_drift_psi gauge, and a feature crossing PSI_WARNING or
+PSI_ALERT counts one dropout_drift_alerts_total{feature, level}. Binning is
+a column lookup or searchsorted per feature plus one bincount per batch,
+on at most SAMPLE_ROWS evenly strided rows of a large batch; single
+records are buffered and folded in blocks. Set DROPOUT_DRIFT=0 to
+disable monitoring.
+
+Usage:
+    python drift_monitor.py build "dataset for dashboard.csv"
+    python drift_monitor.py check extract.csv
+"""
+
+import argparse
+import os
+import threading
+import warnings
+
+import numpy as np
+
+from feature_schema import REQUIRED_FEATURES, SCHEMA
+from metrics import METRICS
+from model_registry import REGISTRY
+
+REFERENCE_PATH = "drift_reference.npz"
+DEFAULT_BINS = 10
+
+# Rows after which a row's weight in the recent counts has halved
+HALF_LIFE_ROWS = 5_000
+
+# Conventional PSI levels: below 0.1 stable, 0.1-0.25 moderate, above 0.25 major
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+
+# Effective rows needed before PSI is reported at all
+MIN_ROWS = 500
+
+# Rows between PSI evaluations
+CHECK_ROWS = 1_000
+
+# Single-record calls are buffered and folded in blocks of this many rows
+BUFFER_ROWS = 256
+
+# Rows of a large batch actually binned; a few thousand rows pin a bin share
+# far more tightly than the PSI levels need
+SAMPLE_ROWS = 4_096
+
+# Share given to empty bins so PSI stays finite
+_FLOOR = 1e-4
+
+LEVELS = ('ok', 'warning', 'alert')
+
+
+class DriftReference:
+    """
+    Binning and bin shares of the 22 features in the reference data.
+
+    Args:
+        codes: Dictionary mapping categorical features to their codes
+        edges: Dictionary mapping continuous features to interior bin edges
+        proportions: Flat reference shares, features in REQUIRED_FEATURES order
+            (None while the reference is being built)
+        rows: Rows the reference was built from
+    """
+
+    def __init__(self, codes, edges, proportions, rows=0):
+        self.codes = {f: np.asarray(codes[f], dtype=np.int64) for f in codes}
+        self.edges = {f: np.asarray(edges[f], dtype=np.float64) for f in edges}
+        self.rows = rows
+
+        # Categorical features get a code -> bin table, with the last bin
+        # for codes outside the schema
+        self._tables = {}
+        sizes = []
+        for feature in REQUIRED_FEATURES:
+            if feature in self.codes:
+                codes_f = self.codes[feature]
+                table = np.full(codes_f.max() + 2, len(codes_f), dtype=np.intp)
+                table[codes_f] = np.arange(len(codes_f))
+                self._tables[feature] = table
+                sizes.append(len(codes_f) + 1)
+            else:
+                sizes.append(len(self.edges[feature]) + 1)
+        self.sizes = np.asarray(sizes)
+        self.offsets = np.concatenate([[0], np.cumsum(self.sizes)[:-1]])
+        self.n_bins = int(self.sizes.sum())
+        self.proportions = None if proportions is None else \
+            _smooth(np.asarray(proportions, dtype=np.float64), self.offsets)
+
+    @classmethod
+    def from_array(cls, X, bins=DEFAULT_BINS):
+        """
+        Build the reference from valid rows in REQUIRED_FEATURES order.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        codes = {f: SCHEMA.codes(f) for f in REQUIRED_FEATURES if f in SCHEMA.categorical}
+        edges = {}
+        for feature in SCHEMA.continuous:
+            quantiles = np.quantile(X[:, SCHEMA.index[feature]], np.linspace(0, 1, bins + 1)[1:-1])
+            edges[feature] = np.unique(quantiles)
+        reference = cls(codes, edges, None, len(X))
+        reference.proportions = _smooth(reference.bin_counts(X) / max(len(X), 1), reference.offsets)
+        return reference
+
+    @classmethod
+    def from_csv(cls, path, bins=DEFAULT_BINS, sep=","):
+        """
+        Build the reference from the valid rows of a CSV extract.
+        """
+        from data_preprocessing import input_matrix
+        import pandas as pd
+
+        X = input_matrix(pd.read_csv(path, sep=sep))
+        valid = np.ones(len(X), dtype=bool)
+        for bad in SCHEMA.validate_array(X).values():
+            valid &= ~bad
+        return cls.from_array(X[valid], bins)
+
+    def bin_index(self, X):
+        """
+        Flat bin of every value as a (22, n_rows) array into proportions.
+        """
+        # Work feature by feature on contiguous rows of the transpose
+        columns = np.ascontiguousarray(np.asarray(X, dtype=np.float64).T)
+        index = np.empty(columns.shape, dtype=np.intp)
+        for j, feature in enumerate(REQUIRED_FEATURES):
+            column = columns[j]
+            table = self._tables.get(feature)
+            if table is None:
+                index[j] = np.searchsorted(self.edges[feature], column, side='right')
+            else:
+                # Negative, fractional, unreadable or too large codes land in
+                # the table's last entry, the "other" bin
+                codes = column.astype(np.intp)
+                codes[(codes < 0) | (codes != column)] = len(table) - 1
+                index[j] = table[np.minimum(codes, len(table) - 1)]
+        index += self.offsets[:, None]
+        return index
+
+    def bin_counts(self, X):
+        return np.bincount(self.bin_index(X).ravel(), minlength=self.n_bins).astype(np.float64)
+
+    def save(self, path=REFERENCE_PATH):
+        arrays = {'proportions': self.proportions, 'rows': np.asarray(self.rows)}
+        arrays.update({f"codes__{f}": c for f, c in self.codes.items()})
+        arrays.update({f"edges__{f}": e for f, e in self.edges.items()})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path=REFERENCE_PATH):
+        with np.load(path) as data:
+            codes = {name[len("codes__"):]: data[name] for name in data.files if name.startswith("codes__")}
+            edges = {name[len("edges__"):]: data[name] for name in data.files if name.startswith("edges__")}
+            return cls(codes, edges, data['proportions'], int(data['rows']))
+
+
+def _smooth(proportions, offsets):
+    """
+    Floor empty bins and renormalise each feature's shares.
+    """
+    floored = np.maximum(proportions, _FLOOR)
+    return floored / np.repeat(np.add.reduceat(floored, offsets), np.diff(np.r_[offsets, len(floored)]))
+
+
+REGISTRY.register("drift_reference", lambda: DriftReference.load(REFERENCE_PATH))
+
+
+class DriftMonitor:
+    """
+    Decayed per-feature bin counts of recent valid rows and their PSI.
+
+    Args:
+        reference: DriftReference, or None to load drift_reference.npz
+            through the registry on first use
+        half_life: Rows after which a row's weight has halved
+        enabled: When False observe() is a no-op
+    """
+
+    def __init__(self, reference=None, half_life=HALF_LIFE_ROWS, warning=PSI_WARNING, alert=PSI_ALERT,
+                 min_rows=MIN_ROWS, check_rows=CHECK_ROWS, enabled=True):
+        self.enabled = enabled
+        self.half_life = half_life
+        self.warning = warning
+        self.alert = alert
+        self.min_rows = min_rows
+        self.check_rows = check_rows
+        self._reference = reference
+        self._lock = threading.Lock()
+        self._buffer = np.empty((BUFFER_ROWS, len(REQUIRED_FEATURES)))
+        self.reset()
+
+    @property
+    def reference(self):
+        if self._reference is None:
+            try:
+                self._reference = REGISTRY.get("drift_reference")
+            except ValueError as e:
+                # Scoring goes on without monitoring when there is no reference
+                warnings.warn(f"Drift monitoring disabled: {e}")
+                self.enabled = False
+                return None
+            self.reset()
+        return self._reference
+
+    @property
+    def pending_rows(self):
+        """
+        Single records buffered but not yet folded into the counts.
+        """
+        return self._buffered
+
+    def reset(self):
+        """
+        Forget the recent counts and levels.
+        """
+        n_bins = 0 if self._reference is None else self._reference.n_bins
+        self.counts = np.zeros(n_bins)
+        self.weight = 0.0
+        self.rows_seen = 0
+        self.levels = dict.fromkeys(REQUIRED_FEATURES, 'ok')
+        self.last_psi = {}
+        self._buffered = 0
+        self._unchecked = 0
+
+    def observe(self, X):
+        """
+        Record valid raw rows (n_rows, 22) in REQUIRED_FEATURES order.
+        """
+        if not self.enabled or not len(X):
+            return
+        with self._lock:
+            if len(X) + self._buffered <= BUFFER_ROWS:
+                self._buffer[self._buffered:self._buffered + len(X)] = X
+                self._buffered += len(X)
+                if self._buffered < BUFFER_ROWS:
+                    return
+                X = self._buffer
+                self._buffered = 0
+            self._fold(X)
+
+    def flush(self):
+        """
+        Fold buffered single records in now and re-evaluate PSI.
+        """
+        with self._lock:
+            if self._buffered:
+                self._fold(self._buffer[:self._buffered])
+                self._buffered = 0
+            if self.weight:
+                self._check()
+
+    def _fold(self, X):
+        reference = self.reference
+        if reference is None:
+            return
+        decay = 0.5 ** (len(X) / self.half_life)
+        self.counts *= decay
+        # Large batches are binned on an evenly strided sample, each sampled
+        # row standing for `stride` rows
+        stride = -(-len(X) // SAMPLE_ROWS)
+        self.counts += reference.bin_counts(X[::stride]) * (len(X) / len(X[::stride]))
+        self.weight = self.weight * decay + len(X)
+        self.rows_seen += len(X)
+        self._unchecked += len(X)
+        if self._unchecked >= self.check_rows:
+            self._check()
+
+    def psi(self):
+        """
+        Population stability index of every feature against the reference.
+        """
+        reference = self.reference
+        if reference is None or not self.weight:
+            return {}
+        recent = _smooth(self.counts / self.weight, reference.offsets)
+        terms = (recent - reference.proportions) * np.log(recent / reference.proportions)
+        return dict(zip(REQUIRED_FEATURES, np.add.reduceat(terms, reference.offsets).tolist()))
+
+    def kl(self):
+        """
+        KL divergence of the recent distribution from the reference, per feature.
+        """
+        reference = self.reference
+        if reference is None or not self.weight:
+            return {}
+        recent = _smooth(self.counts / self.weight, reference.offsets)
+        terms = recent * np.log(recent / reference.proportions)
+        return dict(zip(REQUIRED_FEATURES, np.add.reduceat(terms, reference.offsets).tolist()))
+
+    def _check(self):
+        self._unchecked = 0
+        METRICS.set_gauge('dropout_drift_window_rows', self.weight)
+        if self.weight < self.min_rows:
+            return
+        self.last_psi = self.psi()
+        for feature, value in self.last_psi.items():
+            METRICS.set_gauge('dropout_feature_drift_psi', value, feature=feature)
+            level = 'alert' if value >= self.alert else 'warning' if value >= self.warning else 'ok'
+            if LEVELS.index(level) > LEVELS.index(self.levels[feature]):
+                METRICS.inc('dropout_drift_alerts_total', feature=feature, level=level)
+            self.levels[feature] = level
+
+    def report(self):
+        """
+        Features at warning or alert level as (feature, level, psi), worst first.
+        """
+        drifted = [(f, self.levels[f], self.last_psi[f]) for f in self.last_psi if self.levels[f] != 'ok']
+        return sorted(drifted, key=lambda item: -item[2])
+
+
+DRIFT = DriftMonitor(enabled=os.environ.get('DROPOUT_DRIFT', '1') != '0')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Input drift against the training distribution")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Build the reference snapshot from a CSV")
+    build.add_argument("input", help="CSV shaped like 'dataset for dashboard.csv'")
+    build.add_argument("output", nargs="?", default=REFERENCE_PATH, help="Reference file (.npz)")
+    build.add_argument("--bins", type=int, default=DEFAULT_BINS, help="Quantile bins for grades and age")
+    check = commands.add_parser("check", help="Stream a CSV through the monitor and report drift")
+    check.add_argument("input", help="CSV file with the 22 model features")
+    check.add_argument("--reference", default=REFERENCE_PATH, help="Reference file (.npz)")
+    check.add_argument("--chunksize", type=int, default=50_000, help="Rows per chunk")
+    for command in (build, check):
+        command.add_argument("--sep", default=",", help="CSV field separator")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        reference = DriftReference.from_csv(args.input, args.bins, args.sep)
+        reference.save(args.output)
+        print(f"✅ Reference from {reference.rows:,} rows, {reference.n_bins} bins written to {args.output}")
+    else:
+        import pandas as pd
+        from data_preprocessing import input_matrix
+
+        monitor = DriftMonitor(DriftReference.load(args.reference))
+        for chunk in pd.read_csv(args.input, sep=args.sep, chunksize=args.chunksize):
+            X = input_matrix(chunk)
+            valid = np.ones(len(X), dtype=bool)
+            for bad in SCHEMA.validate_array(X).values():
+                valid &= ~bad
+            monitor.observe(X[valid])
+        monitor.flush()
+        print(f"{'feature':40} {'PSI':>8} {'KL':>8}  level")
+        kl = monitor.kl()
+        for feature, value in sorted(monitor.psi().items(), key=lambda item: -item[1]):
+            print(f"{feature:40} {value:8.4f} {kl[feature]:8.4f}  {monitor.levels[feature]}")
@@ -0,0 +1,183 @@
+"""
+Early-warning list: the K students most at risk of dropout, per course and overall.
+
+Scores arrive as a stream of batches (e.g. the chunks of score_csv.py) and
+each ranking keeps a bounded min-heap of its K highest probability_dropout
+entries. A batch is first cut down with vectorized selection, the top K of
+each course within the batch, and only candidates beating a heap's current
+K-th entry are pushed, so memory stays O(K x courses) however long the
+extract is and the full scored population is never materialized or sorted.
+
+Ties in probability keep the earlier row.
+
+Usage:
+    python early_warning.py "dataset for dashboard.csv" early_warning.csv --k 20
+    python early_warning.py extract.csv early_warning.csv --k 50 --id-column Student_ID
+"""
+
+import argparse
+import heapq
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import _column
+from model_registry import get_scoring_model
+from score_csv import DEFAULT_CHUNKSIZE, iter_scored_chunks
+
+DEFAULT_K = 20
+
+# Scope label of the ranking across all courses
+ALL_COURSES = 'all'
+
+
+class TopKRanking:
+    """
+    Bounded top-K rankings of dropout probability, per course and global.
+
+    Args:
+        k: Students kept in each ranking
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.k = k
+        # Min-heaps of (probability, -row, id, course); the root is the entry
+        # the next better candidate replaces
+        self._global = []
+        self._courses = {}
+        self.n_seen = 0
+
+    def _push(self, heap, probability, rows, ids, courses):
+        k = self.k
+        for p, row, student, course in zip(probability.tolist(), rows.tolist(), ids, courses.tolist()):
+            entry = (p, -row, student, course)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    def _candidates(self, heap, probability):
+        """
+        Positions within a batch that can still enter a ranking.
+        """
+        if len(heap) < self.k:
+            return np.arange(len(probability))
+        return np.flatnonzero(probability >= heap[0][0])
+
+    def update(self, probability, course, rows, ids=None):
+        """
+        Fold one batch of scores into the rankings.
+
+        Args:
+            probability: Dropout probabilities; NaN (invalid rows) are skipped
+            course: Course code of each row
+            rows: Position of each row in the whole stream
+            ids: Optional student identifiers (defaults to the row positions)
+        """
+        probability = np.asarray(probability, dtype=np.float64)
+        course = np.asarray(course)
+        rows = np.asarray(rows)
+        keep = np.flatnonzero(~np.isnan(probability))
+        self.n_seen += len(keep)
+        if not len(keep):
+            return
+
+        # Order the batch by course, then by decreasing probability and row
+        order = keep[np.lexsort((rows[keep], -probability[keep], course[keep]))]
+        grouped = course[order]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        stops = np.r_[starts[1:], len(order)]
+        identifiers = rows if ids is None else np.asarray(ids, dtype=object)
+
+        best = []
+        for start, stop in zip(starts, stops):
+            # Each course's candidates are already its batch top K
+            top = order[start:min(start + self.k, stop)]
+            best.append(top)
+            heap = self._courses.setdefault(grouped[start].item(), [])
+            top = top[self._candidates(heap, probability[top])]
+            self._push(heap, probability[top], rows[top], identifiers[top].tolist(), course[top])
+
+        # The global top K is a subset of the per-course top K
+        best = np.concatenate(best)
+        top = best[np.argsort(-probability[best], kind='stable')[:self.k]]
+        top = top[self._candidates(self._global, probability[top])]
+        self._push(self._global, probability[top], rows[top], identifiers[top].tolist(), course[top])
+
+    def ranked(self, course=None):
+        """
+        One ranking, highest risk first, as (row, id, course, probability) tuples.
+
+        Args:
+            course: Course code, or None for the ranking across all courses
+        """
+        heap = self._global if course is None else self._courses.get(course, [])
+        return [(-negative_row, student, code, p)
+                for p, negative_row, student, code in sorted(heap, reverse=True)]
+
+    @property
+    def courses(self):
+        return sorted(self._courses)
+
+    def to_frame(self, id_column='id'):
+        """
+        All rankings as one DataFrame: scope ('all' or the course code),
+        rank, row, id, Course and probability_dropout.
+        """
+        records = []
+        for scope in [None] + self.courses:
+            for rank, (row, student, code, p) in enumerate(self.ranked(scope), start=1):
+                records.append((ALL_COURSES if scope is None else scope, rank, row, student, code, p))
+        return pd.DataFrame(records, columns=['scope', 'rank', 'row', id_column, 'Course', 'probability_dropout'])
+
+
+def rank_csv(input_path, k=DEFAULT_K, chunksize=DEFAULT_CHUNKSIZE, id_column=None, sep=",", verbose=True):
+    """
+    Score a CSV extract chunk by chunk and keep only the top-K rankings.
+
+    Returns:
+        tuple: (TopKRanking, stats dict with rows, seconds and rows_per_second)
+    """
+    get_scoring_model(chunksize)
+    ranking = TopKRanking(k)
+    n_rows = 0
+    start = time.perf_counter()
+    for chunk, scored in iter_scored_chunks(input_path, chunksize, id_column, sep=sep):
+        ids = None if id_column is None else scored[id_column].to_numpy()
+        # Unreadable courses only occur on invalid rows, which are skipped
+        course = np.nan_to_num(_column(chunk, 'Course'), nan=-1).astype(np.int64)
+        ranking.update(scored['probability_dropout'].to_numpy(), course, scored['row'].to_numpy(), ids)
+        n_rows += len(scored)
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"  {n_rows:>12,} rows ranked ({n_rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    seconds = time.perf_counter() - start
+    return ranking, {
+        'rows': n_rows,
+        'valid_rows': ranking.n_seen,
+        'seconds': seconds,
+        'rows_per_second': n_rows / seconds if seconds > 0 else float('inf'),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-K at-risk students per course from a CSV extract")
+    parser.add_argument("input", help="CSV file with the 22 model features")
+    parser.add_argument("output", help="Ranked list (.csv)")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Students kept per course and overall")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument("--id-column", help="Column identifying students in the ranked list")
+    parser.add_argument("--sep", default=",", help="CSV field separator")
+    args = parser.parse_args()
+
+    ranking, stats = rank_csv(args.input, args.k, args.chunksize, args.id_column, args.sep)
+    frame = ranking.to_frame(args.id_column or 'id')
+    frame.to_csv(args.output, index=False)
+    print(f"✅ Ranked {stats['rows']:,} rows ({stats['valid_rows']:,} valid) in {stats['seconds']:.2f} s "
+          f"— {stats['rows_per_second']:,.0f} rows/s")
+    print(f"🚨 Top {args.k} overall and for {len(ranking.courses)} courses written to {args.output}")
@@ -0,0 +1,184 @@
+"""
+Per-student explanations of the dropout prediction on the 22 input features.
+
+The gradient-boosting model sees the scaled (and possibly PCA-projected)
+features, so attributions are computed in two steps:
+
+    1. path attribution on the compiled ensemble: every split on a row's
+       decision path credits its change in expected dropout score to the
+       model feature it splits on (CompiledEnsemble.contributions)
+    2. each model feature's credit is shared among the original features in
+       proportion to their term in that feature's value, read from the
+       loadings W of the folded scaler_pca.joblib: (x_i - mean_i) * W_ij
+
+Contributions are in the model's raw score for the Dropout class (its
+logit in the 3-class softmax, not binary log-odds) and add up with
+base_value to that raw score of every row. Both steps are vectorized
+over the batch, so explaining a cohort costs the same order of time as
+scoring it.
+
+Usage:
+    from explanations import explain_batch
+    result = explain_batch(frame)
+    result['risk_factors'][0]   # [(feature, value, contribution), ...]
+"""
+
+import numpy as np
+
+from compiled_trees import CompiledEnsemble
+from data_preprocessing import input_matrix
+from feature_schema import REQUIRED_FEATURES, SCHEMA
+from metrics import METRICS
+from model_registry import REGISTRY, get_affine, get_model, get_scaler
+from prediction import _dropout_column
+
+DEFAULT_TOP_K = 5
+
+# Model features closer to their reference than this pass their credit on
+# by loading weight instead of by term
+_EPSILON = 1e-12
+
+
+def _reference_input(transformer, affine):
+    """
+    Input the attributions are measured from: the training mean kept by the
+    first preprocessing step, or a point the affine map sends to zero.
+    """
+    first = transformer.steps[0][1] if hasattr(transformer, 'steps') else transformer
+    mean = getattr(first, 'mean_', None)
+    if mean is not None and len(mean) == affine.n_features_in:
+        return np.asarray(mean, dtype=np.float64)
+    return np.linalg.lstsq(affine.W.T, -affine.b, rcond=None)[0]
+
+
+class RiskExplainer:
+    """
+    Dropout-score attributions for raw 22-feature inputs.
+
+    Args:
+        ensemble: CompiledEnsemble exported with node cover
+        affine: AffineTransform applied before the model
+        reference: Raw input the contributions are measured from
+        output: Ensemble output holding the dropout score
+        sign: -1 when a binary model's score is for the other class
+    """
+
+    def __init__(self, ensemble, affine, reference, output=0, sign=1.0):
+        self.ensemble = ensemble
+        self.affine = affine
+        self.reference = np.asarray(reference, dtype=np.float64)
+        self.output = output
+        self.sign = sign
+        self.base_value = sign * float(ensemble.expected_value()[output])
+        self._reference_out = affine.transform(self.reference[None, :])[0]
+        loadings = affine.W ** 2
+        self._loading_share = (loadings / loadings.sum(axis=0)).T
+
+    @classmethod
+    def from_artifacts(cls):
+        """
+        Build the explainer from the registry's model and preprocessing.
+        """
+        ensemble = REGISTRY.get("compiled_model")
+        if ensemble is None or ensemble.cover is None:
+            ensemble = CompiledEnsemble.from_model(get_model())
+        affine = get_affine()
+        column = _dropout_column(ensemble)
+        if ensemble.n_outputs == 1:
+            output, sign = 0, (1.0 if column == 1 else -1.0)
+        else:
+            output, sign = column, 1.0
+        return cls(ensemble, affine, _reference_input(get_scaler(), affine), output, sign)
+
+    def explain(self, X):
+        """
+        Attribute the dropout score of validated raw inputs.
+
+        Args:
+            X: Array of shape (n_rows, 22) in REQUIRED_FEATURES order
+
+        Returns:
+            tuple: (contributions of shape (n_rows, 22), raw dropout scores)
+        """
+        X = np.asarray(X, dtype=np.float64)
+        Z = self.affine.transform(X)
+        model_contributions = self.sign * self.ensemble.contributions(Z, self.output)
+
+        # Share each model feature's credit by the terms that make up its value
+        moved = Z - self._reference_out
+        measurable = np.abs(moved) > _EPSILON
+        rate = np.divide(model_contributions, moved, out=np.zeros_like(moved), where=measurable)
+        contributions = (X - self.reference) * (rate @ self.affine.W.T)
+        contributions += np.where(measurable, 0.0, model_contributions) @ self._loading_share
+        return contributions, self.base_value + model_contributions.sum(axis=1)
+
+
+REGISTRY.register("explainer", RiskExplainer.from_artifacts)
+
+
+def get_explainer():
+    return REGISTRY.get("explainer")
+
+
+def top_factors(contributions, X, k=DEFAULT_TOP_K, increasing=True):
+    """
+    Largest contributions of each row, as (feature, value, contribution).
+
+    Args:
+        increasing: True for the features raising the dropout score, False
+            for those lowering it
+    """
+    signed = contributions if increasing else -contributions
+    order = np.argsort(-signed, axis=1)[:, :k]
+    # Gather the top k per row as arrays, then convert to lists in bulk
+    keep = (np.take_along_axis(signed, order, axis=1) > 0).tolist()
+    names = np.asarray(REQUIRED_FEATURES, dtype=object)[order].tolist()
+    values = np.take_along_axis(X, order, axis=1).tolist()
+    amounts = np.take_along_axis(contributions, order, axis=1).tolist()
+    return [[factor for factor, kept in zip(zip(*row), flags) if kept]
+            for *row, flags in zip(names, values, amounts, keep)]
+
+
+def explain_batch(data, top_k=DEFAULT_TOP_K):
+    """
+    Explain the dropout score of a whole cohort.
+
+    Args:
+        data: pandas DataFrame, NumPy structured array, input dictionary
+            or list of them, or 2-D array in REQUIRED_FEATURES order
+        top_k: Factors listed per row in each direction
+
+    Returns:
+        dict: contributions (n_rows, 22) and raw_score (n_rows,), NaN for
+        invalid rows; base_value; valid mask; risk_factors and
+        supporting_factors, per row lists of (feature, value, contribution)
+        (empty for invalid rows)
+    """
+    X = input_matrix(data)
+
+    explainer = get_explainer()
+    valid = np.ones(len(X), dtype=bool)
+    for bad in SCHEMA.validate_array(X).values():
+        valid &= ~bad
+
+    contributions = np.full(X.shape, np.nan)
+    raw_score = np.full(len(X), np.nan)
+    with METRICS.stage('explain'):
+        if valid.any():
+            contributions[valid], raw_score[valid] = explainer.explain(X[valid])
+        risk = top_factors(contributions[valid], X[valid], top_k, increasing=True)
+        supporting = top_factors(contributions[valid], X[valid], top_k, increasing=False)
+
+    risk_factors = [[] for _ in range(len(X))]
+    supporting_factors = [[] for _ in range(len(X))]
+    for k, i in enumerate(np.flatnonzero(valid)):
+        risk_factors[i], supporting_factors[i] = risk[k], supporting[k]
+
+    return {
+        'contributions': contributions,
+        'raw_score': raw_score,
+        'base_value': explainer.base_value,
+        'valid': valid,
+        'risk_factors': risk_factors,
+        'supporting_factors': supporting_factors,
+    }
@@ -0,0 +1,232 @@
+"""
+Feature schema for the student success prediction model.
+
+The schema is compiled once at import: categorical codes become frozensets
+for per-record checks and boolean lookup tables for vectorized checks, so
+validation never scans the allowed-value lists.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# Feature order expected by the scaler and model
+REQUIRED_FEATURES = [
+    'Marital_status', 'Application_mode', 'Application_order', 'Course',
+    'Daytime_evening_attendance', 'Previous_qualification', 'Previous_qualification_grade',
+    'Nacionality', 'Mothers_qualification', 'Fathers_qualification',
+    'Mothers_occupation', 'Fathers_occupation', 'Admission_grade',
+    'Displaced', 'Educational_special_needs', 'Debtor', 'Tuition_fees_up_to_date',
+    'Gender', 'Scholarship_holder', 'Age_at_enrollment', 'International',
+    'Curricular_units_1st_sem_credited'
+]
+
+# Allowed codes for categorical features
+FEATURE_RANGES = {
+    'Marital_status': [1, 2, 3, 4, 5, 6],
+    'Application_mode': [1, 2, 5, 7, 10, 15, 16, 17, 18, 26, 27, 39, 42, 43, 44, 51, 53, 57],
+    'Application_order': [0, 1, 2, 3, 4, 5, 6, 9],
+    'Course': [33, 171, 8014, 9003, 9070, 9085, 9119, 9130, 9147, 9238, 9254, 9500, 9556, 9670, 9773, 9853, 9991],
+    'Daytime_evening_attendance': [0, 1],
+    'Previous_qualification': [1, 2, 3, 4, 5, 6, 9, 10, 12, 14, 15, 19, 38, 39, 40, 42, 43],
+    'Nacionality': [1, 2, 6, 11, 13, 14, 17, 21, 22, 24, 25, 26, 32, 41, 62, 100, 101, 103, 105, 108, 109],
+    'Mothers_qualification': [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 14, 18, 19, 22, 26, 27, 29, 30, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44],
+    'Fathers_qualification': [1, 2, 3, 4, 5, 6, 9, 10, 11, 12, 13, 14, 18, 19, 20, 22, 25, 26, 27, 29, 30, 31, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44],
+    'Mothers_occupation': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 90, 99, 122, 123, 125, 131, 132, 134, 141, 143, 144, 151, 152, 153, 171, 173, 175, 191, 192, 193, 194],
+    'Fathers_occupation': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 90, 99, 101, 102, 103, 112, 114, 121, 122, 123, 124, 131, 132, 134, 135, 141, 143, 144, 151, 152, 153, 154, 161, 163, 171, 172, 174, 175, 181, 182, 183, 192, 193, 194, 195],
+    'Displaced': [0, 1],
+    'Educational_special_needs': [0, 1],
+    'Debtor': [0, 1],
+    'Tuition_fees_up_to_date': [0, 1],
+    'Gender': [0, 1],
+    'Scholarship_holder': [0, 1],
+    'International': [0, 1],
+    'Curricular_units_1st_sem_credited': list(range(0, 21))  # 0 to 20
+}
+
+# Inclusive bounds for continuous features (grades and age)
+CONTINUOUS_RANGES = {
+    'Previous_qualification_grade': (95.0, 190.0),
+    'Admission_grade': (95.0, 190.0),
+    'Age_at_enrollment': (17, 70),
+}
+
+# Text labels used in "dataset for dashboard.csv", mapped back to model codes
+DASHBOARD_LABELS = {
+    'Marital_status': {'Single': 1, 'Married': 2, 'Widower': 3, 'Divorced': 4,
+                       'Facto union': 5, 'Legally separated': 6},
+    'Daytime_evening_attendance': {'Daytime': 1, 'Evening': 0},
+    'Gender': {'Male': 1, 'Female': 0},
+    'Displaced': {'Yes': 1, 'No': 0},
+    'Educational_special_needs': {'Yes': 1, 'No': 0},
+    'Debtor': {'Yes': 1, 'No': 0},
+    'Tuition_fees_up_to_date': {'Yes': 1, 'No': 0},
+    'Scholarship_holder': {'Yes': 1, 'No': 0},
+    'International': {'Yes': 1, 'No': 0},
+}
+
+
+# One validation failure: the offending feature, its raw value, a readable
+# message and the failure type (one of the reasons below)
+FeatureError = namedtuple('FeatureError', ['feature', 'value', 'message', 'reason'])
+
+# Validation failure types
+INVALID_CODE = 'invalid_code'
+OUT_OF_RANGE = 'out_of_range'
+NOT_NUMERIC = 'not_numeric'
+MISSING = 'missing'
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and value == value
+
+
+class FeatureSchema:
+    """
+    Precompiled validator for the model's input features.
+    
+    Args:
+        features: Feature names in the order expected by the model
+        categorical: Mapping of feature name to allowed integer codes
+        continuous: Mapping of feature name to inclusive (low, high) bounds
+    """
+    
+    def __init__(self, features, categorical, continuous):
+        self.features = tuple(features)
+        self.index = {feature: i for i, feature in enumerate(self.features)}
+        self.categorical = {f: frozenset(codes) for f, codes in categorical.items()}
+        self.continuous = dict(continuous)
+        
+        # Lookup bitmaps indexed by code, e.g. _lookup['Course'][9254] is True
+        self._lookup = {}
+        for feature, codes in self.categorical.items():
+            table = np.zeros(max(codes) + 1, dtype=bool)
+            table[sorted(codes)] = True
+            self._lookup[feature] = table
+        
+        self._messages = {
+            f: f"Valid values: {sorted(codes)}" for f, codes in self.categorical.items()
+        }
+    
+    def codes(self, feature):
+        """
+        Sorted list of allowed codes for a categorical feature.
+        """
+        return sorted(self.categorical[feature])
+    
+    def missing(self, record):
+        """
+        List the required features absent from a record (dict or column container).
+        """
+        return [f for f in self.features if f not in record]
+    
+    def check_value(self, feature, value):
+        """
+        Validate one value; returns a FeatureError or None.
+        """
+        if feature in self.categorical:
+            try:
+                valid = value in self.categorical[feature]
+            except TypeError:
+                valid = False
+            if not valid:
+                return FeatureError(feature, value,
+                                    f"Invalid value for {feature}: {value}. {self._messages[feature]}",
+                                    INVALID_CODE if _is_number(value) else NOT_NUMERIC)
+            return None
+        
+        low, high = self.continuous[feature]
+        try:
+            valid = low <= value <= high
+        except TypeError:
+            valid = False
+        if not valid:
+            return FeatureError(feature, value, f"{feature} must be between {low} and {high}",
+                                OUT_OF_RANGE if _is_number(value) else NOT_NUMERIC)
+        return None
+    
+    def validate_record(self, record):
+        """
+        Validate a single input dictionary.
+        
+        Args:
+            record: Dictionary containing all required features
+        
+        Returns:
+            list: FeatureError entries, empty when the record is valid
+        """
+        errors = []
+        for feature, codes in self.categorical.items():
+            value = record[feature]
+            try:
+                if value in codes:
+                    continue
+            except TypeError:
+                pass
+            errors.append(self.check_value(feature, value))
+        
+        for feature, (low, high) in self.continuous.items():
+            value = record[feature]
+            try:
+                if low <= value <= high:
+                    continue
+            except TypeError:
+                pass
+            errors.append(self.check_value(feature, value))
+        return errors
+    
+    def random_records(self, n, seed=0):
+        """
+        Generate n valid input dictionaries from the allowed codes and bounds.
+        
+        Args:
+            n: Number of records
+            seed: Random seed
+        
+        Returns:
+            list: Dictionaries with every feature, as plain Python numbers
+        """
+        rng = np.random.default_rng(seed)
+        columns = {}
+        for feature in self.features:
+            if feature in self.categorical:
+                columns[feature] = rng.choice(self.codes(feature), n).tolist()
+            else:
+                low, high = self.continuous[feature]
+                if isinstance(low, int):
+                    columns[feature] = rng.integers(low, high + 1, n).tolist()
+                else:
+                    columns[feature] = np.round(rng.uniform(low, high, n), 1).tolist()
+        return [{feature: columns[feature][i] for feature in self.features} for i in range(n)]
+    
+    def validate_array(self, X):
+        """
+        Validate a float matrix whose columns follow the schema's feature order.
+        
+        Args:
+            X: Array of shape (n_rows, n_features); NaN marks unreadable values
+        
+        Returns:
+            dict: Feature name to boolean mask of invalid rows, only for
+            features with at least one invalid row
+        """
+        X = np.asarray(X, dtype=np.float64)
+        invalid = {}
+        for feature, j in self.index.items():
+            column = X[:, j]
+            if feature in self._lookup:
+                table = self._lookup[feature]
+                codes = np.where(np.isfinite(column), column, -1)
+                in_table = (codes >= 0) & (codes < len(table)) & (codes == np.floor(codes))
+                ok = in_table.copy()
+                ok[in_table] = table[codes[in_table].astype(np.intp)]
+            else:
+                low, high = self.continuous[feature]
+                ok = (column >= low) & (column <= high)
+            if not ok.all():
+                invalid[feature] = ~ok
+        return invalid
+
+
+# Shared schema used by preprocessing, batch scoring and the Streamlit form
+SCHEMA = FeatureSchema(REQUIRED_FEATURES, FEATURE_RANGES, CONTINUOUS_RANGES)
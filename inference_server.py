@@ -0,0 +1,336 @@
+"""
+Asyncio HTTP scoring service with micro-batching.
+
+Concurrent single-student requests are collected for up to max_wait_ms (or
+until max_batch_size is reached) and scored together by
+predict_with_interpretation_batch, so the model runs once per batch while
+each caller still receives the same dict predict_with_interpretation
+returns. Only the standard library is used for HTTP.
+
+Endpoints:
+    POST /predict        JSON object with the 22 features -> prediction dict
+    GET  /health         Service status and batching statistics
+    GET  /metrics        Pipeline metrics in Prometheus text format
+    GET  /metrics.json   Pipeline metrics as a JSON snapshot
+    POST /profile        Run cProfile over the next batch
+    GET  /profile        Summary of the last profiled batch
+    GET  /models         Live and shadow versions and the shadow comparison
+    POST /models/activate  {"version": ...} swaps a version in without a restart
+    POST /models/shadow    {"version": ..., "sample_rate": 1.0} shadow-scores a candidate (null stops)
+    POST /models/promote   Make the shadow candidate live
+    POST /models/rollback  Re-activate the previous live version
+
+The /profile and POST /models/* routes are disabled unless the server is
+started with an admin token (--admin-token or DROPOUT_ADMIN_TOKEN), and
+then require "Authorization: Bearer <token>". Versions are plain names
+under --artifacts-dir.
+
+Usage:
+    python inference_server.py --port 8000 --max-batch-size 64 --max-wait-ms 5
+    DROPOUT_ADMIN_TOKEN=... python inference_server.py --artifacts-dir artifacts
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import time
+
+from artifact_manager import MANAGER
+from metrics import METRICS
+from model_registry import get_affine, get_label_encoder, get_scoring_model
+from prediction import predict_with_interpretation_batch
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 5.0
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches scored with one model call.
+
+    Args:
+        max_batch_size: Largest number of requests scored together
+        max_wait_ms: How long the first request in a batch waits for company
+        threshold: Optional dropout probability cut-off
+    """
+
+    def __init__(self, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 threshold=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.threshold = threshold
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, record):
+        """
+        Queue one record and wait for its result dict.
+
+        Raises:
+            ValueError: If the record fails validation
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((record, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        """
+        Batch loop; scoring runs in a thread so the event loop keeps accepting requests.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            records = [record for record, _ in batch]
+            try:
+                results = await loop.run_in_executor(
+                    None, predict_with_interpretation_batch, records, self.threshold)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class InferenceServer:
+    """
+    Minimal HTTP/1.1 server (keep-alive, JSON bodies) in front of a MicroBatcher.
+
+    Args:
+        batcher: MicroBatcher scoring /predict requests
+        admin_token: Bearer token for /profile and the POST /models/* routes, or None
+            to disable them
+    """
+
+    def __init__(self, batcher, admin_token=None):
+        self.batcher = batcher
+        self.admin_token = admin_token
+        self.started = time.time()
+
+    def authorized(self, headers):
+        """
+        Whether a request carries the admin token.
+        """
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip().encode(),
+                                                                  self.admin_token.encode())
+
+    def admin_error(self, headers):
+        """
+        Error response for an admin route, or None when the request may proceed.
+        """
+        if not self.admin_token:
+            return 403, {"error": "Admin routes are disabled; start the server with an admin token"}
+        if not self.authorized(headers or {}):
+            return 401, {"error": "Missing or wrong admin token"}
+        return None
+
+    async def route(self, method, path, body, headers=None):
+        if path == "/health":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            batches = self.batcher.batches
+            return 200, {
+                "status": "ok",
+                "uptime_seconds": time.time() - self.started,
+                "requests": self.batcher.requests,
+                "batches": batches,
+                "mean_batch_size": self.batcher.requests / batches if batches else 0.0,
+                "max_batch_size": self.batcher.max_batch_size,
+                "max_wait_ms": self.batcher.max_wait * 1000.0,
+            }
+
+        if path == "/predict":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            try:
+                record = json.loads(body)
+            except ValueError:
+                return 400, {"error": "Request body must be JSON"}
+            if not isinstance(record, dict):
+                return 400, {"error": "Request body must be a JSON object"}
+            try:
+                return 200, await self.batcher.submit(record)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            except Exception as e:
+                return 500, {"error": f"Error during prediction: {e}"}
+
+        if path in ("/metrics", "/metrics.json"):
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, METRICS.to_prometheus() if path == "/metrics" else METRICS.snapshot()
+
+        if path == "/profile":
+            if method not in ("GET", "POST"):
+                return 405, {"error": "Use GET or POST"}
+            denied = self.admin_error(headers)
+            if denied:
+                return denied
+            if method == "POST":
+                METRICS.profile_next()
+                return 200, {"status": "armed"}
+            return 200, METRICS.last_profile or {"error": "No batch profiled yet"}
+
+        if path == "/models":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, MANAGER.status()
+
+        if path in ("/models/activate", "/models/shadow", "/models/promote", "/models/rollback"):
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            denied = self.admin_error(headers)
+            if denied:
+                return denied
+            return await self.manage(path.rsplit("/", 1)[1], body)
+
+        return 404, {"error": f"Unknown path {path}"}
+
+    async def manage(self, action, body):
+        """
+        Run an artifact manager action off the event loop (loading a version
+        reads and compiles its files) and report the resulting status.
+        """
+        version = None
+        sample_rate = 1.0
+        if action in ("activate", "shadow"):
+            try:
+                request = json.loads(body or b"{}")
+                version = request.get("version")
+                sample_rate = float(request.get("sample_rate", 1.0))
+            except (ValueError, TypeError, AttributeError):
+                return 400, {"error": 'Request body must be a JSON object like {"version": ...}'}
+            if action == "activate" and not version:
+                return 400, {"error": "Missing version"}
+            if version is not None and not isinstance(version, str):
+                return 400, {"error": "version must be a string"}
+
+        actions = {
+            "activate": lambda: MANAGER.activate(version),
+            "shadow": lambda: MANAGER.set_shadow(version, sample_rate),
+            "promote": MANAGER.promote,
+            "rollback": MANAGER.rollback,
+        }
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, actions[action])
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"Could not {action}: {e}"}
+        return 200, MANAGER.status()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self.route(method, target.split("?", 1)[0], body, headers)
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host="127.0.0.1", port=8000, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                max_wait_ms=DEFAULT_MAX_WAIT_MS, threshold=None, admin_token=None):
+    """
+    Load the artifacts, start the batch loop and serve until cancelled.
+    """
+    get_scoring_model(max_batch_size)
+    get_affine()
+    try:
+        get_label_encoder()
+    except ValueError:
+        pass
+
+    batcher = MicroBatcher(max_batch_size, max_wait_ms, threshold)
+    server = InferenceServer(batcher, admin_token)
+    batch_task = asyncio.create_task(batcher.run())
+    tcp_server = await asyncio.start_server(server.handle, host, port)
+    print(f"✅ Serving on http://{host}:{port} "
+          f"(max batch {max_batch_size}, max wait {max_wait_ms} ms)", flush=True)
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        batch_task.cancel()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--threshold", type=float, help="Dropout probability cut-off")
+    parser.add_argument("--artifacts-dir", default=MANAGER.root,
+                        help="Versions available to /models/activate and /models/shadow")
+    parser.add_argument("--admin-token", default=os.environ.get("DROPOUT_ADMIN_TOKEN"),
+                        help="Bearer token enabling /profile and the POST /models/* routes "
+                             "(default: $DROPOUT_ADMIN_TOKEN)")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    MANAGER.root = args.artifacts_dir
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch_size, args.max_wait_ms, args.threshold,
+                          args.admin_token))
+    except KeyboardInterrupt:
+        pass
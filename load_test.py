@@ -0,0 +1,140 @@
+"""
+Local load test for inference_server.py.
+
+Opens concurrent keep-alive connections, each sending POST /predict with
+randomly generated valid students, and reports p50/p99 latency and
+requests/sec along with the server's batching statistics.
+
+Usage:
+    python load_test.py --spawn --requests 5000 --concurrency 64
+    python load_test.py --port 8000 --requests 5000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from feature_schema import SCHEMA
+
+
+async def _request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def run_load(host, port, n_requests, concurrency):
+    """
+    Send n_requests over `concurrency` connections.
+
+    Returns:
+        dict: Latency percentiles, throughput, error count and server health
+    """
+    students = SCHEMA.random_records(n_requests)
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def client():
+        nonlocal next_index, errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while next_index < n_requests:
+                student = students[next_index]
+                next_index += 1
+                start = time.perf_counter()
+                status, _ = await _request(reader, writer, "POST", "/predict", student)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, health = await _request(reader, writer, "GET", "/health")
+    writer.close()
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "requests_per_second": len(latencies) / elapsed,
+        "server": health,
+    }
+
+
+def spawn_server(port, extra_args=()):
+    """
+    Start inference_server.py in a subprocess and wait for its banner.
+    """
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    process = subprocess.Popen(
+        [sys.executable, "inference_server.py", "--port", str(port), *extra_args],
+        stdout=subprocess.PIPE, text=True, env=env,
+    )
+    line = process.stdout.readline()
+    if "Serving" not in line:
+        process.kill()
+        raise RuntimeError(f"Server failed to start: {line}")
+    return process
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the micro-batching scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--spawn", action="store_true", help="Start a local server for the test")
+    parser.add_argument("--max-batch-size", type=int, help="Passed to the spawned server")
+    parser.add_argument("--max-wait-ms", type=float, help="Passed to the spawned server")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        extra = []
+        if args.max_batch_size is not None:
+            extra += ["--max-batch-size", str(args.max_batch_size)]
+        if args.max_wait_ms is not None:
+            extra += ["--max-wait-ms", str(args.max_wait_ms)]
+        server = spawn_server(args.port, extra)
+
+    try:
+        report = asyncio.run(run_load(args.host, args.port, args.requests, args.concurrency))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"requests     {report['requests']:,} ({report['errors']} errors, concurrency {report['concurrency']})")
+    print(f"throughput   {report['requests_per_second']:,.0f} req/s")
+    print(f"latency p50  {report['p50_ms']:.2f} ms")
+    print(f"latency p99  {report['p99_ms']:.2f} ms")
+    print(f"mean batch   {report['server']['mean_batch_size']:.1f} requests")
@@ -0,0 +1,426 @@
+"""
+In-process metrics for the inference pipeline.
+
+Preprocessing and prediction record per-stage timings (validation, array
+assembly, affine transform, model evaluation), row counters and validation
+failures by feature and failure type into the shared METRICS registry.
+Each thread records into its own unlocked shard, so a stage costs a pair
+of perf_counter calls and a bucket bisect: cheap enough to leave on for
+every call. Set DROPOUT_METRICS=0 to disable recording.
+
+The registry exports Prometheus text format or a JSON snapshot, and can
+run cProfile over the next batch entry point call:
+
+    from metrics import METRICS
+    METRICS.profile_next("profile.out")
+    predict_dropout_batch(frame)
+    print(METRICS.last_profile["summary"])
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds (seconds) for latency histograms
+LATENCY_BUCKETS = (
+    1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Upper bounds for rows-per-call histograms
+BATCH_BUCKETS = (1, 8, 64, 256, 1_000, 10_000, 100_000, 1_000_000)
+
+# Help text for the metric families written by the pipeline
+_HELP = {
+    'dropout_stage_seconds': ('histogram', "Time spent in each pipeline stage"),
+    'dropout_batch_rows': ('histogram', "Rows per model evaluation"),
+    'dropout_rows_total': ('counter', "Input rows by validation outcome"),
+    'dropout_validation_errors_total': ('counter', "Validation failures by feature and type"),
+    'dropout_rows_scored_total': ('counter', "Rows scored by each model backend"),
+    'dropout_feature_drift_psi': ('gauge', "Population stability index of each input feature"),
+    'dropout_drift_window_rows': ('gauge', "Effective rows in the drift monitor's decayed window"),
+    'dropout_drift_alerts_total': ('counter', "Drift level escalations by feature and level"),
+    'dropout_model_activations_total': ('counter', "Artifact versions swapped in, by version"),
+    'dropout_model_seconds': ('histogram', "Model call time of the live and shadow versions"),
+    'dropout_shadow_rows_total': ('counter', "Rows scored by the shadow version"),
+    'dropout_shadow_disagreements_total': ('counter', "Rows where the shadow label differs from the live one"),
+    'dropout_shadow_errors_total': ('counter', "Batches the shadow version failed to score"),
+    'dropout_shadow_dropped_total': ('counter', "Live batches not shadow-scored because the shadow queue was full"),
+}
+
+_VALID_ROWS = ('dropout_rows_total', (('outcome', 'valid'),))
+_INVALID_ROWS = ('dropout_rows_total', (('outcome', 'invalid'),))
+_BATCH_ROWS = ('dropout_batch_rows', ())
+
+# Histogram key per stage name, built once
+_STAGE_KEYS = {}
+
+
+def _stage_key(name):
+    key = _STAGE_KEYS.get(name)
+    if key is None:
+        key = _STAGE_KEYS.setdefault(name, ('dropout_stage_seconds', (('stage', name),)))
+    return key
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (Prometheus semantics: counts per upper bound).
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        counts = list(other.counts)
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += sum(counts)
+        self.sum += other.sum
+
+    def cumulative(self):
+        """
+        (upper bound, cumulative count) pairs ending with +Inf.
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding quantile q (an overestimate).
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float('inf')
+
+
+class _StageTimer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Profile:
+    def __init__(self, metrics, entry):
+        self.metrics = metrics
+        self.entry = entry
+        self.profiler = None
+
+    def __enter__(self):
+        self.path = self.metrics._take_profile_request()
+        if self.path is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.metrics._store_profile(self.entry, self.profiler, self.path)
+        return False
+
+
+class _Shard(threading.local):
+    """
+    One thread's counters and histograms; written without locking.
+    """
+
+    def __init__(self, shards, lock):
+        self.counters = {}
+        self.histograms = {}
+        with lock:
+            shards.append(self.__dict__)
+
+
+class Metrics:
+    """
+    Registry of counters, histograms and gauges keyed by name and labels.
+
+    Each thread records into its own shard, so the hot path takes no lock;
+    exports merge the shards. Gauges hold the last value set from any thread.
+
+    Args:
+        enabled: Record anything at all; when False every call is a no-op
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._shards = []
+        self._local = _Shard(self._shards, self._lock)
+        self._gauges = {}
+        self._profile_request = None
+        self.last_profile = None
+        self.started = time.time()
+
+    # Recording
+
+    def _add(self, key, value):
+        counters = self._local.counters
+        counters[key] = counters.get(key, 0) + value
+
+    def _histogram(self, key, buckets=None):
+        histograms = self._local.histograms
+        histogram = histograms.get(key)
+        if histogram is None:
+            if buckets is None:
+                buckets = BATCH_BUCKETS if key == _BATCH_ROWS else LATENCY_BUCKETS
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def inc(self, name, value=1, **labels):
+        """
+        Add value to the counter name{labels}.
+        """
+        if self.enabled:
+            self._add((name, tuple(sorted(labels.items()))), value)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """
+        Record value in the histogram name{labels}.
+        """
+        if self.enabled:
+            self._histogram((name, tuple(sorted(labels.items()))), buckets).observe(value)
+
+    def set_gauge(self, name, value, **labels):
+        """
+        Set the gauge name{labels} to value.
+        """
+        if self.enabled:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def stage(self, name):
+        """
+        Context manager timing one pipeline stage into dropout_stage_seconds.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self._histogram(_stage_key(name)))
+
+    def record_stages(self, timings):
+        """
+        Record several (stage, seconds) pairs measured by the caller.
+
+        Single-record paths take perf_counter timestamps and report them here
+        in one call, which costs less than a context manager per stage.
+        """
+        if not self.enabled:
+            return
+        histograms = self._local.histograms
+        for name, seconds in timings:
+            key = _stage_key(name)
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = self._histogram(key)
+            histogram.observe(seconds)
+
+    def record_rows(self, valid, invalid=0):
+        """
+        Count rows that passed and failed validation.
+        """
+        if not self.enabled:
+            return
+        if valid:
+            self._add(_VALID_ROWS, valid)
+        if invalid:
+            self._add(_INVALID_ROWS, invalid)
+
+    def record_error(self, feature, reason, count=1):
+        self.inc('dropout_validation_errors_total', count, feature=feature, reason=reason)
+
+    def record_invalid_row(self, errors):
+        """
+        Count one rejected row and each of its FeatureError entries.
+        """
+        self.record_rows(0, 1)
+        for error in errors:
+            self.record_error(error.feature, error.reason)
+
+    def record_scored(self, backend, n_rows, stage, seconds):
+        """
+        Count rows evaluated by a model backend, the batch size used and the
+        time the model call took.
+        """
+        if not self.enabled:
+            return
+        self._add(('dropout_rows_scored_total', (('model', backend),)), n_rows)
+        self._histogram(_BATCH_ROWS).observe(n_rows)
+        self._histogram(_stage_key(stage)).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard['counters'].clear()
+                shard['histograms'].clear()
+            self._gauges.clear()
+            self.started = time.time()
+
+    # Profiling
+
+    def profile_next(self, path=None):
+        """
+        Run cProfile over the next batch entry point call.
+
+        The pstats summary is kept in last_profile; with path the raw stats
+        are also written there for snakeviz or pstats.
+        """
+        self._profile_request = path or ""
+
+    def profile(self, entry):
+        """
+        Context manager wrapped around batch entry points; profiles the
+        call only when profile_next() armed it.
+        """
+        return _Profile(self, entry)
+
+    def _take_profile_request(self):
+        if self._profile_request is None:
+            return None
+        with self._lock:
+            request, self._profile_request = self._profile_request, None
+        return request
+
+    def _store_profile(self, entry, profiler, path):
+        if path:
+            profiler.dump_stats(path)
+        buffer = io.StringIO()
+        pstats.Stats(profiler, stream=buffer).sort_stats('cumulative').print_stats(25)
+        self.last_profile = {'entry': entry, 'path': path or None, 'summary': buffer.getvalue()}
+
+    # Export
+
+    def snapshot(self):
+        """
+        JSON-serialisable copy of every counter, histogram and gauge.
+        """
+        with self._lock:
+            shards = list(self._shards)
+            gauges = sorted(self._gauges.items())
+
+        counter_totals = {}
+        merged = {}
+        for shard in shards:
+            for key, value in list(shard['counters'].items()):
+                counter_totals[key] = counter_totals.get(key, 0) + value
+            for key, histogram in list(shard['histograms'].items()):
+                total = merged.get(key)
+                if total is None:
+                    total = merged[key] = Histogram(histogram.bounds)
+                total.merge(histogram)
+
+        counters = [(name, dict(labels), value)
+                    for (name, labels), value in sorted(counter_totals.items())]
+        histograms = [(name, dict(labels), h.cumulative(), h.count, h.sum,
+                       h.quantile(0.5), h.quantile(0.99))
+                      for (name, labels), h in sorted(merged.items())]
+
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'counters': [{'name': name, 'labels': labels, 'value': value}
+                         for name, labels, value in counters],
+            'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                       for (name, labels), value in gauges],
+            'histograms': [{
+                'name': name,
+                'labels': labels,
+                'count': count,
+                'sum': total,
+                'p50_upper_bound': p50,
+                'p99_upper_bound': p99,
+                'buckets': [[_format_bound(bound), cumulative] for bound, cumulative in buckets],
+            } for name, labels, buckets, count, total, p50, p99 in histograms],
+        }
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        snapshot = self.snapshot()
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {_HELP.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for counter in snapshot['counters']:
+            describe(counter['name'], 'counter')
+            lines.append(f"{counter['name']}{_labels(counter['labels'])} {counter['value']}")
+
+        for gauge in snapshot['gauges']:
+            describe(gauge['name'], 'gauge')
+            lines.append(f"{gauge['name']}{_labels(gauge['labels'])} {gauge['value']!r}")
+
+        for histogram in snapshot['histograms']:
+            name, labels = histogram['name'], histogram['labels']
+            describe(name, 'histogram')
+            for bound, cumulative in histogram['buckets']:
+                lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']!r}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float('inf') else repr(float(bound))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+METRICS = Metrics(enabled=os.environ.get('DROPOUT_METRICS', '1') != '0')
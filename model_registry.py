@@ -0,0 +1,192 @@
+"""
+Lazy, per-process registry for the model artifacts.
+
+Nothing is read from disk at import. Each artifact is loaded on first use,
+memoized for the life of the process and timed, so importing prediction.py
+or data_preprocessing.py is cheap and a missing file fails loudly at the
+point of use instead of leaving a silent None behind.
+
+A loaded set of artifacts can be replaced in one step with swap() (see
+artifact_manager.py), and batch entry points run inside pinned() so each
+call sees a single version even if a swap lands halfway through it.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import joblib
+
+from affine_transform import SCALER_PATH, load_or_fold
+from compiled_trees import COMPILED_MAX_ROWS, COMPILED_MODEL_PATH, load_if_current
+
+MODEL_PATH = "gboost_model.joblib"
+LABEL_ENCODER_PATH = "label_encoder.joblib"
+
+# Parent directory of versioned artifact sets written by training.py
+ARTIFACTS_DIR = "artifacts"
+
+# Set DROPOUT_MMAP_MODE=r to memory-map the NumPy arrays stored in the
+# joblib files, so forked workers share those pages instead of copying them
+MMAP_MODE = os.environ.get("DROPOUT_MMAP_MODE") or None
+
+
+class ModelRegistry:
+    """
+    Loads named artifacts lazily and memoizes them.
+
+    Args:
+        mmap_mode: Passed to joblib.load (None or 'r'); only arrays dumped
+            uncompressed are memory-mapped
+    """
+
+    def __init__(self, mmap_mode=MMAP_MODE):
+        self.mmap_mode = mmap_mode
+        self._loaders = {}
+        self._artifacts = {}
+        self._load_times = {}
+        self._lock = threading.RLock()
+        self._pinned = threading.local()
+
+    def register(self, name, loader):
+        """
+        Register a zero-argument loader under name, dropping any cached value.
+        """
+        with self._lock:
+            # Copied, not mutated: pinned calls keep the loaders they started with
+            self._loaders = {**self._loaders, name: loader}
+            self._artifacts.pop(name, None)
+            self._load_times.pop(name, None)
+
+    def register_joblib(self, name, path):
+        """
+        Register a joblib file, honouring the registry's mmap_mode.
+        """
+        self.register(name, lambda: joblib.load(path, mmap_mode=self.mmap_mode))
+
+    def get(self, name):
+        """
+        Return the artifact, loading it on first use.
+
+        Raises:
+            ValueError: If the artifact cannot be loaded
+        """
+        pinned = getattr(self._pinned, 'snapshot', None)
+        artifacts = self._artifacts if pinned is None else pinned[0]
+        try:
+            return artifacts[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            # A pinned call keeps loading into the set it started with, with
+            # that set's loaders, so a swap meanwhile cannot mix versions
+            artifacts, loaders = (self._artifacts, self._loaders) if pinned is None else pinned
+            if name not in artifacts:
+                start = time.perf_counter()
+                try:
+                    artifact = loaders[name]()
+                except Exception as e:
+                    raise ValueError(f"Could not load {name}: {e}") from e
+                self._load_times[name] = time.perf_counter() - start
+                artifacts[name] = artifact
+            return artifacts[name]
+
+    def swap(self, artifacts, drop=()):
+        """
+        Replace several loaded artifacts at once.
+
+        Calls already inside pinned() finish with the artifacts they started
+        with; every later get() sees the new ones. Artifacts derived from the
+        replaced ones (e.g. the explainer) are listed in drop and rebuilt by
+        their loaders on next use.
+
+        Args:
+            artifacts: Dictionary mapping names to loaded artifacts
+            drop: Names to forget, so they reload from the new artifacts
+        """
+        with self._lock:
+            current = {name: value for name, value in self._artifacts.items()
+                       if name not in artifacts and name not in drop}
+            current.update(artifacts)
+            loaders = dict(self._loaders)
+            for name, artifact in artifacts.items():
+                # clear() keeps the swapped-in version instead of the files
+                loaders[name] = lambda artifact=artifact: artifact
+                self._load_times.pop(name, None)
+            for name in drop:
+                self._load_times.pop(name, None)
+            self._loaders = loaders
+            self._artifacts = current
+
+    @contextmanager
+    def pinned(self):
+        """
+        Make every get() in this thread use the artifacts current at entry.
+        """
+        if getattr(self._pinned, 'snapshot', None) is not None:
+            yield
+            return
+        with self._lock:
+            self._pinned.snapshot = (self._artifacts, self._loaders)
+        try:
+            yield
+        finally:
+            self._pinned.snapshot = None
+
+    def is_loaded(self, name):
+        return name in self._artifacts
+
+    def clear(self):
+        """
+        Forget all loaded artifacts; they are reloaded on next use.
+        """
+        with self._lock:
+            self._artifacts.clear()
+            self._load_times.clear()
+
+    def load_times(self):
+        """
+        Seconds spent loading each artifact loaded so far.
+        """
+        return dict(self._load_times)
+
+
+REGISTRY = ModelRegistry()
+REGISTRY.register_joblib("model", MODEL_PATH)
+REGISTRY.register_joblib("label_encoder", LABEL_ENCODER_PATH)
+REGISTRY.register_joblib("scaler", SCALER_PATH)
+REGISTRY.register("affine", lambda: load_or_fold(lambda: REGISTRY.get("scaler")))
+REGISTRY.register("compiled_model", lambda: load_if_current(MODEL_PATH, COMPILED_MODEL_PATH))
+
+
+def get_model():
+    return REGISTRY.get("model")
+
+
+def get_scoring_model(n_rows=1):
+    """
+    Model used to score a batch of n_rows.
+
+    Small batches use the compiled ensemble when gboost_compiled.npz was
+    exported from the current gboost_model.joblib; larger batches, or a
+    missing/stale export, use the sklearn model.
+    """
+    if n_rows <= COMPILED_MAX_ROWS:
+        compiled = REGISTRY.get("compiled_model")
+        if compiled is not None:
+            return compiled
+    return get_model()
+
+
+def get_label_encoder():
+    return REGISTRY.get("label_encoder")
+
+
+def get_scaler():
+    return REGISTRY.get("scaler")
+
+
+def get_affine():
+    return REGISTRY.get("affine")
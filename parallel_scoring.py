@@ -0,0 +1,163 @@
+"""
+Multi-core batch scoring with a process pool.
+
+The input is split into shards scored by a ProcessPoolExecutor. The model,
+preprocessing and label encoder are loaded in the parent before the pool
+starts, so with the 'fork' start method workers share those pages
+copy-on-write instead of receiving a pickled copy; elsewhere each worker
+loads them once through the registry (set DROPOUT_MMAP_MODE=r to
+memory-map the joblib arrays). Input matrices are handed over as a
+memory-mapped .npy file and only row ranges travel to the workers.
+Results are merged back in input order.
+"""
+
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from model_registry import get_affine, get_label_encoder, get_model, get_scoring_model
+from prediction import predict_dropout_batch
+from score_csv import DEFAULT_CHUNKSIZE, open_sink, read_chunks, score_chunk
+
+DEFAULT_SHARD_SIZE = 20_000
+
+# Per-worker state set by the pool initializer
+_worker_input = {}
+
+
+def _mp_context():
+    # fork lets workers inherit the already-loaded artifacts copy-on-write
+    if "fork" in mp.get_all_start_methods():
+        return mp.get_context("fork")
+    return mp.get_context()
+
+
+def _warm_artifacts():
+    # Both models: small shards may use the compiled ensemble, large ones sklearn
+    get_scoring_model()
+    get_model()
+    get_affine()
+    try:
+        get_label_encoder()
+    except ValueError:
+        pass
+
+
+def _init_worker(matrix_path=None):
+    _warm_artifacts()
+    if matrix_path is not None:
+        _worker_input['X'] = np.load(matrix_path, mmap_mode='r')
+
+
+def _score_shard(start, stop, threshold):
+    result = predict_dropout_batch(np.asarray(_worker_input['X'][start:stop]), threshold)
+    return start, result
+
+
+def _merge_results(parts):
+    """
+    Concatenate (start, result) shard outputs in input order.
+    """
+    parts = sorted(parts, key=lambda part: part[0])
+    merged = {}
+    for key in ('prediction', 'probability_no_dropout', 'probability_dropout', 'confidence', 'valid'):
+        merged[key] = np.concatenate([result[key] for _, result in parts]) if parts else np.empty(0)
+
+    merged['errors'] = {}
+    for start, result in parts:
+        for i, messages in result['errors'].items():
+            merged['errors'][start + i] = messages
+
+    return merged
+
+
+def score_matrix_parallel(X, workers=None, shard_size=DEFAULT_SHARD_SIZE, threshold=None):
+    """
+    Score a raw feature matrix across a process pool.
+
+    Args:
+        X: Array of shape (n_rows, 22) in REQUIRED_FEATURES order
+        workers: Number of worker processes (defaults to os.cpu_count())
+        shard_size: Rows per task
+        threshold: Optional dropout probability cut-off
+
+    Returns:
+        dict: Same layout as predict_dropout_batch, rows in input order
+    """
+    workers = workers or os.cpu_count() or 1
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    n_rows = len(X)
+
+    _warm_artifacts()
+    with tempfile.TemporaryDirectory() as tmp:
+        matrix_path = os.path.join(tmp, "input.npy")
+        np.save(matrix_path, X)
+
+        with ProcessPoolExecutor(workers, mp_context=_mp_context(),
+                                 initializer=_init_worker, initargs=(matrix_path,)) as pool:
+            futures = [
+                pool.submit(_score_shard, start, min(start + shard_size, n_rows), threshold)
+                for start in range(0, n_rows, shard_size)
+            ]
+            parts = [future.result() for future in futures]
+
+    return _merge_results(parts)
+
+
+def score_csv_parallel(input_path, output_path, workers=None, chunksize=DEFAULT_CHUNKSIZE,
+                       id_column=None, threshold=None, sep=",", verbose=True):
+    """
+    Parallel version of score_csv.score_csv.
+
+    Chunks are read in the parent and scored by the pool with at most two
+    chunks in flight per worker, and written in input order, so memory
+    stays bounded by workers * chunksize.
+
+    Returns:
+        dict: rows, valid_rows, seconds, rows_per_second and workers
+    """
+    workers = workers or os.cpu_count() or 1
+    _warm_artifacts()
+    sink = open_sink(output_path)
+    n_rows = n_valid = 0
+    start = time.perf_counter()
+
+    def drain(pending):
+        nonlocal n_rows, n_valid
+        scored = pending.popleft().result()
+        sink.write(scored)
+        n_rows += len(scored)
+        n_valid += int(scored['valid'].sum())
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"  {n_rows:>12,} rows scored ({n_rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(workers, mp_context=_mp_context(), initializer=_init_worker) as pool:
+            pending = deque()
+            row_offset = 0
+            for chunk in read_chunks(input_path, chunksize, id_column, sep):
+                chunk = chunk.reset_index(drop=True)
+                pending.append(pool.submit(score_chunk, chunk, row_offset, id_column, threshold))
+                row_offset += len(chunk)
+                if len(pending) >= 2 * workers:
+                    drain(pending)
+            while pending:
+                drain(pending)
+    finally:
+        sink.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': n_rows,
+        'valid_rows': n_valid,
+        'seconds': seconds,
+        'rows_per_second': n_rows / seconds if seconds > 0 else float('inf'),
+        'workers': workers,
+    }
@@ -1,123 +1,318 @@
-import joblib
+import sys
+import weakref
+from time import perf_counter
+
 import numpy as np
-from data_preprocessing import preprocess_input
+from data_preprocessing import missing_errors, preprocess_input, preprocess_batch
+from feature_schema import REQUIRED_FEATURES, SCHEMA
+from artifact_manager import MANAGER
+from metrics import METRICS
+from model_registry import REGISTRY, get_label_encoder, get_model, get_scoring_model
+
+
+def __getattr__(name):
+    # Model and label encoder are loaded lazily through the registry
+    if name == 'model':
+        return get_model()
+    if name == 'label_encoder':
+        return get_label_encoder()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Probability of dropout at or above which a student is flagged.
+# None keeps the model's own decision (the most probable class).
+DECISION_THRESHOLD = None
+
 
-# Load model and encoders
-try:
-    model = joblib.load('gboost_model.joblib')
-    print("✅ Model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    model = None
+# Scalar types a record's values may have; anything else is checked by
+# SCHEMA.validate_record on its own before the batch is assembled
+_NUMBER_TYPES = (int, float, np.number)
+
+
+# Dropout column per loaded model; weak keys, so models swapped out of the
+# registry are not kept alive by this cache
+_dropout_columns = weakref.WeakKeyDictionary()
+
+
+def _dropout_column(model, label_encoder=None):
+    """
+    Column of predict_proba holding the dropout probability.
+    
+    Resolved once per model from the label encoder's class order (the
+    registry's unless one is given); falls back to column 1 for binary
+    models trained without the encoder.
+    """
+    cached = _dropout_columns.get(model)
+    if cached is not None:
+        return cached
+    
+    if label_encoder is None:
+        try:
+            label_encoder = get_label_encoder()
+        except ValueError:
+            label_encoder = None
+    
+    column = 1
+    if label_encoder is not None and 'Dropout' in label_encoder.classes_:
+        dropout_code = label_encoder.transform(['Dropout'])[0]
+        column = int(np.flatnonzero(model.classes_ == dropout_code)[0])
+    
+    _dropout_columns[model] = column
+    return column
 
-try:
-    label_encoder = joblib.load('label_encoder.joblib')
-    print("✅ Label encoder loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading label encoder: {e}")
-    label_encoder = None
 
-def predict_dropout(processed_input):
+def _score(processed_input, threshold=None):
+    """
+    Evaluate the ensemble once and derive labels from the probabilities.
+    
+    Args:
+        processed_input: Preprocessed input array
+        threshold: Dropout probability cut-off, or None for the most probable class
+    
+    Returns:
+        tuple: (prediction, probability_dropout) arrays, with prediction
+        1 = Dropout and 0 = No Dropout. probability_dropout is None when
+        the model has no predict_proba.
+    """
+    
+    model = get_scoring_model(len(processed_input))
+    
+    if threshold is None:
+        threshold = DECISION_THRESHOLD
+    
+    start = perf_counter()
+    if not hasattr(model, 'predict_proba'):
+        prediction = model.predict(processed_input).astype(int)
+        METRICS.record_scored(type(model).__name__, len(processed_input), 'predict',
+                              perf_counter() - start)
+        return prediction, None
+    
+    probabilities = model.predict_proba(processed_input)
+    seconds = perf_counter() - start
+    METRICS.record_scored(type(model).__name__, len(processed_input), 'predict_proba', seconds)
+    dropout_column = _dropout_column(model)
+    prob_dropout = probabilities[:, dropout_column]
+    
+    if threshold is None:
+        prediction = (probabilities.argmax(axis=1) == dropout_column).astype(int)
+    else:
+        prediction = (prob_dropout >= threshold).astype(int)
+    
+    # A shadow candidate scores the same preprocessed matrix in the
+    # background; its results are only recorded
+    if MANAGER.shadow is not None:
+        MANAGER.compare(processed_input, prediction, prob_dropout, seconds, threshold)
+    
+    return prediction, prob_dropout
+
+
+def predict_dropout(processed_input, threshold=None):
     """
     Predict dropout risk for a student.
     
     Args:
         processed_input: Preprocessed input array from preprocess_input()
+        threshold: Optional dropout probability cut-off (defaults to DECISION_THRESHOLD)
     
     Returns:
         int: Prediction result (0 = No Dropout, 1 = Dropout)
         or dict: Detailed prediction with probabilities if available
     """
     
-    if model is None:
-        raise ValueError("Model not loaded properly")
-    
-    try:
-        # Make prediction
-        prediction = model.predict(processed_input)
-        prediction_result = int(prediction[0])
+    # One artifact version for the load check and scoring
+    with REGISTRY.pinned():
+        # Raises ValueError if the model cannot be loaded
+        get_scoring_model(len(processed_input))
         
-        # Get prediction probabilities if available
-        if hasattr(model, 'predict_proba'):
-            try:
-                probabilities = model.predict_proba(processed_input)
-                prob_no_dropout = float(probabilities[0][0])
-                prob_dropout = float(probabilities[0][1])
-                
-                return {
-                    'prediction': prediction_result,
-                    'probability_no_dropout': prob_no_dropout,
-                    'probability_dropout': prob_dropout,
-                    'confidence': max(prob_no_dropout, prob_dropout)
-                }
-            except Exception as e:
-                print(f"Warning: Could not get probabilities: {e}")
-                return prediction_result
-        else:
-            return prediction_result
-            
-    except Exception as e:
-        raise Exception(f"Error during prediction: {e}")
+        try:
+            prediction, prob_dropout = _score(processed_input, threshold)
+        except Exception as e:
+            raise Exception(f"Error during prediction: {e}")
+    
+    prediction_result = int(prediction[0])
+    if prob_dropout is None:
+        return prediction_result
+    
+    prob_dropout = float(prob_dropout[0])
+    prob_no_dropout = 1.0 - prob_dropout
+    
+    return {
+        'prediction': prediction_result,
+        'probability_no_dropout': prob_no_dropout,
+        'probability_dropout': prob_dropout,
+        'confidence': max(prob_no_dropout, prob_dropout)
+    }
 
-def predict_dropout_simple(processed_input):
+def predict_dropout_simple(processed_input, threshold=None):
     """
     Simple version that returns only the prediction (0 or 1).
     Use this if you want to keep your current Streamlit app unchanged.
     """
-    if model is None:
-        raise ValueError("Model not loaded properly")
+    # One artifact version for the load check and scoring
+    with REGISTRY.pinned():
+        # Raises ValueError if the model cannot be loaded
+        get_scoring_model(len(processed_input))
+        
+        try:
+            prediction, _ = _score(processed_input, threshold)
+            return int(prediction[0])
+        except Exception as e:
+            raise Exception(f"Error during prediction: {e}")
+
+def _interpret(prediction_result, prob_dropout=None):
+    """
+    Build the interpreted result dict for one scored row.
+    """
+    prediction_result = int(prediction_result)
+    result = {
+        'prediction': prediction_result,
+        'prediction_label': 'Dropout' if prediction_result == 1 else 'No Dropout',
+        'risk_level': 'High' if prediction_result == 1 else 'Low'
+    }
     
-    try:
-        prediction = model.predict(processed_input)
-        return int(prediction[0])
-    except Exception as e:
-        raise Exception(f"Error during prediction: {e}")
+    if prob_dropout is not None:
+        prob_dropout = float(prob_dropout)
+        prob_no_dropout = 1.0 - prob_dropout
+        confidence = max(prob_no_dropout, prob_dropout)
+        
+        result.update({
+            'probability_no_dropout': prob_no_dropout,
+            'probability_dropout': prob_dropout,
+            'confidence': confidence,
+            'confidence_level': 'High' if confidence > 0.8 else 
+                             'Medium' if confidence > 0.6 else 'Low'
+        })
+    
+    return result
 
-def predict_with_interpretation(input_dict):
+def predict_with_interpretation(input_dict, threshold=None, observe_drift=True):
     """
     Complete prediction function that handles preprocessing and provides interpretation.
     
     Args:
         input_dict: Dictionary with raw input features
+        threshold: Optional dropout probability cut-off (defaults to DECISION_THRESHOLD)
+        observe_drift: Feed the record to the drift monitor; pass False for
+            synthetic input (tests, benchmarks)
     
     Returns:
         dict: Complete prediction results with interpretation
     """
     try:
-        # Preprocess input
-        processed_input = preprocess_input(input_dict)
+        # One artifact version for preprocessing and scoring
+        with REGISTRY.pinned():
+            # Preprocess input
+            processed_input = preprocess_input(input_dict, observe_drift)
+            
+            # Make prediction with a single pass over the ensemble
+            prediction, prob_dropout = _score(processed_input, threshold)
+        return _interpret(prediction[0], None if prob_dropout is None else prob_dropout[0])
         
-        # Make prediction
-        prediction = model.predict(processed_input)
-        prediction_result = int(prediction[0])
+    except Exception as e:
+        raise Exception(f"Error in complete prediction: {e}")
+
+def predict_with_interpretation_batch(input_dicts, threshold=None, observe_drift=True):
+    """
+    predict_with_interpretation for many students with a single model call.
+    
+    Args:
+        input_dicts: List of dictionaries with raw input features
+        threshold: Optional dropout probability cut-off (defaults to DECISION_THRESHOLD)
+        observe_drift: Feed the valid records to the drift monitor; pass
+            False for synthetic input (tests, benchmarks)
+    
+    Returns:
+        list: For each input, the same dict predict_with_interpretation returns,
+        or the ValueError raised by its validation
+    """
+    with REGISTRY.pinned(), METRICS.profile('predict_with_interpretation_batch'):
+        results = [None] * len(input_dicts)
+        positions = []
+        
+        # Records without every feature cannot form a row, and records take
+        # numbers only, as in preprocess_input (text labels are decoded for
+        # tabular extracts, not records); the rest are validated and
+        # transformed together by preprocess_batch
+        for i, input_dict in enumerate(input_dicts):
+            missing_features = SCHEMA.missing(input_dict)
+            if missing_features:
+                METRICS.record_invalid_row(missing_errors(missing_features))
+                results[i] = ValueError(f"Missing required features: {missing_features}")
+                continue
+            if not all(isinstance(input_dict[f], _NUMBER_TYPES) for f in REQUIRED_FEATURES):
+                errors = SCHEMA.validate_record(input_dict)
+                if errors:
+                    METRICS.record_invalid_row(errors)
+                    results[i] = ValueError(errors[0].message)
+                    continue
+            positions.append(i)
+        if not positions:
+            return results
         
-        # Get probabilities if available
-        result = {
-            'prediction': prediction_result,
-            'prediction_label': 'Dropout' if prediction_result == 1 else 'No Dropout',
-            'risk_level': 'High' if prediction_result == 1 else 'Low'
-        }
+        columns = {f: [input_dicts[i][f] for i in positions] for f in REQUIRED_FEATURES}
+        processed_input, valid_mask, errors = preprocess_batch(columns, observe_drift)
+        for row, messages in errors.items():
+            results[positions[row]] = ValueError(messages[0])
         
-        if hasattr(model, 'predict_proba'):
+        if valid_mask.any():
             try:
-                probabilities = model.predict_proba(processed_input)
-                prob_no_dropout = float(probabilities[0][0])
-                prob_dropout = float(probabilities[0][1])
-                
-                result.update({
-                    'probability_no_dropout': prob_no_dropout,
-                    'probability_dropout': prob_dropout,
-                    'confidence': max(prob_no_dropout, prob_dropout),
-                    'confidence_level': 'High' if max(prob_no_dropout, prob_dropout) > 0.8 else 
-                                     'Medium' if max(prob_no_dropout, prob_dropout) > 0.6 else 'Low'
-                })
+                prediction, prob_dropout = _score(processed_input, threshold)
             except Exception as e:
-                print(f"Warning: Could not get probabilities: {e}")
+                raise Exception(f"Error during batch prediction: {e}")
+            
+            with METRICS.stage('interpret'):
+                for k, row in enumerate(np.flatnonzero(valid_mask)):
+                    results[positions[row]] = _interpret(prediction[k],
+                                                         None if prob_dropout is None else prob_dropout[k])
+        
+        return results
+
+def predict_dropout_batch(data, threshold=None, observe_drift=True):
+    """
+    Predict dropout risk for a whole cohort in one pass.
+    
+    Args:
+        data: pandas DataFrame, NumPy structured array or 2-D array in
+            REQUIRED_FEATURES order with raw input features
+        threshold: Optional dropout probability cut-off (defaults to DECISION_THRESHOLD)
+        observe_drift: Feed the valid rows to the drift monitor; pass False
+            for synthetic rows (scenario sweeps, benchmarks)
+    
+    Returns:
+        dict: Per-row result arrays aligned with the input rows. Invalid rows
+        have prediction -1 and NaN probabilities; their messages are in 'errors'.
+    """
+    
+    with REGISTRY.pinned(), METRICS.profile('predict_dropout_batch'):
+        # Raises ValueError if the model cannot be loaded
+        get_scoring_model(len(data))
         
-        return result
+        processed_input, valid_mask, errors = preprocess_batch(data, observe_drift)
+        n_rows = len(valid_mask)
         
-    except Exception as e:
-        raise Exception(f"Error in complete prediction: {e}")
+        prediction = np.full(n_rows, -1, dtype=int)
+        prob_dropout = np.full(n_rows, np.nan)
+        
+        if valid_mask.any():
+            try:
+                valid_prediction, valid_prob_dropout = _score(processed_input, threshold)
+            except Exception as e:
+                raise Exception(f"Error during batch prediction: {e}")
+            
+            prediction[valid_mask] = valid_prediction
+            if valid_prob_dropout is not None:
+                prob_dropout[valid_mask] = valid_prob_dropout
+        
+        prob_no_dropout = 1.0 - prob_dropout
+    
+    return {
+        'prediction': prediction,
+        'probability_no_dropout': prob_no_dropout,
+        'probability_dropout': prob_dropout,
+        'confidence': np.fmax(prob_no_dropout, prob_dropout),
+        'valid': valid_mask,
+        'errors': errors
+    }
 
 # Test function
 def test_prediction():
@@ -133,14 +328,71 @@ def test_prediction():
         print(f"Sample input keys: {list(sample_data.keys())}")
         
         # Test simple prediction
-        processed_input = preprocess_input(sample_data)
+        # Test records are not traffic; keep them out of the drift monitor
+        from drift_monitor import DRIFT
+        drift_rows = (DRIFT.rows_seen, DRIFT.pending_rows)
+        processed_input = preprocess_input(sample_data, observe_drift=False)
         simple_result = predict_dropout_simple(processed_input)
         print(f"✅ Simple prediction result: {simple_result}")
         
         # Test detailed prediction
-        detailed_result = predict_with_interpretation(sample_data)
+        detailed_result = predict_with_interpretation(sample_data, observe_drift=False)
         print(f"✅ Detailed prediction result: {detailed_result}")
         
+        # One malformed record fails on its own, next to a valid one, with
+        # the message and result predict_with_interpretation gives
+        malformed = [dict(sample_data, Course=[1]), dict(sample_data, Course={'a': 1}),
+                     dict(sample_data, Course="9254"), dict(sample_data, Admission_grade="120")]
+        for bad_record in malformed:
+            good, bad = predict_with_interpretation_batch([sample_data, bad_record], observe_drift=False)
+            assert good == detailed_result, good
+            assert isinstance(bad, ValueError), bad
+            try:
+                predict_with_interpretation(bad_record, observe_drift=False)
+            except Exception as e:
+                assert str(bad) in str(e), (bad, e)
+            else:
+                raise AssertionError(f"{bad_record} was accepted by predict_with_interpretation")
+        print(f"✅ Malformed records rejected per record: {len(malformed)}")
+        
+        # Test batch prediction with one invalid row
+        bad_data = dict(sample_data, Course=1234)
+        batch = np.array(
+            [tuple(row[f] for f in REQUIRED_FEATURES) for row in (sample_data, bad_data)],
+            dtype=[(f, 'f8') for f in REQUIRED_FEATURES]
+        )
+        batch_result = predict_dropout_batch(batch, observe_drift=False)
+        print(f"✅ Batch prediction result: {batch_result['prediction']}, errors: {batch_result['errors']}")
+        assert (DRIFT.rows_seen, DRIFT.pending_rows) == drift_rows, "test records fed the drift monitor"
+        
+        # The folded preprocessing must reproduce the sklearn pipeline
+        import pandas as pd
+        from affine_transform import verify as verify_affine
+        from data_preprocessing import _column
+        dataset = pd.read_csv("dataset for dashboard.csv")
+        X_raw = np.column_stack([_column(dataset, f) for f in REQUIRED_FEATURES])
+        max_diff = verify_affine(REGISTRY.get("scaler"), REGISTRY.get("affine"), X_raw)
+        print(f"✅ Affine preprocessing matches sklearn on {len(X_raw)} rows (max abs diff {max_diff:.2e})")
+        
+        # So must the compiled trees, exported in memory if the artifact is stale
+        from compiled_trees import CompiledEnsemble, verify as verify_compiled
+        X_model, _, _ = preprocess_batch(dataset, observe_drift=False)
+        compiled = REGISTRY.get("compiled_model") or CompiledEnsemble.from_model(get_model())
+        max_diff = verify_compiled(get_model(), compiled, X_model)
+        print(f"✅ Compiled trees match sklearn on {len(X_model)} rows (max abs diff {max_diff:.2e})")
+        
+        for name, seconds in REGISTRY.load_times().items():
+            print(f"⏱️ Loaded {name} in {seconds * 1e3:.1f} ms")
+        
+        snapshot = METRICS.snapshot()
+        for histogram in snapshot['histograms']:
+            if histogram['name'] == 'dropout_stage_seconds':
+                mean = histogram['sum'] / histogram['count']
+                print(f"📊 Stage {histogram['labels']['stage']}: {histogram['count']} calls, "
+                      f"mean {mean * 1e6:.1f} us")
+        for counter in snapshot['counters']:
+            print(f"📊 {counter['name']} {counter['labels']}: {counter['value']}")
+        
         return True
         
     except Exception as e:
@@ -149,4 +401,4 @@ def test_prediction():
 
 if __name__ == "__main__":
     # Run test when script is executed directly
-    test_prediction()
+    sys.exit(0 if test_prediction() else 1)
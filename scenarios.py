@@ -0,0 +1,143 @@
+"""
+What-if scenario sweeps: how a student's dropout risk changes under overrides.
+
+A sweep takes a base record (or a whole cohort) and a grid of overrides,
+e.g. tuition paid or not, scholarship granted or not, and a range of
+admission grades. Every combination of the override values is written
+into one matrix, each base row repeated once per combination. That matrix
+is scored with predict_dropout_batch, so the whole probability surface
+costs one vectorized pass instead of one preprocess_input + predict_dropout
+round trip per variant.
+
+Usage:
+    from scenarios import sweep
+    surface = sweep(record, {'Tuition_fees_up_to_date': [0, 1],
+                             'Admission_grade': grade_steps('Admission_grade')})
+    surface['probability_dropout']   # shape (2, 20)
+"""
+
+import math
+
+import numpy as np
+
+from data_preprocessing import input_matrix
+from feature_schema import SCHEMA
+from metrics import METRICS
+from prediction import predict_dropout_batch
+
+# Fields advisors can act on, swept over all their values by default
+DEFAULT_SCENARIO_FEATURES = ('Tuition_fees_up_to_date', 'Scholarship_holder', 'Debtor', 'Admission_grade')
+
+# Points sampled across the range of a continuous feature
+DEFAULT_STEPS = 20
+
+# Scenario rows scored per batch; cohort sweeps are split on base rows to
+# keep the scenario matrix bounded
+MAX_BATCH_ROWS = 200_000
+
+
+def grade_steps(feature, steps=DEFAULT_STEPS):
+    """
+    Evenly spaced values across a continuous feature's allowed range.
+    """
+    low, high = SCHEMA.continuous[feature]
+    return np.linspace(low, high, steps)
+
+
+def default_overrides(features=DEFAULT_SCENARIO_FEATURES, steps=DEFAULT_STEPS):
+    """
+    Override grid covering every code of categorical features and `steps`
+    points across the range of continuous ones.
+    """
+    return {f: (grade_steps(f, steps) if f in SCHEMA.continuous else np.asarray(SCHEMA.codes(f), dtype=np.float64))
+            for f in features}
+
+
+def scenario_matrix(X, overrides):
+    """
+    Cartesian product of base rows and override values as one matrix.
+
+    Args:
+        X: Raw base rows, shape (n_rows, 22) in REQUIRED_FEATURES order
+        overrides: Dictionary mapping feature name to the values to try
+
+    Returns:
+        numpy array of shape (n_rows * n_scenarios, 22); the rows of each
+        base row are contiguous, with scenarios in C order over `overrides`
+    """
+    unknown = [f for f in overrides if f not in SCHEMA.index]
+    if unknown:
+        raise ValueError(f"Unknown scenario features: {unknown}")
+
+    values = [np.asarray(v, dtype=np.float64).ravel() for v in overrides.values()]
+    n_scenarios = math.prod(len(v) for v in values)
+    grid = np.repeat(X, n_scenarios, axis=0).reshape(len(X), n_scenarios, X.shape[1])
+    for feature, column in zip(overrides, np.meshgrid(*values, indexing='ij')):
+        grid[:, :, SCHEMA.index[feature]] = column.ravel()
+    return grid.reshape(-1, X.shape[1])
+
+
+def sweep(base, overrides=None, threshold=None):
+    """
+    Score every combination of override values for one student or a cohort.
+
+    Args:
+        base: Input dictionary for one student, or a list of them, pandas
+            DataFrame, NumPy structured array or 2-D array for a cohort
+        overrides: Dictionary mapping feature name to the values to try
+            (defaults to default_overrides())
+        threshold: Optional dropout probability cut-off (defaults to DECISION_THRESHOLD)
+
+    Returns:
+        dict: features and values of the grid axes; probability_dropout and
+        prediction with shape (*grid) for a dictionary input, or
+        (n_rows, *grid) for a cohort; baseline, the probability of the
+        unmodified rows; valid mask of the same shape as prediction. Invalid
+        scenarios (bad base rows or override values) have NaN probability
+        and prediction -1. Cohort sweeps also return mean_probability_dropout,
+        the surface averaged over the valid base rows.
+    """
+    single = isinstance(base, dict)
+    X = input_matrix(base)
+    if overrides is None:
+        overrides = default_overrides()
+
+    shape = tuple(len(np.ravel(v)) for v in overrides.values())
+    n_scenarios = math.prod(shape)
+    rows_per_batch = max(1, MAX_BATCH_ROWS // max(n_scenarios, 1))
+
+    probability = np.empty((len(X), n_scenarios))
+    prediction = np.empty((len(X), n_scenarios), dtype=int)
+    valid = np.empty((len(X), n_scenarios), dtype=bool)
+    baseline = np.empty(len(X))
+    for start in range(0, len(X), rows_per_batch):
+        block = X[start:start + rows_per_batch]
+        with METRICS.stage('scenarios'):
+            grid = scenario_matrix(block, overrides)
+        # The unmodified rows ride along at the end of the same batch; the
+        # synthetic grid must not reach the production drift monitor
+        result = predict_dropout_batch(np.vstack([grid, block]), threshold, observe_drift=False)
+        stop = start + len(block)
+        probability[start:stop] = result['probability_dropout'][:len(grid)].reshape(len(block), -1)
+        prediction[start:stop] = result['prediction'][:len(grid)].reshape(len(block), -1)
+        valid[start:stop] = result['valid'][:len(grid)].reshape(len(block), -1)
+        baseline[start:stop] = result['probability_dropout'][len(grid):]
+
+    surface = {
+        'features': list(overrides),
+        'values': [np.asarray(v, dtype=np.float64).ravel() for v in overrides.values()],
+        'probability_dropout': probability.reshape(len(X), *shape),
+        'prediction': prediction.reshape(len(X), *shape),
+        'valid': valid.reshape(len(X), *shape),
+        'baseline': baseline,
+    }
+    if single:
+        for key in ('probability_dropout', 'prediction', 'valid'):
+            surface[key] = surface[key][0]
+        surface['baseline'] = float(baseline[0])
+    else:
+        counts = surface['valid'].sum(axis=0)
+        total = np.where(surface['valid'], surface['probability_dropout'], 0.0).sum(axis=0)
+        surface['mean_probability_dropout'] = np.divide(total, counts, out=np.full(shape, np.nan),
+                                                        where=counts > 0)
+    return surface
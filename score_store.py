@@ -0,0 +1,320 @@
+"""
+Persisted score store for incremental rescoring.
+
+Scores are kept in SQLite keyed by student ID, together with a hash of the
+canonicalized 22-feature vector and the version of the artifacts that
+produced them. A rescoring run hashes every incoming row, looks each
+chunk's IDs up and only sends new or changed students (or everyone, after
+a model change) through predict_dropout_batch; the rest reuse their stored
+score. Rows without a student ID are scored every run and never stored.
+
+Usage:
+    python score_csv.py extract.csv scores.csv --id-column Student_ID --store scores.sqlite
+"""
+
+import sqlite3
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import prediction
+from data_preprocessing import _column
+from feature_schema import REQUIRED_FEATURES
+from model_registry import REGISTRY, get_scoring_model
+from prediction import predict_dropout_batch
+from score_csv import DEFAULT_CHUNKSIZE, open_sink, read_chunks
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    student_id TEXT PRIMARY KEY,
+    hash_a INTEGER NOT NULL,
+    hash_b INTEGER NOT NULL,
+    model_version TEXT NOT NULL,
+    prediction INTEGER NOT NULL,
+    probability_dropout REAL,
+    scored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TEMP TABLE IF NOT EXISTS chunk_ids (
+    student_id TEXT PRIMARY KEY
+);
+"""
+
+# Two independent 64-bit lanes (seed, multiplier) for the row hash
+_HASH_LANES = (
+    (np.uint64(0x9E3779B97F4A7C15), np.uint64(0x100000001B3)),
+    (np.uint64(0xC2B2AE3D27D4EB4F), np.uint64(0xFF51AFD7ED558CCD)),
+)
+
+
+def model_version(threshold=None):
+    """
+    Identifier for everything that determines a score: the model,
+    preprocessing and label encoder the registry is serving (which after a
+    swap need not be the files on disk) and the decision threshold.
+    """
+    if threshold is None:
+        # Read at call time so a threshold changed at runtime is recorded
+        threshold = prediction.DECISION_THRESHOLD
+    with REGISTRY.pinned():
+        try:
+            label_encoder = REGISTRY.get("label_encoder")
+        except ValueError:
+            label_encoder = None
+        digest = joblib.hash((REGISTRY.get("model"), REGISTRY.get("scaler"), label_encoder), hash_name='sha1')
+    return f"{digest[:16]}:threshold={threshold}"
+
+
+def feature_matrix(data):
+    """
+    Raw 22-feature float64 matrix with dashboard text labels decoded.
+    """
+    if isinstance(data, np.ndarray) and data.dtype.names is None:
+        return np.asarray(data, dtype=np.float64)
+    return np.column_stack([_column(data, f) for f in REQUIRED_FEATURES])
+
+
+def feature_hashes(X):
+    """
+    128-bit hash of each canonicalized feature row, as two int64 columns.
+
+    Rows are hashed as float64 in REQUIRED_FEATURES order, so "Yes" and 1,
+    or 120 and 120.0, hash the same; -0.0 and NaN payloads are normalised.
+    Each lane folds the 22 words in with xor, multiply and xorshift, all
+    vectorized over the rows.
+
+    Returns:
+        Array of shape (n_rows, 2), dtype int64 (SQLite's integer type)
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64) + 0.0
+    X[np.isnan(X)] = np.nan
+    words = X.view(np.uint64)
+    hashes = np.empty((len(X), 2), dtype=np.uint64)
+    shift = np.uint64(31)
+    with np.errstate(over='ignore'):
+        for lane, (seed, multiplier) in enumerate(_HASH_LANES):
+            h = np.full(len(X), seed)
+            for column in words.T:
+                h ^= column
+                h *= multiplier
+                h ^= h >> shift
+            hashes[:, lane] = h
+    return hashes.view(np.int64)
+
+
+class ScoreStore:
+    """
+    SQLite table of the latest score per student.
+
+    Args:
+        path: Database file (created if missing); ':memory:' for a scratch store
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(_SCHEMA)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+    def lookup(self, student_ids, version):
+        """
+        Entries for the given student IDs scored with a model version.
+
+        The IDs are staged in a temporary table and joined against the
+        store, so only the chunk's own rows are read, whatever the store's
+        size and without SQLite's limit on bound parameters.
+
+        Returns:
+            tuple: (pandas Index of the student IDs found, hashes (n, 2)
+                int64, prediction int array, probability_dropout float array)
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM chunk_ids")
+            self.connection.executemany("INSERT OR IGNORE INTO chunk_ids VALUES (?)",
+                                        ((student_id,) for student_id in student_ids))
+        rows = self.connection.execute(
+            "SELECT s.student_id, s.hash_a, s.hash_b, s.prediction, s.probability_dropout "
+            "FROM chunk_ids c JOIN scores s ON s.student_id = c.student_id "
+            "WHERE s.model_version = ?", (version,)).fetchall()
+        if not rows:
+            return pd.Index([], dtype=object), np.empty((0, 2), np.int64), np.empty(0, int), np.empty(0)
+        student_ids, hash_a, hash_b, prediction, prob_dropout = zip(*rows)
+        hashes = np.column_stack([np.array(hash_a, dtype=np.int64), np.array(hash_b, dtype=np.int64)])
+        prob_dropout = np.array([np.nan if p is None else p for p in prob_dropout])
+        return pd.Index(student_ids), hashes, np.array(prediction, dtype=int), prob_dropout
+
+    def upsert(self, entries):
+        """
+        Insert or replace (student_id, hash_a, hash_b, model_version,
+        prediction, probability_dropout) entries.
+        """
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO scores VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(student_id) DO UPDATE SET hash_a=excluded.hash_a, "
+                "hash_b=excluded.hash_b, model_version=excluded.model_version, "
+                "prediction=excluded.prediction, probability_dropout=excluded.probability_dropout, "
+                "scored_at=excluded.scored_at",
+                ((*entry, now) for entry in entries))
+
+    def get_meta(self, key, default=None):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+def rescore_chunk(chunk, store, version, id_column, row_offset=0, threshold=None):
+    """
+    Score one chunk, reusing stored scores for unchanged students.
+
+    Args:
+        chunk: DataFrame with the required features and id_column
+        store: ScoreStore that receives the new scores
+        version: Current model_version()
+        id_column: Column identifying students
+        row_offset: Position of the chunk's first row in the whole input
+        threshold: Optional dropout probability cut-off
+
+    Returns:
+        tuple: (scored DataFrame, number of cache hits, seconds spent scoring
+            misses, seconds spent hashing and matching against the store)
+    """
+    ids = chunk[id_column]
+    # A missing ID would otherwise become the string 'nan' shared by every such row
+    has_id = ids.notna().to_numpy()
+    student_ids = ids.astype(str).to_numpy(dtype=object)
+    X = feature_matrix(chunk)
+    start = time.perf_counter()
+    hashes = feature_hashes(X)
+
+    # Fetch the chunk's stored entries, then compare the row hashes
+    stored_ids, stored_hashes, stored_prediction, stored_prob = store.lookup(student_ids[has_id], version)
+    position = stored_ids.get_indexer(student_ids)
+    position[~has_id] = -1
+    found = position >= 0
+    cached = found.copy()
+    cached[found] = (stored_hashes[position[found]] == hashes[found]).all(axis=1)
+    match_seconds = time.perf_counter() - start
+
+    n_rows = len(chunk)
+    prediction = np.full(n_rows, -1, dtype=int)
+    prob_dropout = np.full(n_rows, np.nan)
+    valid = cached.copy()
+    error = np.full(n_rows, "", dtype=object)
+    prediction[cached] = stored_prediction[position[cached]]
+    prob_dropout[cached] = stored_prob[position[cached]]
+
+    misses = np.flatnonzero(~cached)
+    start = time.perf_counter()
+    if len(misses):
+        result = predict_dropout_batch(X[misses], threshold)
+        prediction[misses] = result['prediction']
+        prob_dropout[misses] = result['probability_dropout']
+        valid[misses] = result['valid']
+        for k, messages in result['errors'].items():
+            error[misses[k]] = "; ".join(messages)
+
+        # Invalid rows and rows without an ID are not stored, so they are
+        # re-validated next run
+        store.upsert(
+            (student_ids[i], int(hashes[i, 0]), int(hashes[i, 1]), version, int(prediction[i]),
+             None if np.isnan(prob_dropout[i]) else float(prob_dropout[i]))
+            for i in misses[result['valid'] & has_id[misses]]
+        )
+    miss_seconds = time.perf_counter() - start
+
+    scored = pd.DataFrame({
+        'row': np.arange(row_offset, row_offset + n_rows),
+        id_column: chunk[id_column].to_numpy(),
+        'prediction': prediction,
+        'probability_dropout': prob_dropout,
+        'probability_no_dropout': 1.0 - prob_dropout,
+        'valid': valid,
+        'cached': cached,
+        'error': error,
+    })
+    return scored, int(cached.sum()), miss_seconds, match_seconds
+
+
+def rescore_csv(input_path, output_path, store_path, id_column, chunksize=DEFAULT_CHUNKSIZE,
+                threshold=None, sep=",", verbose=True):
+    """
+    Incrementally score a CSV extract against a persisted score store.
+
+    Time saved is the scoring (model plus store write) avoided for the
+    hits, at the per-row cost of this run's misses or of the last run that
+    scored enough rows to measure it, minus the time spent hashing and
+    matching rows against the store.
+
+    Returns:
+        dict: rows, valid_rows, hits, misses, hit_rate, seconds, rows_per_second,
+            seconds_per_scored_row, match_seconds and estimated_seconds_saved
+    """
+    get_scoring_model(chunksize)
+    version = model_version(threshold)
+    store = ScoreStore(store_path)
+    sink = open_sink(output_path)
+    n_rows = n_valid = n_hits = 0
+    miss_seconds = match_seconds = 0.0
+    start = time.perf_counter()
+
+    try:
+        row_offset = 0
+        for chunk in read_chunks(input_path, chunksize, id_column, sep, id_dtype=str):
+            chunk = chunk.reset_index(drop=True)
+            scored, hits, seconds, matching = rescore_chunk(chunk, store, version, id_column,
+                                                            row_offset, threshold)
+            sink.write(scored)
+            row_offset += len(chunk)
+            n_rows += len(chunk)
+            n_valid += int(scored['valid'].sum())
+            n_hits += hits
+            miss_seconds += seconds
+            match_seconds += matching
+            if verbose:
+                elapsed = time.perf_counter() - start
+                print(f"  {n_rows:>12,} rows ({n_hits / n_rows:.1%} cached, "
+                      f"{n_rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+        n_misses = n_rows - n_hits
+        # Below ~1k misses the per-row cost is dominated by fixed overhead
+        if n_misses >= 1000:
+            seconds_per_row = miss_seconds / n_misses
+            store.set_meta('seconds_per_scored_row', seconds_per_row)
+        else:
+            seconds_per_row = float(store.get_meta('seconds_per_scored_row', 'nan'))
+        store.set_meta('model_version', version)
+    finally:
+        sink.close()
+        store.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        'rows': n_rows,
+        'valid_rows': n_valid,
+        'hits': n_hits,
+        'misses': n_misses,
+        'hit_rate': n_hits / n_rows if n_rows else 0.0,
+        'seconds': seconds,
+        'rows_per_second': n_rows / seconds if seconds > 0 else float('inf'),
+        'seconds_per_scored_row': seconds_per_row,
+        'match_seconds': match_seconds,
+        'estimated_seconds_saved': n_hits * seconds_per_row - match_seconds,
+    }
@@ -0,0 +1,318 @@
+"""
+Training pipeline for the student success model.
+
+Rebuilds the three artifacts the app loads (gboost_model.joblib,
+scaler_pca.joblib and label_encoder.joblib) from "dataset for dashboard.csv"
+without the notebook:
+
+    1. read the 22 REQUIRED_FEATURES in the order preprocess_input uses,
+       decode dashboard labels and drop rows the schema rejects
+    2. split off a stratified test set, fit the label encoder and the
+       scaler (optionally followed by PCA) on the training split
+    3. cross-validate a GradientBoostingClassifier grid on every core; each
+       fit stops adding trees once its validation loss stops improving
+    4. refit the best parameters, score the test split and write the
+       artifacts with metrics.json to artifacts/<version>/
+
+The scaled (or PCA) matrices from step 2 are cached by a digest of the
+dataset and the preprocessing settings, so reruns with a new grid skip
+straight to the search.
+
+Usage:
+    python training.py
+    python training.py --cv 3 --grid '{"max_depth": [3, 4]}' --install
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import shutil
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.decomposition import PCA
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, f1_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.utils.class_weight import compute_sample_weight
+
+import affine_transform
+import compiled_trees
+from affine_transform import SCALER_PATH, file_digest
+from data_preprocessing import _column
+from feature_schema import REQUIRED_FEATURES, SCHEMA
+from model_registry import ARTIFACTS_DIR, LABEL_ENCODER_PATH, MODEL_PATH
+
+DATASET_PATH = "dataset for dashboard.csv"
+TARGET_COLUMN = "Status"
+CACHE_DIR = ".train_cache"
+METRICS_FILE = "metrics.json"
+
+# Bump when the cached matrices change meaning
+CACHE_VERSION = 1
+
+TEST_SIZE = 0.2
+SEED = 42
+
+# Searched around the notebook's grid; n_estimators is only an upper bound
+# because every fit stops early
+PARAM_GRID = {
+    'max_depth': [3, 4, 5],
+    'learning_rate': [0.05, 0.1],
+    'subsample': [0.8, 1.0],
+}
+MAX_ESTIMATORS = 500
+EARLY_STOPPING_ROUNDS = 10
+VALIDATION_FRACTION = 0.1
+
+
+def load_training_data(path=DATASET_PATH):
+    """
+    Feature matrix and labels from a CSV shaped like "dataset for dashboard.csv".
+
+    Returns:
+        tuple: (X of shape (n_rows, 22) in REQUIRED_FEATURES order, labels,
+            number of rows dropped because the schema rejects them)
+    """
+    frame = pd.read_csv(path)
+    missing = SCHEMA.missing(frame.columns) + ([TARGET_COLUMN] if TARGET_COLUMN not in frame else [])
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+
+    X = np.column_stack([_column(frame, f) for f in REQUIRED_FEATURES])
+    valid = frame[TARGET_COLUMN].notna().to_numpy()
+    for bad in SCHEMA.validate_array(X).values():
+        valid &= ~bad
+    return X[valid], frame[TARGET_COLUMN].to_numpy()[valid].astype(str), int((~valid).sum())
+
+
+def make_preprocessing(pca_variance=None):
+    """
+    Unfitted preprocessing: StandardScaler, or StandardScaler then PCA
+    keeping pca_variance of the variance. Both fold into the affine artifact.
+    """
+    if pca_variance is None:
+        return StandardScaler()
+    return Pipeline([('scaler', StandardScaler()), ('pca', PCA(n_components=pca_variance))])
+
+
+def _cache_key(dataset_digest, settings):
+    payload = json.dumps({
+        'cache_version': CACHE_VERSION,
+        'dataset': dataset_digest,
+        'features': list(REQUIRED_FEATURES),
+        'sklearn': sklearn.__version__,
+        **settings,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def prepare_data(path=DATASET_PATH, test_size=TEST_SIZE, seed=SEED, pca_variance=None,
+                 cache_dir=CACHE_DIR):
+    """
+    Split, encode and preprocess the dataset, reusing a cached result.
+
+    Args:
+        cache_dir: Directory for cached matrices, or None to always rebuild
+
+    Returns:
+        dict: X_train, X_test (preprocessed), y_train, y_test (encoded),
+            preprocessing, label_encoder, dataset_digest, rows_dropped
+            and cached (whether the cache was hit)
+    """
+    dataset_digest = file_digest(path)
+    key = _cache_key(dataset_digest, {'test_size': test_size, 'seed': seed, 'pca_variance': pca_variance})
+    cache_path = os.path.join(cache_dir, f"{key}.joblib") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        data = joblib.load(cache_path)
+        data['cached'] = True
+        return data
+
+    X, labels, rows_dropped = load_training_data(path)
+    X_train, X_test, labels_train, labels_test = train_test_split(
+        X, labels, test_size=test_size, random_state=seed, stratify=labels)
+
+    label_encoder = LabelEncoder().fit(labels_train)
+    preprocessing = make_preprocessing(pca_variance).fit(X_train)
+    data = {
+        'X_train': preprocessing.transform(X_train),
+        'X_test': preprocessing.transform(X_test),
+        'y_train': label_encoder.transform(labels_train),
+        'y_test': label_encoder.transform(labels_test),
+        'preprocessing': preprocessing,
+        'label_encoder': label_encoder,
+        'dataset_digest': dataset_digest,
+        'rows_dropped': rows_dropped,
+    }
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump(data, cache_path)
+    data['cached'] = False
+    return data
+
+
+def search(X, y, param_grid=PARAM_GRID, cv=5, scoring='f1_macro', n_jobs=-1, balance=True, seed=SEED):
+    """
+    Cross-validated grid search over early-stopped gradient boosting.
+
+    Candidates x folds run in parallel on n_jobs cores (-1 for all).
+
+    Args:
+        balance: Weight samples inversely to class frequency, so Dropout and
+            Enrolled count as much as Graduate (the notebook oversampled
+            instead, which leaks duplicates across CV folds)
+
+    Returns:
+        Fitted GridSearchCV (refit on all of X with the best parameters)
+    """
+    estimator = GradientBoostingClassifier(
+        n_estimators=MAX_ESTIMATORS, n_iter_no_change=EARLY_STOPPING_ROUNDS,
+        validation_fraction=VALIDATION_FRACTION, random_state=seed)
+    grid = GridSearchCV(estimator, param_grid, scoring=scoring, n_jobs=n_jobs, refit=True,
+                        cv=StratifiedKFold(cv, shuffle=True, random_state=seed))
+    fit_params = {'sample_weight': compute_sample_weight('balanced', y)} if balance else {}
+    return grid.fit(X, y, **fit_params)
+
+
+def evaluate(model, X_test, y_test, label_encoder):
+    """
+    Held-out metrics, with class names from the label encoder.
+    """
+    predicted = model.predict(X_test)
+    classes = list(label_encoder.classes_)
+    report = classification_report(y_test, predicted, labels=range(len(classes)), target_names=classes,
+                                   output_dict=True, zero_division=0)
+    return {
+        'accuracy': float(accuracy_score(y_test, predicted)),
+        'f1_macro': float(f1_score(y_test, predicted, average='macro')),
+        'dropout_recall': report.get('Dropout', {}).get('recall'),
+        'dropout_precision': report.get('Dropout', {}).get('precision'),
+        'per_class': {c: report[c] for c in classes},
+        'confusion_matrix': {'labels': classes,
+                             'matrix': confusion_matrix(y_test, predicted, labels=range(len(classes))).tolist()},
+    }
+
+
+def _cv_summary(grid, top=10):
+    results = pd.DataFrame(grid.cv_results_).sort_values('rank_test_score').head(top)
+    return [{
+        'params': row['params'],
+        'mean_score': float(row['mean_test_score']),
+        'std_score': float(row['std_test_score']),
+        'mean_fit_seconds': float(row['mean_fit_time']),
+    } for _, row in results.iterrows()]
+
+
+def train(path=DATASET_PATH, output_dir=ARTIFACTS_DIR, param_grid=PARAM_GRID, cv=5, scoring='f1_macro',
+          n_jobs=-1, balance=True, pca_variance=None, test_size=TEST_SIZE, seed=SEED,
+          cache_dir=CACHE_DIR, verbose=True):
+    """
+    Run the whole pipeline and write a versioned artifact directory.
+
+    Returns:
+        tuple: (path of the version directory, metrics dict as written)
+    """
+    start = time.perf_counter()
+    data = prepare_data(path, test_size, seed, pca_variance, cache_dir)
+    prepared = time.perf_counter()
+    if verbose:
+        print(f"📦 {len(data['X_train']):,} training / {len(data['X_test']):,} test rows, "
+              f"{data['X_train'].shape[1]} model features "
+              f"({'cached' if data['cached'] else 'preprocessed'} in {prepared - start:.2f} s)")
+
+    grid = search(data['X_train'], data['y_train'], param_grid, cv, scoring, n_jobs, balance, seed)
+    searched = time.perf_counter()
+    model = grid.best_estimator_
+    if verbose:
+        n_candidates = len(grid.cv_results_['params'])
+        print(f"🔍 {n_candidates} candidates x {cv} folds in {searched - prepared:.1f} s; best {scoring} "
+              f"{grid.best_score_:.4f} with {grid.best_params_} ({model.n_estimators_} trees)")
+
+    test_metrics = evaluate(model, data['X_test'], data['y_test'], data['label_encoder'])
+    version = base = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    suffix = 1
+    while os.path.exists(os.path.join(output_dir, version)):
+        suffix += 1
+        version = f"{base}-{suffix}"
+    version_dir = os.path.join(output_dir, version)
+    os.makedirs(version_dir)
+    joblib.dump(model, os.path.join(version_dir, MODEL_PATH))
+    joblib.dump(data['preprocessing'], os.path.join(version_dir, SCALER_PATH))
+    joblib.dump(data['label_encoder'], os.path.join(version_dir, LABEL_ENCODER_PATH))
+
+    metrics = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'dataset': {'path': os.path.basename(path), 'sha256': data['dataset_digest'],
+                    'train_rows': len(data['X_train']), 'test_rows': len(data['X_test']),
+                    'rows_dropped': data['rows_dropped']},
+        'features': list(REQUIRED_FEATURES),
+        'preprocessing': {'type': type(data['preprocessing']).__name__, 'pca_variance': pca_variance,
+                          'n_features_out': int(data['X_train'].shape[1])},
+        'search': {'param_grid': param_grid, 'cv': cv, 'scoring': scoring, 'balance': balance,
+                   'max_estimators': MAX_ESTIMATORS, 'early_stopping_rounds': EARLY_STOPPING_ROUNDS,
+                   'best_params': grid.best_params_, 'best_score': float(grid.best_score_),
+                   'n_estimators': int(model.n_estimators_), 'top_candidates': _cv_summary(grid)},
+        'test': test_metrics,
+        'timings': {'prepare_seconds': prepared - start, 'prepare_cached': data['cached'],
+                    'search_seconds': searched - prepared,
+                    'total_seconds': time.perf_counter() - start},
+        'environment': {'python': platform.python_version(), 'sklearn': sklearn.__version__,
+                        'numpy': np.__version__, 'cpu_count': os.cpu_count(), 'n_jobs': n_jobs},
+    }
+    with open(os.path.join(version_dir, METRICS_FILE), "w") as f:
+        json.dump(metrics, f, indent=2, default=str)
+    return version_dir, metrics
+
+
+def install(version_dir, target_dir="."):
+    """
+    Copy a version's artifacts to where the app loads them and rebuild the
+    compiled affine transform and tree arrays from them.
+    """
+    for name in (MODEL_PATH, SCALER_PATH, LABEL_ENCODER_PATH):
+        shutil.copyfile(os.path.join(version_dir, name), os.path.join(target_dir, name))
+    affine_transform.build(os.path.join(target_dir, SCALER_PATH),
+                           os.path.join(target_dir, affine_transform.AFFINE_PATH))
+    compiled_trees.build(os.path.join(target_dir, MODEL_PATH),
+                         os.path.join(target_dir, compiled_trees.COMPILED_MODEL_PATH))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the dropout model and write versioned artifacts")
+    parser.add_argument("--data", default=DATASET_PATH, help="Training CSV")
+    parser.add_argument("--output-dir", default=ARTIFACTS_DIR, help="Parent directory for artifact versions")
+    parser.add_argument("--cv", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--grid", type=json.loads, default=PARAM_GRID,
+                        help="Parameter grid as JSON, e.g. '{\"max_depth\": [3, 4]}'")
+    parser.add_argument("--scoring", default="f1_macro", help="sklearn scoring name for the search")
+    parser.add_argument("--jobs", type=int, default=-1, help="Parallel fits (-1 for all cores)")
+    parser.add_argument("--pca-variance", type=float, help="Add PCA keeping this fraction of variance")
+    parser.add_argument("--no-balance", action="store_true", help="Do not reweight classes")
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE, help="Held-out fraction")
+    parser.add_argument("--seed", type=int, default=SEED, help="Split and model seed")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Cache for the preprocessed matrices")
+    parser.add_argument("--no-cache", action="store_true", help="Rebuild the preprocessed matrices")
+    parser.add_argument("--install", action="store_true",
+                        help="Copy the new artifacts to the working directory and recompile them")
+    args = parser.parse_args()
+
+    version_dir, metrics = train(
+        args.data, args.output_dir, args.grid, args.cv, args.scoring, args.jobs,
+        balance=not args.no_balance, pca_variance=args.pca_variance, test_size=args.test_size,
+        seed=args.seed, cache_dir=None if args.no_cache else args.cache_dir)
+    test = metrics['test']
+    print(f"✅ Test accuracy {test['accuracy']:.4f}, macro F1 {test['f1_macro']:.4f}, "
+          f"dropout recall {test['dropout_recall']:.4f}")
+    print(f"✅ Artifacts written to {version_dir} ({metrics['timings']['total_seconds']:.1f} s)")
+    if args.install:
+        install(version_dir)
+        print(f"✅ Installed {metrics['version']} ({MODEL_PATH}, {SCALER_PATH}, {LABEL_ENCODER_PATH})")